@@ -0,0 +1,197 @@
+"""
+离线 benchmark: 用 stub_site 提供的本地 Bilibili 替身和假模型运行 up_finder.main,
+比较不同并发, 批量判断和缓存设置下的吞吐量。
+
+在仓库根目录运行:
+
+    PYTHONPATH=src uv run python benchmarks/run_benchmark.py \
+        --backend api --concurrency 1 --concurrency 4 --repeat 2
+
+每个设置使用独立的临时缓存目录, --repeat 大于 1 时后面几次是热缓存的结果。
+搜索结果缓存始终关闭: 它会直接返回上一次的结果, 热缓存的一轮就只测到了它,
+而不是判断, UP 主空间和向量缓存对搜索流程的加速。
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import click
+from rich.console import Console
+from rich.table import Table
+from stub_site import KEYWORD, StubSite
+
+from bili_up_finder.cache.query_cache import configure_query_cache
+from bili_up_finder.config import Config, configure_runtime
+from bili_up_finder.up_finder import main
+
+
+def run_once(site: StubSite, config: Config) -> dict:
+    site.state.reset_counters()
+    start = time.perf_counter()
+    users_data = asyncio.run(main(KEYWORD, config))
+    elapsed = time.perf_counter() - start
+
+    counters = site.state.reset_counters()
+    requests = counters["html_pages"] + counters["api_requests"]
+    accepted = len(users_data or [])
+    return {
+        "seconds": elapsed,
+        "pages": requests,
+        "pages_per_second": requests / elapsed if elapsed else 0.0,
+        "llm_calls": counters["llm_requests"],
+        "accepted": accepted,
+        "llm_calls_per_uploader": counters["llm_requests"] / accepted
+        if accepted
+        else float("nan"),
+    }
+
+
+@click.command()
+@click.option(
+    "--backend", default="api", type=click.Choice(["browser", "api"]), show_default=True
+)
+@click.option(
+    "--concurrency",
+    multiple=True,
+    type=int,
+    default=[1, 4],
+    show_default=True,
+    help="Concurrency levels to compare, repeatable.",
+)
+@click.option(
+    "--judge-batch-size",
+    multiple=True,
+    type=int,
+    default=[1],
+    show_default=True,
+    help="Judge batch sizes to compare, repeatable.",
+)
+@click.option("--no-cache", is_flag=True, default=False, help="Disable local caches.")
+@click.option(
+    "--prefilter", is_flag=True, default=False, help="Enable the local pre-filter."
+)
+@click.option(
+    "--judge",
+    default="llm",
+    type=click.Choice(["llm", "embedding"]),
+    show_default=True,
+    help="Relevance judge; embedding uses the stub embeddings endpoint.",
+)
+@click.option(
+    "--token-budget",
+    default=None,
+    type=int,
+    help="LLM token budget per run; near the limit the crawl stops calling the LLM.",
+)
+@click.option("-n", "--num-up", default=10, type=int, show_default=True)
+@click.option("--repeat", default=1, type=int, show_default=True)
+@click.option(
+    "--llm-latency",
+    default=0.5,
+    type=float,
+    show_default=True,
+    help="Seconds the fake model waits before answering.",
+)
+@click.option(
+    "--lazy-load-ms",
+    default=300,
+    type=int,
+    show_default=True,
+    help="Delay before the stub space page appends more cards.",
+)
+@click.option(
+    "--browser-profile",
+    default="performance",
+    type=click.Choice(["default", "performance"]),
+    show_default=True,
+)
+def benchmark(
+    backend,
+    concurrency,
+    judge_batch_size,
+    no_cache,
+    prefilter,
+    judge,
+    token_budget,
+    num_up,
+    repeat,
+    llm_latency,
+    lazy_load_ms,
+    browser_profile,
+):
+    logging.basicConfig(level=logging.WARNING)
+
+    table = Table(
+        title=f"bili_up_finder benchmark ({backend}, LLM 延迟 {llm_latency}s)"
+    )
+    for column in [
+        "并发",
+        "批量",
+        "缓存",
+        "轮次",
+        "耗时s",
+        "请求数",
+        "请求/s",
+        "LLM",
+        "UP主",
+        "LLM/UP",
+    ]:
+        table.add_column(column, justify="right")
+
+    with StubSite(llm_latency=llm_latency, lazy_load_ms=lazy_load_ms) as site:
+        os.environ["DEEPSEEK_API_KEY"] = "stub"
+        os.environ["DEEPSEEK_BASE_URL"] = f"{site.base_url}/v1"
+        os.environ["EMBEDDING_API_KEY"] = "stub"
+        os.environ["EMBEDDING_BASE_URL"] = f"{site.base_url}/v1"
+
+        for level in concurrency:
+            for batch_size in judge_batch_size:
+                with tempfile.TemporaryDirectory() as work_dir:
+                    config = Config(
+                        verbose=False,
+                        num_up=num_up,
+                        concurrency=level,
+                        judge_batch_size=batch_size,
+                        use_cache=not no_cache,
+                        prefilter=prefilter,
+                        judge=judge,
+                        llm_token_budget=token_budget,
+                        cache_dir=os.path.join(work_dir, "cache"),
+                        session_dir=os.path.join(work_dir, "sessions"),
+                        reports_dir=os.path.join(work_dir, "reports"),
+                        backend=backend,
+                        api_base_url=site.base_url,
+                        search_base_url=site.base_url,
+                        browser_profile=browser_profile,
+                        # 本地替身不会限流, 只测流程本身的吞吐量
+                        llm_requests_per_second=0,
+                        site_requests_per_second=0,
+                    )
+                    configure_runtime(config)
+                    configure_query_cache(
+                        None, config.query_cache_ttl_days, config.query_cache_similarity
+                    )
+
+                    for attempt in range(1, repeat + 1):
+                        result = run_once(site, config)
+                        table.add_row(
+                            str(level),
+                            str(batch_size),
+                            "关" if no_cache else "开",
+                            str(attempt),
+                            f"{result['seconds']:.2f}",
+                            str(result["pages"]),
+                            f"{result['pages_per_second']:.1f}",
+                            str(result["llm_calls"]),
+                            str(result["accepted"]),
+                            f"{result['llm_calls_per_uploader']:.2f}",
+                        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,515 @@
+"""
+本地的 Bilibili 替身和假的 OpenAI 兼容模型, 用于离线 benchmark。
+
+一个 HTTP 服务同时提供:
+- 搜索页 /all, /video, 视频页 /video/<bvid>, UP 主空间 /space/<mid>,
+  DOM 结构与 up_finder 使用的 selector 一致, 空间页的投稿列表滚动时懒加载;
+- bili_api 用到的 JSON 接口 /x/...;
+- /v1/chat/completions, 按规则回答相关性问题, 可以配置响应延迟;
+- /v1/embeddings, 按关键词出现次数生成向量。
+
+数据由固定的随机种子生成, 每次运行结果一致。
+"""
+
+import html
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Self
+from urllib.parse import parse_qs, urlparse
+
+KEYWORD = "摄影"
+RELEVANT_WORDS = ["摄影", "相机", "镜头", "构图", "人像", "风光"]
+OFF_TOPIC_WORDS = ["美食", "游戏", "健身", "数码", "旅行", "宠物"]
+PAGE_SIZE = 30
+
+
+@dataclass
+class Uploader:
+    mid: int
+    name: str
+    relevant: bool
+    deleted: bool = False
+    videos: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class Dataset:
+    uploaders: dict[int, Uploader]
+    videos: dict[str, dict]
+    search_results: list[str]  # 按搜索结果顺序排列的 bvid
+
+
+def _bvid(rng: random.Random) -> str:
+    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    return "BV1" + "".join(rng.choice(alphabet) for _ in range(9))
+
+
+def build_dataset(num_uploaders: int = 60, seed: int = 7) -> Dataset:
+    """
+    大约一半的 UP 主与关键词相关; 少数 UP 主投稿少于 10 个或账号已注销,
+    用来覆盖 min_acceptable_videos 和 404 的分支。
+    """
+    rng = random.Random(seed)
+    uploaders, videos = {}, {}
+
+    for index in range(num_uploaders):
+        mid = 10_000 + index
+        relevant = index % 2 == 0
+        uploader = Uploader(
+            mid=mid,
+            name=f"UP主{index:03d}",
+            relevant=relevant,
+            deleted=index % 17 == 16,
+        )
+        num_videos = rng.choice([6, 15, 40, 120, 400])
+        for i in range(num_videos):
+            on_topic = rng.random() < (0.85 if relevant else 0.1)
+            word = rng.choice(RELEVANT_WORDS if on_topic else OFF_TOPIC_WORDS)
+            video = {
+                "bvid": _bvid(rng),
+                "title": f"{word}日常 第{i + 1}期",
+                "tags": [word, rng.choice(OFF_TOPIC_WORDS + RELEVANT_WORDS)],
+                "play": rng.randint(100, 1_000_000),
+                "mid": mid,
+            }
+            uploader.videos.append(video)
+            videos[video["bvid"]] = video
+        uploaders[mid] = uploader
+
+    # 搜索结果偏向相关视频, 同一个 UP 主会出现多次
+    search_results = []
+    for uploader in uploaders.values():
+        picks = [
+            v for v in uploader.videos if any(w in v["title"] for w in RELEVANT_WORDS)
+        ]
+        search_results.extend(v["bvid"] for v in (picks or uploader.videos)[:2])
+    rng.shuffle(search_results)
+
+    return Dataset(uploaders=uploaders, videos=videos, search_results=search_results)
+
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{keyword}-哔哩哔哩_bilibili</title></head>
+<body>
+<div class="vui_tabs"><span class="vui_tabs--nav-text">综合</span>
+<span class="vui_tabs--nav-text">视频</span></div>
+<div class="video-list">{cards}</div>
+{next_button}
+</body></html>"""
+
+SEARCH_CARD = """<div class="video-list-item"><div class="bili-video-card">
+<div class="bili-video-card__wrap">
+<a href="/video/{bvid}" target="_blank"><img src="//i0.hdslb.com/bfs/archive/{bvid}.jpg"></a>
+<div class="bili-video-card__info"><div class="bili-video-card__info--right">
+<a href="/video/{bvid}" target="_blank"><h3 class="bili-video-card__info--tit">{title}</h3></a>
+<span class="bili-video-card__info--author">{author}</span>
+</div></div></div></div></div>"""
+
+VIDEO_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}_哔哩哔哩_bilibili</title></head>
+<body>
+<div class="tag-panel">{tags}</div>
+<div class="up-panel-container"><div class="up-info">
+<a class="up-name" href="/space/{mid}" target="_blank">{author}</a>
+</div></div>
+</body></html>"""
+
+DELETED_SPACE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>出错啦! - bilibili.com</title></head>
+<body><div class="error-code">404</div></body></html>"""
+
+# 投稿列表每次滚动到底部后延迟追加一批卡片, 模拟真实页面的懒加载
+SPACE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{author}的个人空间-哔哩哔哩</title>
+<style>.upload-video-card {{ height: 180px; }}</style></head>
+<body>
+<div class="nav-tab">
+<a class="nav-tab__item">主页</a>
+<a class="nav-tab__item" onclick="showUploads()"><span class="nav-tab__item-text">投稿</span>
+<span class="nav-tab__item-num">{count}</span></a>
+</div>
+<div id="uploads" style="display: none">
+<div class="radio-filter">
+<div class="radio-filter__item">最新发布</div>
+<div class="radio-filter__item" onclick="showMostViewed()">最多播放</div>
+</div>
+<div id="list"></div>
+</div>
+<script>
+const VIDEOS = {videos};
+const BATCH = 30;
+let order = VIDEOS, rendered = 0, loading = false;
+
+function card(v) {{
+  return `<div class="upload-video-card"><div class="bili-video-card__wrap">
+<a href="/video/${{v.bvid}}" target="_blank"><img src="//i0.hdslb.com/bfs/archive/${{v.bvid}}.jpg"></a>
+<div class="bili-video-card__title"><a href="/video/${{v.bvid}}">${{v.title}}</a></div>
+</div></div>`;
+}}
+function renderMore() {{
+  const list = document.getElementById("list");
+  list.insertAdjacentHTML("beforeend", order.slice(rendered, rendered + BATCH).map(card).join(""));
+  rendered = Math.min(rendered + BATCH, order.length);
+}}
+function reset(videos) {{
+  order = videos; rendered = 0;
+  document.getElementById("list").innerHTML = "";
+  renderMore();
+}}
+function showUploads() {{
+  document.getElementById("uploads").style.display = "block";
+  reset(VIDEOS);
+}}
+function showMostViewed() {{
+  setTimeout(() => reset([...VIDEOS].sort((a, b) => b.play - a.play)), 100);
+}}
+window.addEventListener("scroll", () => {{
+  const atBottom = window.scrollY + window.innerHeight >= document.body.scrollHeight - 50;
+  if (!atBottom || loading || rendered >= order.length) return;
+  loading = true;
+  setTimeout(() => {{ renderMore(); loading = false; }}, {lazy_load_ms});
+}});
+</script>
+</body></html>"""
+
+
+class StubState:
+    def __init__(self, dataset: Dataset, llm_latency: float, lazy_load_ms: int):
+        self.dataset = dataset
+        self.llm_latency = llm_latency
+        self.lazy_load_ms = lazy_load_ms
+        self.lock = threading.Lock()
+        self.counters = {"html_pages": 0, "api_requests": 0, "llm_requests": 0}
+
+    def incr(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+    def reset_counters(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            for name in self.counters:
+                self.counters[name] = 0
+        return counters
+
+
+def _is_relevant_text(text: str) -> bool:
+    return any(word in text for word in RELEVANT_WORDS)
+
+
+def fake_llm_answer(system: str, user: str) -> str:
+    """按 system prompt 区分是哪一种请求, 用关键词规则给出确定的回答"""
+    if "相关联的词语" in system:  # expand_search_query
+        return ", ".join(RELEVANT_WORDS)
+
+    if "JSON" in system:  # 批量判断
+        verdicts = []
+        for line in user.splitlines():
+            if match := re.match(r"(\d+)\. (.*)", line):
+                verdicts.append(
+                    {
+                        "id": int(match.group(1)),
+                        "relevant": _is_relevant_text(match.group(2)),
+                    }
+                )
+        return json.dumps(verdicts, ensure_ascii=False)
+
+    if "视频标题列表" in user:  # decide_user_space_video_relevant
+        captions = user.split("视频标题列表: ", 1)[1].split(". 搜索关键词是", 1)[0]
+        captions = captions.split(", ")
+        ratio = sum(map(_is_relevant_text, captions)) / max(len(captions), 1)
+        return "yes" if ratio > 0.5 else "no"
+
+    # decide_target_video_relevant
+    video = user.split("搜索查询是", 1)[0]
+    return "yes" if _is_relevant_text(video) else "no"
+
+
+def fake_embedding(text: str) -> list[float]:
+    """每个维度是一个相关或无关词的出现次数, 最后一维是常数, 避免零向量"""
+    return [float(text.count(word)) for word in RELEVANT_WORDS + OFF_TOPIC_WORDS] + [
+        0.5
+    ]
+
+
+def make_handler(state: StubState):
+    dataset = state.dataset
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+        def _send(self, body: str, content_type: str, status: int = 200) -> None:
+            data = body.encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                # 搜索凑够 num_up 后取消了还在进行的请求, 客户端已经断开
+                self.close_connection = True
+
+        def _html(self, body: str, status: int = 200) -> None:
+            state.incr("html_pages")
+            self._send(body, "text/html", status)
+
+        def _api(self, data, code: int = 0, message: str = "0") -> None:
+            state.incr("api_requests")
+            self._send(
+                json.dumps({"code": code, "message": message, "data": data}),
+                "application/json",
+            )
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            path = url.path
+
+            if path in ("/all", "/video"):
+                self._html(self.search_page(query))
+            elif path.startswith("/video/"):
+                self._html(self.video_page(path.removeprefix("/video/").strip("/")))
+            elif path.startswith("/space/"):
+                self._html(self.space_page(int(path.removeprefix("/space/"))))
+            elif path.startswith("/x/"):
+                self.api(path, query)
+            else:
+                self._send("not found", "text/plain", 404)
+
+        def search_page(self, query: dict) -> str:
+            page = int(query.get("page", 1))
+            bvids = dataset.search_results[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+            cards = "".join(
+                SEARCH_CARD.format(
+                    bvid=bvid,
+                    title=html.escape(dataset.videos[bvid]["title"]),
+                    author=dataset.uploaders[dataset.videos[bvid]["mid"]].name,
+                )
+                for bvid in bvids
+            )
+            has_next = page * PAGE_SIZE < len(dataset.search_results)
+            next_button = (
+                f"<button onclick=\"location.href='/video?keyword={KEYWORD}"
+                f"&page={page + 1}'\">下一页</button>"
+                if has_next
+                else ""
+            )
+            return SEARCH_PAGE.format(
+                keyword=KEYWORD, cards=cards, next_button=next_button
+            )
+
+        def video_page(self, bvid: str) -> str:
+            video = dataset.videos[bvid]
+            tags = "".join(
+                f'<div class="ordinary-tag"><a class="tag-link">{tag}</a></div>'
+                for tag in video["tags"]
+            )
+            return VIDEO_PAGE.format(
+                title=html.escape(video["title"]),
+                tags=tags,
+                mid=video["mid"],
+                author=dataset.uploaders[video["mid"]].name,
+            )
+
+        def space_page(self, mid: int) -> str:
+            uploader = dataset.uploaders[mid]
+            if uploader.deleted:
+                return DELETED_SPACE_PAGE
+            videos = [
+                {"bvid": v["bvid"], "title": v["title"], "play": v["play"]}
+                for v in uploader.videos
+            ]
+            return SPACE_PAGE.format(
+                author=uploader.name,
+                count=len(videos),
+                videos=json.dumps(videos, ensure_ascii=False),
+                lazy_load_ms=state.lazy_load_ms,
+            )
+
+        def api(self, path: str, query: dict) -> None:
+            if path == "/x/frontend/finger/spi":
+                self._api({"b_3": "STUB-BUVID3", "b_4": "STUB-BUVID4"})
+            elif path == "/x/web-interface/nav":
+                self._api(
+                    {
+                        "wbi_img": {
+                            "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                            "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+                        }
+                    },
+                    code=-101,
+                    message="账号未登录",
+                )
+            elif path == "/x/web-interface/wbi/search/type":
+                page = int(query.get("page", 1))
+                bvids = dataset.search_results[
+                    (page - 1) * PAGE_SIZE : page * PAGE_SIZE
+                ]
+                result = []
+                for bvid in bvids:
+                    video = dataset.videos[bvid]
+                    title = video["title"].replace(
+                        KEYWORD, f'<em class="keyword">{KEYWORD}</em>'
+                    )
+                    result.append(
+                        {
+                            "bvid": bvid,
+                            "title": title,
+                            "author": dataset.uploaders[video["mid"]].name,
+                            "mid": video["mid"],
+                        }
+                    )
+                self._api({"result": result})
+            elif path == "/x/tag/archive/tags":
+                video = dataset.videos[query["bvid"]]
+                self._api([{"tag_name": tag} for tag in video["tags"]])
+            elif path == "/x/web-interface/card":
+                uploader = dataset.uploaders[int(query["mid"])]
+                if uploader.deleted:
+                    self._api(None, code=-404, message="啥都木有")
+                else:
+                    self._api(
+                        {
+                            "card": {"mid": str(uploader.mid), "name": uploader.name},
+                            "archive_count": len(uploader.videos),
+                        }
+                    )
+            elif path == "/x/space/wbi/arc/search":
+                uploader = dataset.uploaders[int(query["mid"])]
+                videos = uploader.videos
+                if query.get("order") == "click":
+                    videos = sorted(videos, key=lambda v: -v["play"])
+                pn, ps = int(query.get("pn", 1)), int(query.get("ps", 30))
+                vlist = [
+                    {
+                        "bvid": v["bvid"],
+                        "title": v["title"],
+                        "pic": f"http://i0.hdslb.com/bfs/archive/{v['bvid']}.jpg",
+                        "play": v["play"],
+                    }
+                    for v in videos[(pn - 1) * ps : pn * ps]
+                ]
+                self._api(
+                    {
+                        "list": {"vlist": vlist},
+                        "page": {"pn": pn, "ps": ps, "count": len(videos)},
+                    }
+                )
+            else:
+                self._api(None, code=-404, message="啥都木有")
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            if self.path.endswith("/embeddings"):
+                self.embeddings(request)
+                return
+            if not self.path.endswith("/chat/completions"):
+                self._send("not found", "text/plain", 404)
+                return
+
+            messages = request["messages"]
+            system = next((m["content"] for m in messages if m["role"] == "system"), "")
+            user = next((m["content"] for m in messages if m["role"] == "user"), "")
+
+            state.incr("llm_requests")
+            time.sleep(state.llm_latency)
+
+            answer = fake_llm_answer(system or "", user)
+            prompt_tokens = len(system or "") + len(user)
+            self._send(
+                json.dumps(
+                    {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "deepseek-chat"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": answer},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": len(answer),
+                            "total_tokens": prompt_tokens + len(answer),
+                        },
+                    },
+                    ensure_ascii=False,
+                ),
+                "application/json",
+            )
+
+        def embeddings(self, request: dict) -> None:
+            state.incr("llm_requests")
+            time.sleep(state.llm_latency)
+
+            inputs = request["input"]
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            tokens = sum(map(len, inputs))
+            self._send(
+                json.dumps(
+                    {
+                        "object": "list",
+                        "data": [
+                            {
+                                "object": "embedding",
+                                "index": i,
+                                "embedding": fake_embedding(text),
+                            }
+                            for i, text in enumerate(inputs)
+                        ],
+                        "model": request.get("model", "stub-embedding"),
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                    }
+                ),
+                "application/json",
+            )
+
+    return Handler
+
+
+class StubSite:
+    """在后台线程里运行替身服务, 用 with 语句启动和关闭"""
+
+    def __init__(
+        self,
+        dataset: Dataset | None = None,
+        llm_latency: float = 0.5,
+        lazy_load_ms: int = 300,
+        port: int = 0,
+    ):
+        self.state = StubState(dataset or build_dataset(), llm_latency, lazy_load_ms)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self.state))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> Self:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    with StubSite() as site:
+        print(f"Stub site running at {site.base_url}, Ctrl-C to stop")
+        try:
+            site.thread.join()
+        except KeyboardInterrupt:
+            pass
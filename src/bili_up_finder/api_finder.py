@@ -0,0 +1,207 @@
+"""
+基于 JSON 接口的搜索流程, 与 up_finder 里的浏览器流程判断逻辑一致,
+但每个候选视频只需要几个 HTTP 请求, 不需要打开页面。
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+
+from bili_up_finder.bili_api import BiliApiClient
+from bili_up_finder.cache.space_cache import (
+    captions_from_other_query,
+    get_space_cache,
+    new_snapshot,
+)
+from bili_up_finder.config import Config
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.pipeline import (
+    PageProgress,
+    Stage,
+    VideoCandidate,
+    crawl_pipeline,
+)
+from bili_up_finder.search_helper.ai_search_helper import (
+    TargetVideoBatcher,
+    decide_user_space_video_relevant_async,
+)
+from bili_up_finder.search_helper.local_score import (
+    count_keyword_hits,
+    expanded_keywords,
+)
+from bili_up_finder.session import SearchSession, video_key
+
+logger = logging.getLogger(__name__)
+
+
+async def sampled_video_captions(
+    api: BiliApiClient, mid: int, total: int, search_query: str, config: Config
+) -> tuple[list[str], bool]:
+    """
+    最新的 caption_recent 个标题, 加上从更早的投稿里按页等间隔抽取的
+    caption_sample 个标题。最新标题已经足够多地命中扩展关键词时不再抽样。
+    返回 (标题列表, 是否因为命中关键词提前停止)
+    """
+    recent, _ = await api.uploader_videos(mid, page_size=config.caption_recent)
+    captions = [video["title"] for video in recent]
+
+    keywords = expanded_keywords(search_query)
+    if (
+        config.caption_conclusive_hits
+        and count_keyword_hits(captions, keywords) >= config.caption_conclusive_hits
+    ):
+        get_metrics().incr("caption_early_exits")
+        return captions, True
+
+    # 每页取 page_size 个, 从 caption_recent 之后的页里等间隔选页
+    page_size = 10
+    first_page = -(-config.caption_recent // page_size) + 1
+    last_page = (total - 1) // page_size + 1
+    if config.caption_sample == 0 or last_page < first_page:
+        return captions, False
+
+    num_pages = min(-(-config.caption_sample // page_size), last_page - first_page + 1)
+    step = (last_page - first_page + 1) / num_pages
+    pages = sorted({first_page + int(i * step) for i in range(num_pages)})
+
+    sampled = await asyncio.gather(
+        *(api.uploader_videos(mid, page=page, page_size=page_size) for page in pages)
+    )
+    older = [video["title"] for videos, _ in sampled for video in videos]
+    return captions + older[: config.caption_sample], False
+
+
+async def inspect_uploader(
+    api: BiliApiClient,
+    mid: int,
+    search_query: str,
+    config: Config,
+) -> dict | None:
+    """对应 go_to_user_space, UP 主的投稿与搜索相关时返回 UP 主信息"""
+    metrics = get_metrics()
+    space_cache = get_space_cache()
+    profile_url = f"https://space.bilibili.com/{mid}"
+
+    snapshot = space_cache.get(profile_url)
+    if snapshot is None:
+        with metrics.span("space_load"):
+            card = await api.uploader_card(mid)
+        if card is None:  # 账号已经注销
+            snapshot = new_snapshot("", deleted=True)
+        else:
+            snapshot = new_snapshot(card["name"], num_videos=card["archive_count"])
+        space_cache.set(profile_url, snapshot)
+    else:
+        metrics.incr("space_cache_hits")
+
+    if snapshot["deleted"]:
+        return None
+
+    uploader = snapshot["uploader"]
+    if snapshot["num_videos"] <= config.min_acceptable_videos:
+        logger.info(
+            f"UP主 {uploader} 的视频数量 {snapshot['num_videos']} "
+            f"小于最小可接受数量 {config.min_acceptable_videos}，跳过。"
+        )
+        return None
+
+    if snapshot["captions"] is None or captions_from_other_query(
+        snapshot, search_query
+    ):
+        with metrics.span("caption_scroll"):
+            captions, exited_early = await sampled_video_captions(
+                api, mid, snapshot["num_videos"], search_query, config
+            )
+        snapshot["captions"] = captions
+        snapshot["captions_query"] = search_query if exited_early else None
+        space_cache.set(profile_url, snapshot)
+
+    if not await decide_user_space_video_relevant_async(
+        snapshot["captions"], search_query, config.verbose
+    ):
+        return None
+
+    if snapshot["top_videos"] is None:
+        with metrics.span("top_videos"):
+            snapshot["top_videos"], _ = await api.uploader_videos(
+                mid, order="click", page_size=10
+            )
+        space_cache.set(profile_url, snapshot)
+    logger.info(f"UP主 {uploader} 符合搜索结果...")
+
+    return {
+        "uploader": uploader,
+        "profile": profile_url,
+        "videos": snapshot["top_videos"],
+    }
+
+
+async def search_candidates(
+    api: BiliApiClient, search_query: str, page_no: int, config: Config
+) -> list[VideoCandidate]:
+    """搜索结果的第 page_no 页, 没有更多结果时返回空列表"""
+    with get_metrics().span("search_page"):
+        results = await api.search_videos(search_query, page_no)
+
+    return [
+        VideoCandidate(
+            page_no,
+            f"https://www.bilibili.com/video/{result['bvid']}",
+            result["author"],
+            title=result["title"],
+            uploader=result["author"],
+            profile_url=f"https://space.bilibili.com/{result['mid']}",
+            mid=result["mid"],
+        )
+        for result in results[: config.video_go_through_per_page]
+    ]
+
+
+async def fetch_tags(api: BiliApiClient, candidate: VideoCandidate) -> None:
+    """对应 read_video_page, 标题和 UP 主已经在搜索结果里, 只需要标签"""
+    with get_metrics().span("video_page"):
+        candidate.tags = await api.video_tags(video_key(candidate.href))
+    logger.debug(f"标题: {candidate.title}, 标签: {candidate.tags}")
+
+
+async def crawl_with_api(
+    search_query: str,
+    expanded_query: str,
+    config: Config,
+    session: SearchSession,
+    on_accept: Callable[[dict], None] | None = None,
+) -> None:
+    """从 session.page 开始逐页搜索, 直到凑够 num_up 个 UP 主或没有更多结果"""
+    batcher = TargetVideoBatcher.from_config(expanded_query, config)
+
+    async with BiliApiClient(
+        api_base_url=config.api_base_url, max_connections=config.concurrency * 2
+    ) as api:
+
+        async def produce(
+            scrape: Stage, progress: PageProgress, stop: asyncio.Event
+        ) -> None:
+            page_no = session.page
+            while not stop.is_set():
+                candidates = await search_candidates(api, search_query, page_no, config)
+                if not candidates:
+                    logger.info("没有更多页面了，停止搜索。")
+                    return
+
+                for candidate in candidates:
+                    progress.add(page_no)
+                    await scrape.put(candidate)
+                page_no += 1
+                progress.advance(page_no)
+
+        async def fetch_details(candidate: VideoCandidate) -> None:
+            # 已经有判断结果的视频不需要标签
+            if session.video_verdicts.get(video_key(candidate.href)) is None:
+                await fetch_tags(api, candidate)
+
+        async def inspect_space(candidate: VideoCandidate) -> dict | None:
+            return await inspect_uploader(api, candidate.mid, expanded_query, config)
+
+        await crawl_pipeline(
+            session, config, batcher, produce, fetch_details, inspect_space, on_accept
+        )
@@ -1,26 +1,61 @@
 import os
 from abc import ABC, abstractmethod
 
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
+
+from bili_up_finder.budget import record_llm_usage
+from bili_up_finder.llm_clients import get_async_client, get_client
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.ratelimit import RETRY, THROTTLED, retry_async, retry_sync
+
+
+def classify_llm_error(e: BaseException) -> str | None:
+    """429 降低并发后重试, 超时, 连接错误和 5xx 直接重试, 其他错误不重试"""
+    if isinstance(e, openai.RateLimitError):
+        return THROTTLED
+    if isinstance(
+        e,
+        (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError),
+    ):
+        return RETRY
+    return None
 
 
 class Assistant(ABC):
+    provider: str
+    base_url: str | None = None
+
     def __init__(
         self,
         model: str,
         api_key: str | None = None,
         instructions: str | None = None,
         verbose: bool = False,
+        stage: str = "llm",
     ):
+        """stage: 用量统计里的阶段名"""
         self.model = model
         self.api_key = api_key
         self.instructions = instructions
         self.verbose = verbose
+        self.stage = stage
 
     @abstractmethod
     def setup_client():
         pass
 
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return get_async_client(self.provider, self.base_url, self.api_key)
+
+    def _record_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        metrics = get_metrics()
+        metrics.incr("llm_calls")
+        metrics.incr("llm_prompt_tokens", prompt_tokens)
+        metrics.incr("llm_completion_tokens", completion_tokens)
+        record_llm_usage(self.stage, self.model, prompt_tokens, completion_tokens)
+
     @abstractmethod
     def ask(self, user_input: str) -> str:
         """
@@ -28,18 +63,29 @@ class Assistant(ABC):
         :param task: The task to assist with.
         :return: A string response from the assistant.
         """
-        pass
+
+    @abstractmethod
+    async def ask_async(self, user_input: str) -> str:
+        """
+        Awaitable version of `ask`, does not block the event loop.
+        :param user_input: The task to assist with.
+        :return: A string response from the assistant.
+        """
 
 
 class DeepSeekAssistant(Assistant):
+    provider = "deepseek"
+    base_url = "https://api.deepseek.com"
+
     def __init__(
         self,
         model: str = "deepseek-chat",
         api_key: str | None = None,
         instructions: str | None = None,
         verbose: bool = False,
+        stage: str = "llm",
     ):
-        super().__init__(model, api_key, instructions, verbose)
+        super().__init__(model, api_key, instructions, verbose, stage)
         self.setup_client()
 
     def setup_client(self):
@@ -47,51 +93,125 @@ class DeepSeekAssistant(Assistant):
             if not (api_key_from_env := os.getenv("DEEPSEEK_API_KEY")):
                 raise ValueError("DEEPSEEK_API_KEY environment variable is not set.")
             self.api_key = api_key_from_env
+        # 可以指向兼容 OpenAI 接口的本地服务, 例如 benchmarks 里的假模型
+        self.base_url = os.getenv("DEEPSEEK_BASE_URL") or self.base_url
 
-        self.client = OpenAI(api_key=self.api_key, base_url="https://api.deepseek.com")
+        self.client = get_client(self.provider, self.base_url, self.api_key)
 
-    def ask(self, user_input: str) -> str:
+    def _messages(self, user_input: str) -> list[dict]:
+        # 每次请求重新拼接, 不修改 self.instructions, 否则说明会越加越长
+        instructions = self.instructions
         if self.verbose:
             reason = " 以及在yes或no之后, 告诉我你为什么这么认为。"
-            self.instructions += f" {reason}"
+            instructions += f" {reason}"
 
-        response = self.client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": self.instructions},
-                {"role": "user", "content": user_input},
-            ],
-            stream=False,
-        )
+        return [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": user_input},
+        ]
 
+    def ask(self, user_input: str) -> str:
+        with get_metrics().span("llm_call"):
+            response = retry_sync(
+                lambda: self.client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=self._messages(user_input),
+                    stream=False,
+                ),
+                classify_llm_error,
+                key=self.provider,
+                kind="llm",
+            )
+
+        if response.usage:
+            self._record_usage(
+                response.usage.prompt_tokens, response.usage.completion_tokens
+            )
+        return response.choices[0].message.content
+
+    async def ask_async(self, user_input: str) -> str:
+        with get_metrics().span("llm_call"):
+            response = await retry_async(
+                lambda: self.async_client.chat.completions.create(
+                    model="deepseek-chat",
+                    messages=self._messages(user_input),
+                    stream=False,
+                ),
+                classify_llm_error,
+                key=self.provider,
+                kind="llm",
+            )
+
+        if response.usage:
+            self._record_usage(
+                response.usage.prompt_tokens, response.usage.completion_tokens
+            )
         return response.choices[0].message.content
 
 
 class OpenAIAssistant(Assistant):
+    provider = "openai"
+
     def __init__(
         self,
         model: str = "gpt-4.1-mini",
         api_key: str | None = None,
         instructions: str | None = None,
         verbose: bool = False,
+        stage: str = "llm",
     ):
-        super().__init__(model, api_key, instructions, verbose)
+        super().__init__(model, api_key, instructions, verbose, stage)
         self.setup_client()
 
     def setup_client(self):
-        if not os.getenv("OPENAI_API_KEY"):
-            raise ValueError("OPENAI_API_KEY environment variable is not set.")
-        self.client = OpenAI()
+        if not self.api_key:
+            if not (api_key_from_env := os.getenv("OPENAI_API_KEY")):
+                raise ValueError("OPENAI_API_KEY environment variable is not set.")
+            self.api_key = api_key_from_env
 
-    def ask(self, user_input: str) -> str:
+        self.client = get_client(self.provider, self.base_url, self.api_key)
+
+    def _instructions(self) -> str:
         if self.verbose:
             reason = " 在yes或no之后, 告诉我你为什么这么认为。"
-            self.instructions += f" {reason}"
+            return f"{self.instructions} {reason}"
+
+        return self.instructions
 
-        response = self.client.responses.create(
-            model=self.model,
-            instructions=self.instructions,
-            input=user_input,
-        )
+    def ask(self, user_input: str) -> str:
+        with get_metrics().span("llm_call"):
+            response = retry_sync(
+                lambda: self.client.responses.create(
+                    model=self.model,
+                    instructions=self._instructions(),
+                    input=user_input,
+                ),
+                classify_llm_error,
+                key=self.provider,
+                kind="llm",
+            )
+
+        if response.usage:
+            self._record_usage(
+                response.usage.input_tokens, response.usage.output_tokens
+            )
+        return response.output_text
 
+    async def ask_async(self, user_input: str) -> str:
+        with get_metrics().span("llm_call"):
+            response = await retry_async(
+                lambda: self.async_client.responses.create(
+                    model=self.model,
+                    instructions=self._instructions(),
+                    input=user_input,
+                ),
+                classify_llm_error,
+                key=self.provider,
+                kind="llm",
+            )
+
+        if response.usage:
+            self._record_usage(
+                response.usage.input_tokens, response.usage.output_tokens
+            )
         return response.output_text
@@ -0,0 +1,65 @@
+"""
+批量搜索: 从文件读取多个关键词, 共用一个浏览器和一组 context。
+
+UP 主空间快照和 LLM 判断结果在进程内共享, 相近关键词命中同一个 UP 主时
+不会重复打开空间页, 也不会重复判断同一个视频。
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from bili_up_finder.browser import ContextPool
+from bili_up_finder.config import Config
+from bili_up_finder.llm_clients import aclose_clients
+from bili_up_finder.up_finder import ensure_auth_state, run_query
+from bili_up_finder.web_builder import run_batch_index
+
+logger = logging.getLogger(__name__)
+
+
+def read_queries(path: str | Path) -> list[str]:
+    """每行一个关键词, 忽略空行和 # 开头的注释, 重复的关键词只保留一次"""
+    queries: list[str] = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        query = line.strip()
+        if query and not query.startswith("#") and query not in queries:
+            queries.append(query)
+    return queries
+
+
+async def run_batch(queries: list[str], config: Config) -> dict[str, list[dict]]:
+    """返回 {关键词: UP 主信息}, 每个关键词各自生成报告, 最后生成汇总页"""
+    queries = list(dict.fromkeys(queries))
+    ensure_auth_state()
+    results: dict[str, list[dict]] = {}
+    slots = asyncio.Semaphore(config.batch_contexts)
+
+    async def run_one(search_query: str) -> None:
+        async with slots:
+            try:
+                results[search_query] = await run_query(
+                    search_query, config, contexts=contexts
+                )
+            except Exception:
+                # 一个关键词失败不影响其他关键词
+                logger.exception(f"关键词 {search_query} 搜索失败")
+                results[search_query] = []
+
+    try:
+        async with async_playwright() as p:
+            # 只有需要浏览器的关键词才会真正启动浏览器
+            contexts = ContextPool(p, config, size=config.batch_contexts)
+            try:
+                await asyncio.gather(*(run_one(query) for query in queries))
+            finally:
+                await contexts.close()
+    finally:
+        await aclose_clients()
+
+    # 按输入顺序输出
+    results = {query: results[query] for query in queries}
+    run_batch_index(results, config.reports_dir)
+    return results
@@ -0,0 +1,240 @@
+"""
+直接调用 Bilibili 网页端的 JSON 接口, 不渲染页面。
+
+复用 playwright/.auth/state.json 里的 cookie, 所有请求共用一个带连接池的 httpx 客户端。
+api_base_url 可以指向本地的桩服务器, 用录制的响应做测试。
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+import urllib.parse
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Self
+
+import httpx
+
+from bili_up_finder.ratelimit import RETRY, THROTTLED, retry_async
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = "https://api.bilibili.com"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+)
+
+# WBI 签名用的重排表, 见 bilibili-API-collect
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52,
+]  # fmt: skip
+
+
+class BiliApiError(RuntimeError):
+    def __init__(self, code: int, message: str):
+        super().__init__(f"Bilibili API error {code}: {message}")
+        self.code = code
+
+
+# -412 请求被拦截, -509 / -799 请求过于频繁
+THROTTLE_CODES = {-412, -509, -799}
+# 不是接口返回的错误码: 响应不是 JSON (例如风控页面) 或者字段结构变了
+UNEXPECTED_RESPONSE = -10000
+
+
+def classify_api_error(e: BaseException) -> str | None:
+    if isinstance(e, BiliApiError):
+        return THROTTLED if e.code in THROTTLE_CODES else None
+    if isinstance(e, httpx.HTTPStatusError):
+        if e.response.status_code in (412, 429):
+            return THROTTLED
+        return RETRY if e.response.status_code >= 500 else None
+    if isinstance(e, httpx.TransportError):
+        return RETRY
+    return None
+
+
+@contextmanager
+def _unexpected_response(path: str) -> Iterator[None]:
+    """解析响应时的 KeyError / ValueError 等转成 BiliApiError, 调用方据此改用浏览器"""
+    try:
+        yield
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError) as e:
+        raise BiliApiError(
+            UNEXPECTED_RESPONSE, f"{path} 响应格式不符: {type(e).__name__}: {e}"
+        ) from e
+
+
+def _https(url: str) -> str:
+    if url.startswith("//"):
+        return "https:" + url
+    if url.startswith("http://"):
+        return "https://" + url.removeprefix("http://")
+    return url
+
+
+def _strip_html(text: str) -> str:
+    # 搜索结果的标题带有 <em class="keyword"> 高亮
+    return re.sub(r"<[^>]+>", "", text).strip()
+
+
+def load_state_cookies(state_path: str | Path) -> httpx.Cookies:
+    cookies = httpx.Cookies()
+    path = Path(state_path)
+    if not path.exists():
+        return cookies
+
+    state = json.loads(path.read_text(encoding="utf-8") or "{}")
+    for cookie in state.get("cookies", []):
+        cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain", ""),
+            path=cookie.get("path", "/"),
+        )
+    return cookies
+
+
+class BiliApiClient:
+    def __init__(
+        self,
+        api_base_url: str = API_BASE_URL,
+        state_path: str | Path = "playwright/.auth/state.json",
+        max_connections: int = 10,
+        timeout: float = 10.0,
+    ):
+        self.client = httpx.AsyncClient(
+            base_url=api_base_url,
+            cookies=load_state_cookies(state_path),
+            headers={"User-Agent": USER_AGENT, "Referer": "https://www.bilibili.com"},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+        )
+        self._mixin_key: str | None = None
+        self._host = urllib.parse.urlparse(api_base_url).netloc
+
+    async def __aenter__(self) -> Self:
+        await self.ensure_buvid()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.aclose()
+
+    async def _get(self, path: str, params: dict, sign: bool = False) -> dict:
+        """被限流或网络错误时按 ratelimit 的策略重试, 同一个域名共用限速器"""
+
+        async def get() -> dict:
+            # 重试时重新签名, wts 需要是当前时间
+            signed = await self._sign(params) if sign else params
+            response = await self.client.get(path, params=signed)
+            response.raise_for_status()
+            with _unexpected_response(path):
+                body = response.json()
+                code = body.get("code", 0)
+                if code == 0:
+                    return body.get("data") or {}
+                message = body.get("message", "")
+            raise BiliApiError(code, message)
+
+        return await retry_async(get, classify_api_error, key=self._host)
+
+    async def ensure_buvid(self) -> None:
+        """搜索接口需要 buvid3, 没有登录状态时先申请一个"""
+        if any(cookie.name == "buvid3" for cookie in self.client.cookies.jar):
+            return
+        data = await self._get("/x/frontend/finger/spi", {})
+        with _unexpected_response("/x/frontend/finger/spi"):
+            self.client.cookies.set("buvid3", data["b_3"])
+
+    async def _sign(self, params: dict) -> dict:
+        if self._mixin_key is None:
+            nav = await self.client.get("/x/web-interface/nav")
+            with _unexpected_response("/x/web-interface/nav"):
+                wbi_img = nav.json()["data"]["wbi_img"]
+                img_key = Path(urllib.parse.urlparse(wbi_img["img_url"]).path).stem
+                sub_key = Path(urllib.parse.urlparse(wbi_img["sub_url"]).path).stem
+            orig = img_key + sub_key
+            self._mixin_key = "".join(orig[i] for i in MIXIN_KEY_ENC_TAB)[:32]
+
+        signed = dict(params, wts=round(time.time()))
+        signed = {
+            key: "".join(c for c in str(value) if c not in "!'()*")
+            for key, value in sorted(signed.items())
+        }
+        query = urllib.parse.urlencode(signed)
+        signed["w_rid"] = hashlib.md5(
+            (query + self._mixin_key).encode("utf-8")
+        ).hexdigest()
+        return signed
+
+    async def search_videos(self, keyword: str, page: int = 1) -> list[dict]:
+        """返回搜索结果, 每项包含 bvid, title, author, mid"""
+        path = "/x/web-interface/wbi/search/type"
+        data = await self._get(
+            path,
+            {"search_type": "video", "keyword": keyword, "page": page},
+            sign=True,
+        )
+        with _unexpected_response(path):
+            return [
+                {
+                    "bvid": item["bvid"],
+                    "title": _strip_html(item["title"]),
+                    "author": item["author"],
+                    "mid": item["mid"],
+                }
+                for item in data.get("result") or []
+            ]
+
+    async def video_tags(self, bvid: str) -> list[str]:
+        data = await self._get("/x/tag/archive/tags", {"bvid": bvid})
+        with _unexpected_response("/x/tag/archive/tags"):
+            return [tag["tag_name"] for tag in data or []]
+
+    async def uploader_card(self, mid: int) -> dict | None:
+        """UP 主昵称和投稿数量, 账号不存在或已注销时返回 None"""
+        try:
+            data = await self._get("/x/web-interface/card", {"mid": mid})
+        except BiliApiError as e:
+            if e.code == -404:
+                return None
+            raise
+        with _unexpected_response("/x/web-interface/card"):
+            return {
+                "name": data["card"]["name"],
+                "archive_count": data["archive_count"],
+            }
+
+    async def uploader_videos(
+        self, mid: int, order: str = "pubdate", page: int = 1, page_size: int = 50
+    ) -> tuple[list[dict], int]:
+        """
+        UP 主的投稿列表, order 为 pubdate (最新发布) 或 click (最多播放)。
+        返回 (当前页视频列表, 投稿总数), 视频格式与 collect_top_videos 一致。
+        """
+        path = "/x/space/wbi/arc/search"
+        data = await self._get(
+            path,
+            {"mid": mid, "order": order, "pn": page, "ps": page_size},
+            sign=True,
+        )
+        with _unexpected_response(path):
+            videos = [
+                {
+                    "title": video["title"],
+                    "href": f"https://www.bilibili.com/video/{video['bvid']}",
+                    "thumb": _https(video["pic"]),
+                }
+                for video in data["list"]["vlist"]
+            ]
+            return videos, data["page"]["count"]
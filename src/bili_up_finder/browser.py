@@ -0,0 +1,299 @@
+"""
+浏览器启动配置。
+
+performance 配置下无头运行, 拦截图片/视频/字体和统计脚本, 并且等待具体的
+selector 出现, 而不是等 networkidle。缩略图地址仍然可以从 DOM 属性里读到。
+
+每个 context 带一个标签页池, 视频页和 UP 主空间复用已经打开的标签页,
+用 goto 跳转到新地址, 不需要每个视频都新建页面。
+"""
+
+import asyncio
+import logging
+import time
+import urllib.parse
+import weakref
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from playwright.async_api import Error as PWError
+from playwright.async_api import TimeoutError as PWTimeout
+
+from bili_up_finder.config import Config
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.ratelimit import RETRY, retry_async
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_URL_PARTS = (
+    "data.bilibili.com",
+    "cm.bilibili.com",
+    "/x/click-interface/",
+    "hm.baidu.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+)
+
+
+@dataclass
+class BrowserStats:
+    page_loads: list[float] = field(default_factory=list)
+    bytes_transferred: int = 0
+    blocked_requests: int = 0
+
+    def log_summary(self) -> None:
+        average = sum(self.page_loads) / len(self.page_loads) if self.page_loads else 0
+        logger.info(
+            f"页面加载 {len(self.page_loads)} 次, 平均 {average:.2f}s, "
+            f"传输 {self.bytes_transferred / 1024 / 1024:.1f} MB, "
+            f"拦截请求 {self.blocked_requests} 个"
+        )
+
+
+_context_stats: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+# 标签页最近一次 goto 开始的时间, 页面加载耗时从这里算到 wait_until_ready 结束
+_navigation_started: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_browser_stats(context) -> BrowserStats:
+    return _context_stats.setdefault(context, BrowserStats())
+
+
+def pop_browser_stats(context) -> BrowserStats:
+    """取出并清空 context 的统计, 同一个 context 可以被多次搜索复用"""
+    return _context_stats.pop(context, BrowserStats())
+
+
+class PagePool:
+    """
+    context 内可以复用的标签页, 最多同时打开 size 个, 都在使用时等待。
+    每个标签页使用 max_uses 次后关闭重建, 避免长时间运行的渲染进程占用越来越多内存;
+    使用过程中出错的标签页状态未知, 直接关闭。
+    """
+
+    def __init__(self, context, size: int, max_uses: int):
+        self.context = context
+        self.max_uses = max_uses
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list = []
+        self._uses: dict = {}
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._slots:
+            page = self._idle.pop() if self._idle else None
+            if page is None or page.is_closed():
+                page = await self.context.new_page()
+                self._uses[page] = 0
+                get_metrics().incr("pages_opened")
+            else:
+                get_metrics().incr("pages_reused")
+
+            reusable = False
+            try:
+                yield page
+                reusable = True
+            finally:
+                self._uses[page] += 1
+                if (
+                    reusable
+                    and self._uses[page] < self.max_uses
+                    and not page.is_closed()
+                ):
+                    self._idle.append(page)
+                else:
+                    del self._uses[page]
+                    if not page.is_closed():
+                        await page.close()
+
+
+_page_pools: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_page_pool(context) -> PagePool:
+    return _page_pools[context]
+
+
+async def launch_browser(p, config: Config):
+    """按照 config.browser_profile 启动浏览器"""
+    return await p.chromium.launch(headless=config.browser_profile == "performance")
+
+
+async def new_context(browser, config: Config):
+    """创建带登录状态的 context, performance 配置下拦截大资源和统计脚本"""
+    context = await browser.new_context(storage_state="playwright/.auth/state.json")
+
+    async def on_request_finished(request) -> None:
+        try:
+            sizes = await request.sizes()
+        except PWError:  # 页面已经关闭
+            return
+        get_browser_stats(context).bytes_transferred += (
+            sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        )
+
+    context.on("requestfinished", on_request_finished)
+    _page_pools[context] = PagePool(
+        context, config.page_pool_size, config.page_max_uses
+    )
+
+    if config.browser_profile == "performance":
+
+        async def block_heavy_resources(route) -> None:
+            request = route.request
+            if request.resource_type in BLOCKED_RESOURCE_TYPES or any(
+                part in request.url for part in BLOCKED_URL_PARTS
+            ):
+                get_browser_stats(context).blocked_requests += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", block_heavy_resources)
+
+    return context
+
+
+class ContextPool:
+    """
+    共用一个浏览器的 context 池。第一次 acquire 时才启动浏览器,
+    最多创建 size 个 context, 用完放回池中给下一个搜索使用。
+    """
+
+    def __init__(self, p, config: Config, size: int = 1):
+        self.p = p
+        self.config = config
+        self.size = size
+        self.browser = None
+        self._created = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._lock:
+            if self._idle.empty() and self._created < self.size:
+                if self.browser is None:
+                    self.browser = await launch_browser(self.p, self.config)
+                self._idle.put_nowait(await new_context(self.browser, self.config))
+                self._created += 1
+
+        context = await self._idle.get()
+        try:
+            yield context
+        finally:
+            self._idle.put_nowait(context)
+
+    async def close(self) -> None:
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+
+
+def classify_page_error(e: BaseException) -> str | None:
+    """页面加载超时或网络错误时重试"""
+    if isinstance(e, PWTimeout):
+        return RETRY
+    if isinstance(e, PWError) and "net::" in str(e):
+        return RETRY
+    return None
+
+
+async def goto(page, url: str, **kwargs):
+    """page.goto 加上重试, 同一个域名共用限速器"""
+    _navigation_started[page] = time.perf_counter()
+    return await retry_async(
+        lambda: page.goto(url, **kwargs),
+        classify_page_error,
+        key=urllib.parse.urlparse(url).netloc,
+    )
+
+
+async def wait_until_ready(
+    page, selector: str, config: Config, timeout: float = 15_000
+) -> None:
+    """
+    等待页面可用。默认配置等待 networkidle;
+    performance 配置只等待需要读取的 selector 挂到 DOM 上。
+    记录的页面加载耗时包括之前的 goto 导航。
+    """
+    start = _navigation_started.pop(page, None) or time.perf_counter()
+    if config.browser_profile == "performance":
+        try:
+            await page.wait_for_selector(selector, state="attached", timeout=timeout)
+        except PWTimeout:
+            logger.debug(f"等待 {selector} 超时: {page.url}")
+    else:
+        await page.wait_for_load_state("networkidle")
+
+    get_browser_stats(page.context).page_loads.append(time.perf_counter() - start)
+
+
+# 滚动到底部, 用 MutationObserver 等待匹配 selector 的元素数量超过 before,
+# 超时后返回当前数量。返回 [数量, 等待的毫秒数]
+_SCROLL_AND_WAIT_JS = """
+async ({selector, before, timeout}) => {
+  const count = () => document.querySelectorAll(selector).length;
+  const start = performance.now();
+  window.scrollTo(0, document.documentElement.scrollHeight);
+  if (count() > before) return [count(), 0];
+
+  return await new Promise(resolve => {
+    const done = () => {
+      observer.disconnect();
+      clearTimeout(timer);
+      resolve([count(), performance.now() - start]);
+    };
+    const observer = new MutationObserver(() => {
+      if (count() > before) done();
+    });
+    observer.observe(document.body, {childList: true, subtree: true});
+    const timer = setTimeout(done, timeout);
+  });
+}
+"""
+
+
+async def scroll_until_loaded(
+    page,
+    selector: str,
+    target: int | None = None,
+    until: Callable[[int], Awaitable[bool]] | None = None,
+    max_rounds: int = 50,
+    initial_timeout: float = 1500,
+    min_timeout: float = 250,
+    max_timeout: float = 4000,
+) -> int:
+    """
+    滚动触发懒加载, 返回最终匹配 selector 的元素数量。
+    每次滚动后等到元素数量增加就继续, 不再固定等待。等待时间按上一次加载耗时调整,
+    连续两次等不到新元素 (第二次等待时间加倍) 认为已经到底。
+    - target: 元素数量达到后停止
+    - until(count): 返回 True 时停止, 例如已有足够多标题命中关键词
+    - max_rounds: 最多滚动次数
+    """
+    count = await page.locator(selector).count()
+    timeout = initial_timeout
+    stalls = 0
+    for _ in range(max_rounds):
+        if target is not None and count >= target:
+            break
+        if until is not None and await until(count):
+            break
+
+        loaded, waited = await page.evaluate(
+            _SCROLL_AND_WAIT_JS,
+            {"selector": selector, "before": count, "timeout": timeout},
+        )
+        if loaded > count:
+            count, stalls = loaded, 0
+            timeout = min(max_timeout, max(min_timeout, waited * 3))
+        else:
+            stalls += 1
+            if stalls >= 2:
+                break
+            timeout = min(max_timeout, timeout * 2)
+
+    return count
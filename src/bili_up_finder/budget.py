@@ -0,0 +1,101 @@
+"""
+LLM 用量的费用估算和每次运行的预算。
+
+token 数来自接口返回的 usage, 累计在当前运行的 RunMetrics 里。
+预算剩余不到 reserve 时 (并发中的请求还会继续消耗), 相关性判断只使用缓存和
+本地打分, 扩展关键词直接使用原始关键词, 不再调用 LLM, 也不再请求向量。
+"""
+
+import logging
+
+from bili_up_finder.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 每百万 token 的美元价格 (输入, 输出), 未列出的模型按 0 计算
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "deepseek-chat": (0.27, 1.10),
+    "deepseek-reasoner": (0.55, 2.19),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+def record_llm_usage(
+    stage: str, model: str, prompt_tokens: int, completion_tokens: int
+) -> None:
+    """stage: 调用所属的阶段, 例如 expand_query / target_video / user_space"""
+    get_metrics().record_usage(
+        stage,
+        prompt_tokens,
+        completion_tokens,
+        estimate_cost(model, prompt_tokens, completion_tokens),
+    )
+
+
+class Budget:
+    """max_tokens / max_cost 为 None 时不限制"""
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        max_cost: float | None = None,
+        reserve: float = 0.1,
+    ):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.reserve = reserve
+
+    def used_share(self) -> float:
+        metrics = get_metrics()
+        shares = [0.0]
+        if self.max_tokens:
+            shares.append(metrics.total_tokens / self.max_tokens)
+        if self.max_cost:
+            shares.append(metrics.total_cost / self.max_cost)
+        return max(shares)
+
+    def low(self) -> bool:
+        """预算快用完时返回 True, 调用方改用不需要 LLM 的判断方式"""
+        if self.max_tokens is None and self.max_cost is None:
+            return False
+        if self.used_share() < 1 - self.reserve:
+            return False
+
+        metrics = get_metrics()
+        if not metrics.counters["budget_low"]:
+            metrics.incr("budget_low")
+            logger.warning(
+                f"LLM 预算已使用 {self.used_share():.0%}, "
+                "之后只使用缓存和本地打分, 不再调用 LLM"
+            )
+        return True
+
+    def skip(self) -> bool:
+        """low() 为 True 时记录一次跳过的 LLM 调用"""
+        if self.low():
+            get_metrics().incr("budget_skipped_llm_calls")
+            return True
+        return False
+
+
+_budget = Budget()
+
+
+def configure_budget(
+    max_tokens: int | None, max_cost: float | None, reserve: float
+) -> None:
+    global _budget
+    _budget = Budget(max_tokens, max_cost, reserve)
+
+
+def get_budget() -> Budget:
+    return _budget
@@ -0,0 +1,71 @@
+"""
+文本向量的本地缓存。
+
+缓存键由模型名和归一化后的文本组成, 同一个标题或扩展关键词只需要请求一次。
+向量在写入前已经归一化为单位长度。
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from bili_up_finder.cache.store import MemoryCache, SqliteStore
+from bili_up_finder.metrics import get_metrics
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    payload = json.dumps([model, " ".join(text.lower().split())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, store: SqliteStore | None = None, max_entries: int = 20_000):
+        self.store = store
+        # 向量不会过期, 只限制数量
+        self._memo = MemoryCache(max_entries=max_entries)
+
+    def get(self, key: str) -> list[float] | None:
+        if (vector := self._memo.get(key)) is not None:
+            get_metrics().incr("embedding_cache_hits")
+            return vector
+
+        if self.store is None:
+            return None
+
+        vector = self.store.get(key)
+        get_metrics().incr(
+            "embedding_cache_hits" if vector is not None else "embedding_cache_misses"
+        )
+        if vector is not None:
+            self._memo.set(key, vector)
+        return vector
+
+    def set(self, key: str, vector: list[float]) -> None:
+        self._memo.set(key, vector)
+        if self.store is not None:
+            # 保留 6 位小数, 对余弦相似度没有影响, 缓存文件小一半
+            self.store.set(key, [round(x, 6) for x in vector])
+
+
+_embedding_cache = EmbeddingCache()
+
+
+def configure_embedding_cache(cache_dir: str | Path | None, max_entries: int) -> None:
+    """cache_dir 为 None 时只在进程内缓存"""
+    global _embedding_cache
+    if cache_dir is None:
+        _embedding_cache = EmbeddingCache(max_entries=max_entries)
+        return
+
+    _embedding_cache = EmbeddingCache(
+        SqliteStore(
+            Path(cache_dir) / "embeddings.sqlite3",
+            table="embeddings",
+            max_entries=max_entries,
+        ),
+        max_entries=max_entries,
+    )
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    return _embedding_cache
@@ -0,0 +1,153 @@
+"""
+搜索结果缓存。
+
+保存每次搜索最终的 users_data, 新的搜索关键词与缓存中的关键词相同或相似,
+且需要的 UP 主数量不超过缓存数量时, 直接复用缓存结果。
+"""
+
+import logging
+import re
+import time
+from pathlib import Path
+
+from bili_up_finder.cache.store import SqliteStore
+from bili_up_finder.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_query(query: str) -> str:
+    # 去掉空白和标点, 中文按字符比较
+    return re.sub(r"[\W_]+", "", query.lower())
+
+
+def _char_ngrams(text: str, n: int = 2) -> set[str]:
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def _jaccard(grams_a: set[str], grams_b: set[str]) -> float:
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def query_similarity(a: str, b: str) -> float:
+    """字符 bigram 的 Jaccard 相似度"""
+    return _jaccard(
+        _char_ngrams(_normalize_query(a)), _char_ngrams(_normalize_query(b))
+    )
+
+
+class QueryCache:
+    """
+    相似匹配使用内存里的索引: 归一化的关键词 -> (bigram 集合, UP 主数量),
+    第一次查询时从 store 读取一次, 之后随 save 更新, 只反序列化最相似的条目。
+    其他进程之后写入的条目不在索引里, 只能精确命中。
+    """
+
+    def __init__(self, store: SqliteStore | None = None, min_similarity: float = 0.6):
+        self.store = store
+        self.min_similarity = min_similarity
+        self._index: dict[str, tuple[set[str], int]] | None = None
+
+    def _load_index(self) -> dict[str, tuple[set[str], int]]:
+        if self._index is None:
+            self._index = {}
+            for entry in self.store.values():
+                self._add_to_index(entry["query"], len(entry["users_data"]))
+        return self._index
+
+    def _add_to_index(self, search_query: str, num_users: int) -> None:
+        key = _normalize_query(search_query)
+        self._index[key] = (_char_ngrams(key), num_users)
+
+    def lookup(self, search_query: str, num_up: int) -> dict | None:
+        """
+        返回能覆盖 num_up 的缓存条目, 精确匹配优先, 其次取最相似的关键词。
+        条目包含 query, expanded_query, users_data 三个键。
+        """
+        if self.store is None:
+            return None
+
+        exact = self.store.get(_normalize_query(search_query))
+        if exact is not None and len(exact["users_data"]) >= num_up:
+            logger.info(f"搜索缓存精确命中: {exact['query']}")
+            get_metrics().incr("query_cache_hits")
+            return exact
+
+        index = self._load_index()
+        grams = _char_ngrams(_normalize_query(search_query))
+        scored = sorted(
+            (
+                (_jaccard(grams, key_grams), key)
+                for key, (key_grams, num_users) in index.items()
+                if num_users >= num_up
+            ),
+            reverse=True,
+        )
+        for score, key in scored:
+            if score < self.min_similarity:
+                break
+            best = self.store.get(key)
+            if best is None:  # 已经过期或被淘汰
+                del index[key]
+                continue
+
+            get_metrics().incr("query_cache_hits")
+            logger.info(f"搜索缓存相似命中: {best['query']} (相似度 {score:.2f})")
+            return best
+        return None
+
+    def save(
+        self, search_query: str, expanded_query: str, users_data: list[dict]
+    ) -> None:
+        if self.store is None or not users_data:
+            return
+
+        key = _normalize_query(search_query)
+        # 不要用更少的结果覆盖之前更多的结果
+        previous = self.store.get(key)
+        if previous is not None and len(previous["users_data"]) > len(users_data):
+            return
+
+        self.store.set(
+            key,
+            {
+                "query": search_query,
+                "expanded_query": expanded_query,
+                "users_data": users_data,
+                "saved_at": time.time(),
+            },
+        )
+        if self._index is not None:
+            self._add_to_index(search_query, len(users_data))
+
+
+_query_cache = QueryCache()
+
+
+def configure_query_cache(
+    cache_dir: str | Path | None,
+    ttl_days: float,
+    min_similarity: float,
+) -> None:
+    """cache_dir 为 None 时关闭缓存"""
+    global _query_cache
+    if cache_dir is None:
+        _query_cache = QueryCache()
+        return
+
+    _query_cache = QueryCache(
+        SqliteStore(
+            Path(cache_dir) / "queries.sqlite3",
+            table="queries",
+            ttl_seconds=ttl_days * 24 * 3600,
+        ),
+        min_similarity=min_similarity,
+    )
+
+
+def get_query_cache() -> QueryCache:
+    return _query_cache
@@ -0,0 +1,119 @@
+"""
+UP 主空间快照。
+
+快照包含投稿标题列表, 投稿数量, 账号是否已注销以及最多播放的视频,
+同一个进程里的多次搜索以及之后的运行都可以共用。
+例外是标题收集因为命中当前关键词而提前停止的快照: 标题列表 (投稿总数未知时还有
+投稿数量) 只对这个关键词有效, captions_query 记录该关键词, 其他关键词会重新抓取。
+"""
+
+import logging
+import re
+from pathlib import Path
+
+from bili_up_finder.cache.store import MemoryCache, SqliteStore
+
+logger = logging.getLogger(__name__)
+
+
+def space_key(profile_url: str) -> str:
+    """优先用 mid 作为键, 同一个空间的不同链接指向同一个快照"""
+    if match := re.search(r"space\.bilibili\.com/(\d+)", profile_url):
+        return match.group(1)
+    return profile_url.split("?")[0].rstrip("/")
+
+
+def new_snapshot(
+    uploader: str,
+    deleted: bool = False,
+    num_videos: int = 0,
+    captions: list[str] | None = None,
+    captions_query: str | None = None,
+) -> dict:
+    """captions_query: 标题收集因为命中该关键词提前停止, 否则为 None"""
+    return {
+        "uploader": uploader,
+        "deleted": deleted,
+        "num_videos": num_videos,
+        # 以下两项为 None 表示还没有抓取, 只在需要时才去抓
+        "captions": captions,
+        "top_videos": None,
+        "captions_query": captions_query,
+    }
+
+
+def captions_from_other_query(snapshot: dict, search_query: str) -> bool:
+    """快照的标题是为另一个关键词提前停止收集的, 不能用于 search_query"""
+    return snapshot.get("captions_query") not in (None, search_query)
+
+
+class SpaceCache:
+    """
+    进程内的 LRU 快照缓存加上可选的 SQLite 持久化, 两者使用相同的 ttl 和数量上限。
+    快照超过 ttl 后重新抓取, 已注销的账号也会缓存。
+    """
+
+    def __init__(
+        self,
+        store: SqliteStore | None = None,
+        ttl_seconds: float | None = None,
+        max_entries: int = 10_000,
+    ):
+        self.store = store
+        self._snapshots = MemoryCache(ttl_seconds, max_entries)
+
+    def get(self, profile_url: str) -> dict | None:
+        key = space_key(profile_url)
+        if (snapshot := self._snapshots.get(key)) is not None:
+            return snapshot
+
+        if self.store is None:
+            return None
+
+        entry = self.store.get_entry(key)
+        if entry is None:
+            return None
+        snapshot, created_at = entry
+        self._snapshots.set(key, snapshot, created_at)
+        return snapshot
+
+    def set(self, profile_url: str, snapshot: dict) -> None:
+        key = space_key(profile_url)
+        self._snapshots.set(key, snapshot)
+        if self.store is not None:
+            self.store.set(key, snapshot)
+
+    def log_stats(self) -> None:
+        if self.store is not None:
+            logger.info(
+                f"UP 主空间缓存: 命中 {self.store.hits} 次, 未命中 {self.store.misses} 次"
+            )
+
+
+_space_cache = SpaceCache()
+
+
+def configure_space_cache(
+    cache_dir: str | Path | None, ttl_days: float, max_entries: int
+) -> None:
+    """cache_dir 为 None 时只在进程内共享"""
+    global _space_cache
+    ttl_seconds = ttl_days * 24 * 3600
+    if cache_dir is None:
+        _space_cache = SpaceCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        return
+
+    _space_cache = SpaceCache(
+        SqliteStore(
+            Path(cache_dir) / "spaces.sqlite3",
+            table="spaces",
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        ),
+        ttl_seconds=ttl_seconds,
+        max_entries=max_entries,
+    )
+
+
+def get_space_cache() -> SpaceCache:
+    return _space_cache
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+
+class SqliteStore:
+    """
+    基于 SQLite 的键值缓存, 值以 JSON 保存。
+    - ttl_seconds: 超过该时长的条目视为过期, None 表示永不过期
+    - max_entries: 超出后按最近访问时间淘汰 (LRU)
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        table: str,
+        ttl_seconds: float | None = None,
+        max_entries: int = 10_000,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any | None:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> tuple[Any, float] | None:
+        """返回 (值, 写入时间), 内存缓存据此按同样的 ttl 过期"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(value), created_at
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def values(self) -> list[Any]:
+        """返回所有未过期的值, 不计入命中统计"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table}"
+            ).fetchall()
+
+        now = time.time()
+        return [
+            json.loads(value)
+            for value, created_at in rows
+            if self.ttl_seconds is None or now - created_at <= self.ttl_seconds
+        ]
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count <= self.max_entries:
+            return
+
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+            (count - self.max_entries,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryCache:
+    """
+    进程内的 LRU 缓存, 放在 SqliteStore 前面避免重复读盘和反序列化。
+    与 SqliteStore 使用相同的 ttl_seconds 和 max_entries, 常驻服务里也不会无限增长,
+    过期的条目会重新从磁盘读取或重新抓取。
+    """
+
+    def __init__(self, ttl_seconds: float | None = None, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, created_at = entry
+        if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, created_at: float | None = None) -> None:
+        """created_at: 从 SqliteStore 读出的条目沿用原来的写入时间"""
+        self._entries[key] = (
+            value,
+            created_at if created_at is not None else time.time(),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
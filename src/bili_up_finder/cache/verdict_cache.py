@@ -0,0 +1,110 @@
+"""
+LLM 相关性判断结果的本地缓存。
+
+缓存键由 system prompt 内容哈希, 模型名和归一化后的输入组成,
+prompt 或模型变化后旧的判断结果自然失效。
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from bili_up_finder.cache.store import MemoryCache, SqliteStore
+from bili_up_finder.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def verdict_cache_key(
+    instructions: str, model: str, kind: str, *inputs: str | list[str]
+) -> str:
+    """列表类输入 (标签, 视频标题) 与顺序无关, 排序后再参与哈希"""
+    prompt_hash = hashlib.sha256(instructions.encode("utf-8")).hexdigest()
+    normalized = [
+        sorted(_normalize(item) for item in value)
+        if isinstance(value, list)
+        else _normalize(value)
+        for value in inputs
+    ]
+    payload = json.dumps([kind, prompt_hash, model, normalized], ensure_ascii=False)
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    def __init__(
+        self,
+        store: SqliteStore | None = None,
+        ttl_seconds: float | None = None,
+        max_entries: int = 10_000,
+    ):
+        self.store = store
+        # 进程内的判断结果, 关闭磁盘缓存时批量模式的多个关键词仍然可以共用
+        self._memo = MemoryCache(ttl_seconds, max_entries)
+
+    def get(self, key: str) -> bool | None:
+        if (verdict := self._memo.get(key)) is not None:
+            get_metrics().incr("verdict_cache_hits")
+            return verdict
+
+        if self.store is None:
+            return None
+
+        entry = self.store.get_entry(key)
+        get_metrics().incr(
+            "verdict_cache_hits" if entry is not None else "verdict_cache_misses"
+        )
+        logger.debug(
+            f"判断缓存{'命中' if entry is not None else '未命中'}, "
+            f"命中 {self.store.hits} / 未命中 {self.store.misses}"
+        )
+        if entry is None:
+            return None
+        verdict, created_at = entry
+        self._memo.set(key, verdict, created_at)
+        return verdict
+
+    def set(self, key: str, verdict: bool) -> None:
+        self._memo.set(key, verdict)
+        if self.store is not None:
+            self.store.set(key, verdict)
+
+    def log_stats(self) -> None:
+        if self.store is not None:
+            logger.info(
+                f"LLM 判断缓存: 命中 {self.store.hits} 次, 未命中 {self.store.misses} 次"
+            )
+
+
+_verdict_cache = VerdictCache()
+
+
+def configure_verdict_cache(
+    cache_dir: str | Path | None, ttl_days: float, max_entries: int
+) -> None:
+    """cache_dir 为 None 时关闭缓存"""
+    global _verdict_cache
+    ttl_seconds = ttl_days * 24 * 3600
+    if cache_dir is None:
+        _verdict_cache = VerdictCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        return
+
+    _verdict_cache = VerdictCache(
+        SqliteStore(
+            Path(cache_dir) / "verdicts.sqlite3",
+            table="verdicts",
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+        ),
+        ttl_seconds=ttl_seconds,
+        max_entries=max_entries,
+    )
+
+
+def get_verdict_cache() -> VerdictCache:
+    return _verdict_cache
@@ -0,0 +1,102 @@
+"""
+视频卡片的结构化模型和批量提取。
+
+每个页面只调用一次 evaluate, 在浏览器里一次性读出所有卡片的链接, 标题,
+缩略图和作者, 不再对每张卡片分别调用 get_attribute / inner_text。
+"""
+
+import re
+from dataclasses import dataclass
+
+BV_PATTERN = re.compile(r"BV[0-9A-Za-z]{10}")
+
+
+@dataclass
+class VideoCard:
+    bvid: str
+    href: str
+    title: str
+    thumb: str
+    author: str = ""
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> "VideoCard":
+        href = _absolute(raw.get("href") or "")
+        match = BV_PATTERN.search(href)
+        return cls(
+            bvid=match.group(0) if match else "",
+            href=href,
+            title=(raw.get("title") or "").strip(),
+            thumb=_absolute(raw.get("thumb") or ""),
+            author=(raw.get("author") or "").strip(),
+        )
+
+    def to_video(self) -> dict:
+        """报告里使用的视频格式"""
+        return {"title": self.title, "href": self.href, "thumb": self.thumb}
+
+
+def _absolute(url: str) -> str:
+    return "https:" + url if url.startswith("//") else url
+
+
+# 搜索页: 每个 video-list-item 是一张卡片, 只取可见的卡片
+_SEARCH_CARDS_JS = """
+items => items
+  .filter(item => item.offsetParent !== null)
+  .map(item => {
+    const link = item.querySelector(
+      "div.bili-video-card__info--right > a[href*='/video/']"
+    );
+    if (!link) return null;
+    const title = item.querySelector(".bili-video-card__info--tit");
+    const author = item.querySelector("span.bili-video-card__info--author");
+    const img = item.querySelector("img");
+    return {
+      href: link.href,
+      title: title ? (title.getAttribute("title") || title.textContent) : "",
+      author: author ? author.textContent : "",
+      thumb: img ? img.getAttribute("src") : "",
+    };
+  })
+  .filter(card => card !== null)
+"""
+
+# 个人空间投稿列表: 从视频链接向上找到卡片根节点, 再读标题和缩略图
+_UPLOAD_CARDS_JS = """
+anchors => anchors.map(a => {
+  const card = a.closest("[class*='upload-video-card']") || a.parentElement;
+  const title = card.querySelector("div.bili-video-card__title a");
+  const img = card.querySelector("img");
+  return {
+    href: a.href,
+    title: title ? title.textContent : (a.getAttribute("title") || ""),
+    thumb: img ? img.getAttribute("src") : "",
+  };
+})
+"""
+
+
+async def extract_search_cards(page) -> list[VideoCard]:
+    raw_cards = await page.eval_on_selector_all("div.video-list-item", _SEARCH_CARDS_JS)
+    return [VideoCard.from_raw(raw) for raw in raw_cards]
+
+
+async def extract_upload_cards(
+    profile_page, anchor_selector: str, limit: int | None = None
+) -> list[VideoCard]:
+    """按链接去重, anchor_selector 由 click_most_viewed 返回"""
+    raw_cards = await profile_page.eval_on_selector_all(
+        anchor_selector, _UPLOAD_CARDS_JS
+    )
+
+    cards, seen = [], set()
+    for raw in raw_cards:
+        card = VideoCard.from_raw(raw)
+        if card.href in seen:
+            continue
+        seen.add(card.href)
+        cards.append(card)
+        if limit is not None and len(cards) >= limit:
+            break
+    return cards
@@ -2,13 +2,45 @@ import asyncio
 
 import click
 
+from bili_up_finder.batch import read_queries, run_batch
 from bili_up_finder.config import init_config
+from bili_up_finder.distributed import run_coordinator, run_worker
 from bili_up_finder.up_finder import main
 
 
 @click.command()
 @click.option(
-    "-q", "--query", required=True, type=str, help="Search query for finding UPs."
+    "-q", "--query", default=None, type=str, help="Search query for finding UPs."
+)
+@click.option(
+    "--queries-file",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="File with one search query per line, run as one batch.",
+)
+@click.option(
+    "--batch-contexts",
+    default=2,
+    type=int,
+    help="Queries run at the same time in batch mode.",
+)
+@click.option(
+    "--queue",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="SQLite work queue shared by a coordinator and its workers.",
+)
+@click.option(
+    "--worker",
+    is_flag=True,
+    default=False,
+    help="Run as a worker pulling tasks from --queue.",
+)
+@click.option(
+    "--local-workers",
+    default=0,
+    type=int,
+    help="Worker processes the coordinator starts on this machine.",
 )
 @click.option("-n", "--num-up", default=10, type=int, help="number of UPs to collect.")
 @click.option(
@@ -32,20 +64,155 @@ from bili_up_finder.up_finder import main
     type=int,
     help="Minimum acceptable number of videos for an UP.",
 )
+@click.option(
+    "--concurrency",
+    default=3,
+    type=int,
+    help="Number of video pages processed concurrently.",
+)
+@click.option(
+    "--cache-dir",
+    default=".cache",
+    type=str,
+    help="Directory for local caches.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Disable local caches.",
+)
+@click.option(
+    "--resume",
+    default=None,
+    type=str,
+    help="Resume a previous search session by its id.",
+)
+@click.option(
+    "--backend",
+    default="browser",
+    type=click.Choice(["browser", "api"]),
+    help="Fetch with a browser, or call the JSON API and fall back to the browser.",
+)
+@click.option(
+    "--judge-batch-size",
+    default=1,
+    type=int,
+    help="Number of videos judged per LLM request (1 disables batching).",
+)
+@click.option(
+    "--prefilter",
+    is_flag=True,
+    default=False,
+    help="Judge obvious matches and misses locally, send only ambiguous videos to the LLM.",
+)
+@click.option(
+    "--judge",
+    default="llm",
+    type=click.Choice(["llm", "embedding"]),
+    help="embedding: score by vector similarity, ask the LLM only about borderline cases.",
+)
+@click.option(
+    "--token-budget",
+    default=None,
+    type=int,
+    help="Max LLM tokens per run; near the limit only caches and local scoring are used.",
+)
+@click.option(
+    "--cost-budget",
+    default=None,
+    type=float,
+    help="Max estimated LLM cost in USD per run, handled like --token-budget.",
+)
+@click.option(
+    "--browser-profile",
+    default="default",
+    type=click.Choice(["default", "performance"]),
+    help="performance: headless, blocks media and trackers, waits on selectors.",
+)
+@click.option(
+    "--stream-report",
+    is_flag=True,
+    default=False,
+    help="Write each accepted UP to an NDJSON file and refresh the HTML report as the run goes.",
+)
+@click.option(
+    "--metrics-table",
+    is_flag=True,
+    default=False,
+    help="Print a stage timing and counter table at the end of the run.",
+)
 def cli(
     query,
+    queries_file,
+    batch_contexts,
+    queue,
+    worker,
+    local_workers,
     num_up,
     verbose,
     video_go_through_per_page,
     default_videos_per_page,
     min_acceptable_videos,
+    concurrency,
+    cache_dir,
+    no_cache,
+    resume,
+    backend,
+    judge_batch_size,
+    prefilter,
+    judge,
+    token_budget,
+    cost_budget,
+    browser_profile,
+    stream_report,
+    metrics_table,
 ):
+    if worker:
+        if not queue:
+            raise click.UsageError("--worker requires --queue.")
+        # worker 的配置由协调进程写入队列
+        init_config(verbose=verbose)
+        asyncio.run(run_worker(queue))
+        return
+
+    if not query and not resume and not queries_file:
+        raise click.UsageError(
+            "One of --query, --resume or --queries-file is required."
+        )
+
     config = init_config(
         num_up=num_up,
         video_go_through_per_page=video_go_through_per_page,
         default_videos_per_page=default_videos_per_page,
         min_acceptable_videos=min_acceptable_videos,
         verbose=verbose,
+        concurrency=concurrency,
+        cache_dir=cache_dir,
+        use_cache=not no_cache,
+        backend=backend,
+        judge_batch_size=judge_batch_size,
+        prefilter=prefilter,
+        judge=judge,
+        llm_token_budget=token_budget,
+        llm_cost_budget=cost_budget,
+        browser_profile=browser_profile,
+        stream_report=stream_report,
+        metrics_table=metrics_table,
+        batch_contexts=batch_contexts,
     )
+    if queue:
+        queries = ([query] if query else []) + (
+            read_queries(queries_file) if queries_file else []
+        )
+        if not queries:
+            raise click.UsageError("--queue requires --query or --queries-file.")
+        asyncio.run(run_coordinator(queries, config, queue, local_workers))
+        return
+
+    if queries_file:
+        asyncio.run(run_batch(read_queries(queries_file), config=config))
+        return
+
     # Run the main function with the provided search query
-    asyncio.run(main(query, config=config))
+    asyncio.run(main(query, config=config, resume=resume))
@@ -1,9 +1,19 @@
 import logging
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, field_validator
 from rich.logging import RichHandler
 
+from bili_up_finder.budget import configure_budget
+from bili_up_finder.cache.embedding_cache import configure_embedding_cache
+from bili_up_finder.cache.query_cache import configure_query_cache
+from bili_up_finder.cache.space_cache import configure_space_cache
+from bili_up_finder.cache.verdict_cache import configure_verdict_cache
+from bili_up_finder.llm_clients import configure_pool_limits
+from bili_up_finder.ratelimit import configure_rate_limits
+from bili_up_finder.search_helper.embedding_judge import configure_embedding_judge
+
 
 class Config(BaseModel):
     """
@@ -32,6 +42,289 @@ class Config(BaseModel):
         description="Minimum acceptable videos (must be >= 10)",
     )
 
+    concurrency: int = Field(
+        default=3,
+        ge=1,
+        description="Number of video pages processed concurrently",
+    )
+
+    judge_workers: int = Field(
+        default=4, ge=1, description="Videos judged concurrently in the crawl pipeline"
+    )
+
+    space_workers: int = Field(
+        default=2,
+        ge=1,
+        description="Uploader spaces inspected concurrently in the crawl pipeline",
+    )
+
+    pipeline_queue_size: int = Field(
+        default=30,
+        ge=1,
+        description="Capacity of each queue between crawl pipeline stages",
+    )
+
+    caption_recent: int = Field(
+        default=30, ge=1, description="Most recent video titles kept per uploader"
+    )
+
+    caption_sample: int = Field(
+        default=30,
+        ge=0,
+        description="Older video titles sampled evenly across the upload list",
+    )
+
+    caption_max_loaded: int = Field(
+        default=240,
+        ge=1,
+        description="Stop scrolling an uploader space once this many cards are loaded",
+    )
+
+    caption_conclusive_hits: int = Field(
+        default=10,
+        ge=0,
+        description="Stop collecting titles once this many contain an expanded "
+        "keyword (0 disables)",
+    )
+
+    llm_max_connections: int = Field(
+        default=20, ge=1, description="Max HTTP connections per LLM client"
+    )
+
+    llm_max_keepalive_connections: int = Field(
+        default=10, ge=0, description="Max idle keep-alive connections per LLM client"
+    )
+
+    llm_keepalive_expiry: float = Field(
+        default=60.0, gt=0, description="Seconds an idle LLM connection is kept alive"
+    )
+
+    llm_requests_per_second: float = Field(
+        default=20, ge=0, description="Request rate per LLM provider (0 = unlimited)"
+    )
+
+    site_requests_per_second: float = Field(
+        default=10, ge=0, description="Request rate per Bilibili host (0 = unlimited)"
+    )
+
+    site_max_concurrency: int = Field(
+        default=8, ge=1, description="Upper bound of in-flight requests per host"
+    )
+
+    max_retries: int = Field(
+        default=4, ge=0, description="Retries for throttled or failed requests"
+    )
+
+    retry_base_delay: float = Field(
+        default=1.0, gt=0, description="First retry delay in seconds, doubled each time"
+    )
+
+    retry_max_delay: float = Field(
+        default=30.0, gt=0, description="Longest delay between two retries"
+    )
+
+    max_consecutive_failures: int = Field(
+        default=5,
+        ge=1,
+        description="Stop the crawl after this many videos fail in a row",
+    )
+
+    use_cache: bool = Field(default=True, description="Enable local caches")
+
+    cache_dir: str = Field(default=".cache", description="Directory for local caches")
+
+    verdict_cache_ttl_days: float = Field(
+        default=30, gt=0, description="Days an LLM verdict stays valid in cache"
+    )
+
+    verdict_cache_max_entries: int = Field(
+        default=50_000, ge=1, description="Max LLM verdicts kept in cache (LRU)"
+    )
+
+    query_cache_ttl_days: float = Field(
+        default=7, gt=0, description="Days a cached search result stays valid"
+    )
+
+    query_cache_similarity: float = Field(
+        default=0.6,
+        gt=0,
+        le=1,
+        description="Min keyword similarity (bigram Jaccard) to reuse a cached search",
+    )
+
+    space_cache_ttl_days: float = Field(
+        default=7, gt=0, description="Days before an uploader space is fetched again"
+    )
+
+    space_cache_max_entries: int = Field(
+        default=20_000, ge=1, description="Maximum cached uploader spaces"
+    )
+
+    session_dir: str = Field(
+        default="sessions", description="Directory for resumable search sessions"
+    )
+
+    backend: Literal["browser", "api"] = Field(
+        default="browser",
+        description="Fetch pages with a browser, or call the site's JSON API directly",
+    )
+
+    api_base_url: str = Field(
+        default="https://api.bilibili.com", description="Base URL of the JSON API"
+    )
+
+    judge_batch_size: int = Field(
+        default=1,
+        ge=1,
+        le=50,
+        description="Videos judged per LLM request (1 disables batching)",
+    )
+
+    judge_max_prompt_tokens: int = Field(
+        default=6000, ge=500, description="Token budget for one batched prompt"
+    )
+
+    prefilter: bool = Field(
+        default=False,
+        description="Score videos locally against the expanded keywords and only "
+        "send ambiguous ones to the LLM",
+    )
+
+    prefilter_accept_hits: int = Field(
+        default=2,
+        ge=0,
+        description="Distinct expanded keywords in title/tags to accept without "
+        "the LLM (0 disables)",
+    )
+
+    prefilter_reject_overlap: float = Field(
+        default=0.05,
+        ge=0,
+        le=1,
+        description="Reject without the LLM when no keyword matches and the bigram "
+        "overlap is below this",
+    )
+
+    judge: Literal["llm", "embedding"] = Field(
+        default="llm",
+        description="llm asks the chat model about every video; embedding scores "
+        "by cosine similarity first and only asks about borderline cases",
+    )
+
+    embedding_model: str = Field(
+        default="text-embedding-3-small",
+        description="Model for the OpenAI-compatible embeddings endpoint",
+    )
+
+    embedding_accept: float = Field(
+        default=0.4,
+        ge=-1,
+        le=1,
+        description="Similarity to the expanded query at or above which a title "
+        "counts as relevant",
+    )
+
+    embedding_reject: float = Field(
+        default=0.2,
+        ge=-1,
+        le=1,
+        description="Similarity at or below which a title counts as irrelevant",
+    )
+
+    embedding_space_share: float = Field(
+        default=0.5,
+        gt=0,
+        le=1,
+        description="Share of relevant captions needed to accept an uploader space",
+    )
+
+    embedding_cache_max_entries: int = Field(
+        default=20_000, ge=1, description="Max vectors kept in cache (LRU)"
+    )
+
+    llm_token_budget: int | None = Field(
+        default=None,
+        ge=1,
+        description="Max LLM and embedding tokens per run (None for no limit)",
+    )
+
+    llm_cost_budget: float | None = Field(
+        default=None,
+        gt=0,
+        description="Max estimated LLM and embedding cost in USD per run "
+        "(None for no limit)",
+    )
+
+    llm_budget_reserve: float = Field(
+        default=0.1,
+        ge=0,
+        lt=1,
+        description="Share of the budget kept for in-flight requests; below it, "
+        "judging uses only caches and local scoring",
+    )
+
+    page_pool_size: int = Field(
+        default=5,
+        ge=1,
+        description="Reusable tabs per browser context for video and space pages",
+    )
+
+    page_max_uses: int = Field(
+        default=20,
+        ge=1,
+        description="Navigations before a pooled tab is closed and replaced",
+    )
+
+    browser_profile: Literal["default", "performance"] = Field(
+        default="default",
+        description="performance runs headless, blocks media/trackers, "
+        "and waits on selectors instead of networkidle",
+    )
+
+    metrics_table: bool = Field(
+        default=False, description="Print a stage timing table at the end of a run"
+    )
+
+    search_base_url: str = Field(
+        default="https://search.bilibili.com", description="Base URL of search pages"
+    )
+
+    reports_dir: str = Field(
+        default="reports", description="Directory for reports and run metrics"
+    )
+
+    stream_report: bool = Field(
+        default=False,
+        description="Append each accepted uploader to an NDJSON sidecar and "
+        "refresh the HTML report during the run",
+    )
+
+    report_refresh_every: int = Field(
+        default=5,
+        ge=0,
+        description="Re-render the HTML report every N accepted uploaders "
+        "in streaming mode (0 only renders at the end)",
+    )
+
+    batch_contexts: int = Field(
+        default=2,
+        ge=1,
+        description="Queries run at the same time in batch mode, "
+        "each holding one browser context",
+    )
+
+    job_retention: int = Field(
+        default=100,
+        ge=0,
+        description="Finished jobs the search service keeps for status and reports",
+    )
+
+    job_retention_minutes: float = Field(
+        default=60,
+        ge=0,
+        description="Minutes the search service keeps a finished job",
+    )
+
     @field_validator("default_videos_per_page", mode="after")
     @classmethod
     def validate_max_videos_per_page(cls, v):
@@ -41,10 +334,60 @@ class Config(BaseModel):
         return v
 
 
+def configure_runtime(config: Config) -> None:
+    """按照 config 设置进程内共享的连接池和缓存"""
+    configure_pool_limits(
+        max_connections=config.llm_max_connections,
+        max_keepalive_connections=config.llm_max_keepalive_connections,
+        keepalive_expiry=config.llm_keepalive_expiry,
+    )
+    configure_rate_limits(
+        llm_requests_per_second=config.llm_requests_per_second,
+        llm_max_concurrency=config.llm_max_connections,
+        site_requests_per_second=config.site_requests_per_second,
+        site_max_concurrency=config.site_max_concurrency,
+        max_retries=config.max_retries,
+        retry_base_delay=config.retry_base_delay,
+        retry_max_delay=config.retry_max_delay,
+    )
+    configure_verdict_cache(
+        cache_dir=config.cache_dir if config.use_cache else None,
+        ttl_days=config.verdict_cache_ttl_days,
+        max_entries=config.verdict_cache_max_entries,
+    )
+    configure_query_cache(
+        cache_dir=config.cache_dir if config.use_cache else None,
+        ttl_days=config.query_cache_ttl_days,
+        min_similarity=config.query_cache_similarity,
+    )
+    configure_embedding_cache(
+        cache_dir=config.cache_dir if config.use_cache else None,
+        max_entries=config.embedding_cache_max_entries,
+    )
+    configure_embedding_judge(
+        enabled=config.judge == "embedding",
+        model=config.embedding_model,
+        accept=config.embedding_accept,
+        reject=config.embedding_reject,
+        space_share=config.embedding_space_share,
+    )
+    configure_space_cache(
+        cache_dir=config.cache_dir if config.use_cache else None,
+        ttl_days=config.space_cache_ttl_days,
+        max_entries=config.space_cache_max_entries,
+    )
+    configure_budget(
+        max_tokens=config.llm_token_budget,
+        max_cost=config.llm_cost_budget,
+        reserve=config.llm_budget_reserve,
+    )
+
+
 def init_config(**kwargs) -> Config:
     config = Config(**kwargs)
 
     load_dotenv()
+    configure_runtime(config)
 
     console_handler = RichHandler()
     file_handler = logging.FileHandler("logs/app.log")
@@ -0,0 +1,544 @@
+"""
+分布式搜索: 一个协调进程和多个 worker 进程共用一个 SQLite 任务队列。
+
+协调进程扩展关键词, 为每个关键词放入第一页搜索任务, 然后等待所有关键词
+凑够 num_up 个 UP 主或没有剩余任务, 最后生成报告。worker 领取三种任务:
+- page: 读取一页搜索结果, 放入该页的视频任务和下一页的搜索任务
+- video: 读取视频标题和标签, 由 LLM 判断相关后放入 UP 主空间任务
+- space: 检查 UP 主空间, 满足条件时写入结果
+
+任务的键在表里唯一, 同一个关键词下每个 UP 主只会被处理一次, 相当于
+SearchSession 里 processed_up_names / uploaders 的跨进程版本。
+领取任务时写入租约, worker 崩溃后租约过期, 任务会被其他 worker 重新领取。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import httpx
+from playwright.async_api import async_playwright
+
+from bili_up_finder.api_finder import fetch_tags, inspect_uploader
+from bili_up_finder.api_finder import search_candidates as api_search_candidates
+from bili_up_finder.bili_api import BiliApiClient, BiliApiError
+from bili_up_finder.browser import ContextPool, get_page_pool, goto
+from bili_up_finder.cache.query_cache import get_query_cache
+from bili_up_finder.cache.space_cache import space_key
+from bili_up_finder.config import Config, configure_runtime
+from bili_up_finder.llm_clients import aclose_clients
+from bili_up_finder.metrics import get_metrics, start_run
+from bili_up_finder.pipeline import VideoCandidate
+from bili_up_finder.search_helper.ai_search_helper import (
+    TargetVideoBatcher,
+    expand_search_query_async,
+)
+from bili_up_finder.up_finder import (
+    ensure_auth_state,
+    go_to_user_space,
+    open_video_page,
+    search_candidates,
+    search_url,
+)
+from bili_up_finder.web_builder import run_batch_index, run_web_builder
+
+logger = logging.getLogger(__name__)
+
+# 优先处理流水线下游的任务, 上游的搜索页只在没有其他任务时才翻
+PRIORITY = {"space": 2, "video": 1, "page": 0}
+LEASE_SECONDS = 600
+MAX_TASK_ATTEMPTS = 3
+POLL_INTERVAL = 1.0
+
+
+@dataclass
+class Task:
+    id: int
+    kind: str
+    query: str
+    payload: dict
+    attempts: int
+
+
+class WorkQueue:
+    """
+    多个进程共用的任务队列和结果表。每个进程各自打开一个连接,
+    写操作用 BEGIN IMMEDIATE 串行化。
+    方法都是阻塞的 (等待写锁最多 30 秒), 协程里通过 asyncio.to_thread 调用。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS queries ("
+            "query TEXT PRIMARY KEY, expanded_query TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, "
+            "kind TEXT NOT NULL, query TEXT NOT NULL, payload TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+            "worker TEXT, leased_until REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT);"
+            "CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, priority);"
+            "CREATE TABLE IF NOT EXISTS results ("
+            "query TEXT NOT NULL, uploader TEXT NOT NULL, user_data TEXT NOT NULL, "
+            "PRIMARY KEY (query, uploader));"
+        )
+
+    def _write(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _read(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._write(
+            lambda: self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+        )
+
+    def get_meta(self, key: str) -> str | None:
+        rows = self._read("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    @property
+    def closed(self) -> bool:
+        return self.get_meta("closed") == "1"
+
+    def add_query(self, search_query: str, expanded_query: str) -> None:
+        self._write(
+            lambda: self._conn.execute(
+                "INSERT OR REPLACE INTO queries (query, expanded_query) VALUES (?, ?)",
+                (search_query, expanded_query),
+            )
+        )
+
+    def expanded_queries(self) -> dict[str, str]:
+        return dict(self._read("SELECT query, expanded_query FROM queries"))
+
+    def enqueue(self, kind: str, search_query: str, key: str, payload: dict) -> bool:
+        """键已经存在时不重复放入, 返回 False"""
+        cursor = self._write(
+            lambda: self._conn.execute(
+                "INSERT OR IGNORE INTO tasks (key, kind, query, payload, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    f"{kind}:{search_query}:{key}",
+                    kind,
+                    search_query,
+                    json.dumps(payload, ensure_ascii=False),
+                    PRIORITY[kind],
+                ),
+            )
+        )
+        return cursor.rowcount > 0
+
+    def lease(self, worker: str) -> Task | None:
+        """领取优先级最高的任务, 包括租约已过期的任务"""
+
+        def lease() -> Task | None:
+            now = time.time()
+            row = self._conn.execute(
+                "SELECT id, kind, query, payload, attempts FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND leased_until < ?) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, leased_until = ? "
+                "WHERE id = ?",
+                (worker, now + LEASE_SECONDS, row[0]),
+            )
+            task_id, kind, search_query, payload, attempts = row
+            return Task(task_id, kind, search_query, json.loads(payload), attempts)
+
+        return self._write(lease)
+
+    def complete(self, task: Task, status: str = "done") -> None:
+        self._write(
+            lambda: self._conn.execute(
+                "UPDATE tasks SET status = ?, leased_until = NULL WHERE id = ?",
+                (status, task.id),
+            )
+        )
+
+    def fail(self, task: Task, error: str) -> bool:
+        """失败次数未达上限时放回队列, 返回是否会重试"""
+        attempts = task.attempts + 1
+        retry = attempts < MAX_TASK_ATTEMPTS
+        self._write(
+            lambda: self._conn.execute(
+                "UPDATE tasks SET status = ?, attempts = ?, error = ?, "
+                "leased_until = NULL WHERE id = ?",
+                ("pending" if retry else "failed", attempts, error, task.id),
+            )
+        )
+        return retry
+
+    def skip_query(self, search_query: str) -> None:
+        """关键词已经凑够 UP 主, 剩余的任务不再处理"""
+        self._write(
+            lambda: self._conn.execute(
+                "UPDATE tasks SET status = 'skipped' "
+                "WHERE query = ? AND status = 'pending'",
+                (search_query,),
+            )
+        )
+
+    def active_tasks(self, search_query: str) -> int:
+        """还没有处理完的任务数, 包括正在处理的"""
+        ((count,),) = self._read(
+            "SELECT COUNT(*) FROM tasks "
+            "WHERE query = ? AND status IN ('pending', 'leased')",
+            (search_query,),
+        )
+        return count
+
+    def add_result(self, search_query: str, user_data: dict, num_up: int) -> bool:
+        """关键词已经凑够 num_up 个或 UP 主已经存在时返回 False"""
+
+        def add() -> bool:
+            ((count,),) = self._conn.execute(
+                "SELECT COUNT(*) FROM results WHERE query = ?", (search_query,)
+            ).fetchall()
+            if count >= num_up:
+                return False
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO results (query, uploader, user_data) "
+                "VALUES (?, ?, ?)",
+                (
+                    search_query,
+                    user_data["uploader"],
+                    json.dumps(user_data, ensure_ascii=False),
+                ),
+            )
+            return cursor.rowcount > 0
+
+        return self._write(add)
+
+    def results(self, search_query: str) -> list[dict]:
+        rows = self._read(
+            "SELECT user_data FROM results WHERE query = ? ORDER BY rowid",
+            (search_query,),
+        )
+        return [json.loads(user_data) for (user_data,) in rows]
+
+    def num_results(self, search_query: str) -> int:
+        ((count,),) = self._read(
+            "SELECT COUNT(*) FROM results WHERE query = ?", (search_query,)
+        )
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+async def run_coordinator(
+    queries: list[str],
+    config: Config,
+    queue_path: str | Path,
+    local_workers: int = 0,
+) -> dict[str, list[dict]]:
+    """
+    放入搜索任务并等待完成, 返回 {关键词: UP 主信息}。
+    local_workers > 0 时在本机启动相应数量的 worker 子进程。
+    """
+    queries = list(dict.fromkeys(queries))
+    queue = WorkQueue(queue_path)
+    # worker 从队列里读取配置, 只需要知道队列的路径
+    await asyncio.to_thread(queue.set_meta, "config", config.model_dump_json())
+    await asyncio.to_thread(queue.set_meta, "closed", "0")
+
+    results: dict[str, list[dict]] = {}
+    pending = []
+    for search_query in queries:
+        if cached := get_query_cache().lookup(search_query, config.num_up):
+            results[search_query] = cached["users_data"][: config.num_up]
+        else:
+            pending.append(search_query)
+
+    expanded = await asyncio.gather(
+        *(
+            expand_search_query_async(search_query=query, verbose=config.verbose)
+            for query in pending
+        )
+    )
+    for search_query, expanded_query in zip(pending, expanded):
+        await asyncio.to_thread(queue.add_query, search_query, expanded_query)
+        await asyncio.to_thread(queue.enqueue, "page", search_query, "1", {"page": 1})
+    logger.info(f"已放入 {len(pending)} 个关键词, 队列: {queue.path}")
+
+    processes = [
+        await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "bili_up_finder",
+            "--worker",
+            "--queue",
+            str(queue.path),
+        )
+        for _ in range(local_workers)
+    ]
+
+    try:
+        remaining = set(pending)
+        while remaining:
+            for search_query in list(remaining):
+                num_results = await asyncio.to_thread(queue.num_results, search_query)
+                if num_results >= config.num_up:
+                    await asyncio.to_thread(queue.skip_query, search_query)
+                if await asyncio.to_thread(queue.active_tasks, search_query) == 0:
+                    remaining.discard(search_query)
+                    logger.info(
+                        f"关键词 {search_query} 完成, 找到 {num_results} 个 UP 主"
+                    )
+
+            if processes and all(p.returncode is not None for p in processes):
+                logger.warning("所有本地 worker 都已退出, 停止等待")
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+    finally:
+        await asyncio.to_thread(queue.set_meta, "closed", "1")
+        await asyncio.gather(*(p.wait() for p in processes))
+        await aclose_clients()
+
+    expanded_queries = await asyncio.to_thread(queue.expanded_queries)
+    for search_query in pending:
+        users_data = await asyncio.to_thread(queue.results, search_query)
+        results[search_query] = users_data
+        if users_data:
+            get_query_cache().save(
+                search_query, expanded_queries[search_query], users_data
+            )
+            run_web_builder(users_data, search_query, config.reports_dir)
+    queue.close()
+
+    results = {query: results[query] for query in queries}
+    run_batch_index(results, config.reports_dir)
+    return results
+
+
+class ApiTasks:
+    """用 JSON 接口处理任务"""
+
+    def __init__(self, api: BiliApiClient, config: Config):
+        self.api = api
+        self.config = config
+
+    async def search_page(self, search_query: str, page_no: int):
+        return await api_search_candidates(self.api, search_query, page_no, self.config)
+
+    async def fetch_details(self, candidate: VideoCandidate) -> None:
+        await fetch_tags(self.api, candidate)
+
+    async def inspect_space(self, candidate: VideoCandidate, expanded_query: str):
+        mid = candidate.mid
+        if mid is None:  # 浏览器读取的搜索结果没有 mid, 从空间链接里取
+            key = space_key(candidate.profile_url)
+            if not key.isdigit():
+                raise BiliApiError(-404, f"空间链接里没有 mid: {candidate.profile_url}")
+            mid = int(key)
+        return await inspect_uploader(self.api, mid, expanded_query, self.config)
+
+
+class BrowserTasks:
+    """用浏览器处理任务, 每个任务从 context 池里取一个 context"""
+
+    def __init__(self, contexts: ContextPool, config: Config):
+        self.contexts = contexts
+        self.config = config
+
+    async def search_page(self, search_query: str, page_no: int):
+        async with (
+            self.contexts.acquire() as context,
+            get_page_pool(context).page() as page,
+        ):
+            with get_metrics().span("search_page"):
+                await goto(
+                    page,
+                    search_url(search_query, page_no, self.config.search_base_url),
+                    wait_until="domcontentloaded",
+                )
+            return await search_candidates(page, page_no, self.config)
+
+    async def fetch_details(self, candidate: VideoCandidate) -> None:
+        async with self.contexts.acquire() as context:
+            await open_video_page(context, candidate, self.config)
+
+    async def inspect_space(self, candidate: VideoCandidate, expanded_query: str):
+        async with self.contexts.acquire() as context:
+            return await go_to_user_space(
+                context,
+                candidate.uploader,
+                candidate.profile_url,
+                expanded_query,
+                self.config,
+            )
+
+
+async def run_worker(queue_path: str | Path, worker_id: str | None = None) -> None:
+    """从队列领取任务直到协调进程关闭队列"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    while (config_json := await asyncio.to_thread(queue.get_meta, "config")) is None:
+        await asyncio.sleep(POLL_INTERVAL)
+    config = Config.model_validate_json(config_json)
+    configure_runtime(config)
+
+    metrics = start_run(f"worker-{worker_id}")
+    ensure_auth_state()
+    batchers: dict[str, TargetVideoBatcher] = {}
+    expanded_queries: dict[str, str] = {}
+
+    async def expanded_query(search_query: str) -> str:
+        if search_query not in expanded_queries:
+            expanded_queries.update(await asyncio.to_thread(queue.expanded_queries))
+        return expanded_queries[search_query]
+
+    async def handle(tasks, task: Task) -> None:
+        if task.kind == "page":
+            page_no = task.payload["page"]
+            candidates = await tasks.search_page(task.query, page_no)
+            if not candidates:
+                logger.info(f"关键词 {task.query} 没有更多页面了")
+                return
+            for candidate in candidates:
+                # 同一个关键词下每个 UP 主只处理一次
+                await asyncio.to_thread(
+                    queue.enqueue,
+                    "video",
+                    task.query,
+                    candidate.up_name,
+                    asdict(candidate),
+                )
+            await asyncio.to_thread(
+                queue.enqueue,
+                "page",
+                task.query,
+                str(page_no + 1),
+                {"page": page_no + 1},
+            )
+            return
+
+        candidate = VideoCandidate(**task.payload)
+        if task.kind == "video":
+            await tasks.fetch_details(candidate)
+            if task.query not in batchers:
+                batchers[task.query] = TargetVideoBatcher.from_config(
+                    await expanded_query(task.query), config
+                )
+            if await batchers[task.query].decide(candidate.title, candidate.tags):
+                await asyncio.to_thread(
+                    queue.enqueue,
+                    "space",
+                    task.query,
+                    space_key(candidate.profile_url),
+                    asdict(candidate),
+                )
+            return
+
+        user_data = await tasks.inspect_space(
+            candidate, await expanded_query(task.query)
+        )
+        if user_data is not None and await asyncio.to_thread(
+            queue.add_result, task.query, user_data, config.num_up
+        ):
+            logger.info(f"关键词 {task.query} 接受 UP 主 {user_data['uploader']}")
+
+    async def work(api_tasks: ApiTasks | None, browser_tasks: BrowserTasks) -> None:
+        while True:
+            task = await asyncio.to_thread(queue.lease, worker_id)
+            if task is None:
+                if await asyncio.to_thread(lambda: queue.closed):
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+
+            if await asyncio.to_thread(queue.num_results, task.query) >= config.num_up:
+                await asyncio.to_thread(queue.complete, task, status="skipped")
+                continue
+
+            try:
+                try:
+                    await handle(api_tasks or browser_tasks, task)
+                except (BiliApiError, httpx.HTTPError) as e:
+                    if api_tasks is None:
+                        raise
+                    # 接口被风控或结构变化时, 改用浏览器处理这个任务
+                    logger.warning(f"接口抓取失败, 改用浏览器处理: {e}")
+                    await handle(browser_tasks, task)
+            except Exception as e:
+                get_metrics().incr("failed_videos")
+                retry = await asyncio.to_thread(
+                    queue.fail, task, f"{type(e).__name__}: {e}"
+                )
+                logger.warning(
+                    f"{task.kind} 任务 {task.id} 失败"
+                    f"{', 稍后重试' if retry else ', 放弃'}: {type(e).__name__}: {e}",
+                    exc_info=True,
+                )
+            else:
+                await asyncio.to_thread(queue.complete, task)
+
+    logger.info(f"worker {worker_id} 开始领取任务: {queue.path}")
+    try:
+        async with async_playwright() as p:
+            # 只有浏览器任务才会真正启动浏览器
+            contexts = ContextPool(p, config, size=config.concurrency)
+            browser_tasks = BrowserTasks(contexts, config)
+            try:
+                if config.backend == "api":
+                    async with BiliApiClient(
+                        api_base_url=config.api_base_url,
+                        max_connections=config.concurrency * 2,
+                    ) as api:
+                        api_tasks = ApiTasks(api, config)
+                        await asyncio.gather(
+                            *(
+                                work(api_tasks, browser_tasks)
+                                for _ in range(config.concurrency)
+                            )
+                        )
+                else:
+                    await asyncio.gather(
+                        *(work(None, browser_tasks) for _ in range(config.concurrency))
+                    )
+            finally:
+                await contexts.close()
+    finally:
+        await asyncio.gather(*(batcher.aclose() for batcher in batchers.values()))
+        await aclose_clients()
+        queue.close()
+        metrics.log_usage()
+        metrics.write_json(config.reports_dir)
+        if config.metrics_table:
+            metrics.log_summary()
@@ -0,0 +1,77 @@
+"""
+进程内共享的 LLM 客户端注册表。
+
+按 (provider, base_url, api_key) 懒加载创建 OpenAI 客户端, 所有 Assistant 共用同一个
+带 keep-alive 的 HTTP 连接池, 避免每次判断都重新握手。
+"""
+
+import asyncio
+import threading
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+_lock = threading.Lock()
+_clients: dict[tuple, OpenAI] = {}
+_async_clients: dict[tuple, AsyncOpenAI] = {}
+
+_limits = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0
+)
+
+
+def configure_pool_limits(
+    max_connections: int, max_keepalive_connections: int, keepalive_expiry: float
+) -> None:
+    """设置之后新建客户端的连接池上限, 已经创建的客户端不受影响"""
+    global _limits
+    _limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def get_client(provider: str, base_url: str | None, api_key: str | None) -> OpenAI:
+    key = (provider, base_url, api_key)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,  # 重试由 ratelimit 统一处理
+                http_client=DefaultHttpxClient(limits=_limits),
+            )
+        return _clients[key]
+
+
+def get_async_client(
+    provider: str, base_url: str | None, api_key: str | None
+) -> AsyncOpenAI:
+    # 异步连接池绑定在事件循环上, 不同的循环各自持有一个客户端
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    key = (provider, base_url, api_key, id(loop))
+    with _lock:
+        if key not in _async_clients:
+            _async_clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=_limits),
+            )
+        return _async_clients[key]
+
+
+async def aclose_clients() -> None:
+    """关闭当前事件循环上的异步客户端, 在 asyncio.run 结束前调用"""
+    loop_id = id(asyncio.get_running_loop())
+    with _lock:
+        keys = [key for key in _async_clients if key[-1] == loop_id]
+        clients = [_async_clients.pop(key) for key in keys]
+
+    for client in clients:
+        await client.close()
@@ -0,0 +1,183 @@
+"""
+轻量的运行指标: 各阶段耗时 (span) 和计数器。
+
+每次运行调用 start_run() 创建新的 RunMetrics, 之后在同一个 asyncio 任务
+(以及它创建的子任务) 里通过 get_metrics() 拿到同一个实例。
+没有调用过 start_run 的上下文各自得到一个新的实例, 互不影响。
+LLM 和 embeddings 接口返回的 token 数按阶段 (扩展关键词, 视频判断等) 累计在 usage 里。
+"""
+
+import io
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+logger = logging.getLogger(__name__)
+
+
+class RunMetrics:
+    def __init__(self, search_query: str = ""):
+        self.search_query = search_query
+        self.started_at = time.time()
+        self.spans: dict[str, list[float]] = defaultdict(list)
+        self.counters: dict[str, int] = defaultdict(int)
+        self.usage: dict[str, dict] = defaultdict(
+            lambda: {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost_usd": 0.0,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name].append(time.perf_counter() - start)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def record_usage(
+        self, stage: str, prompt_tokens: int, completion_tokens: int, cost: float
+    ) -> None:
+        usage = self.usage[stage]
+        usage["calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        usage["cost_usd"] += cost
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(
+            u["prompt_tokens"] + u["completion_tokens"] for u in self.usage.values()
+        )
+
+    @property
+    def total_cost(self) -> float:
+        return sum(u["cost_usd"] for u in self.usage.values())
+
+    def usage_summary(self) -> dict:
+        return {
+            "calls": sum(u["calls"] for u in self.usage.values()),
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.total_cost, 6),
+            "stages": {
+                stage: {**u, "cost_usd": round(u["cost_usd"], 6)}
+                for stage, u in self.usage.items()
+            },
+        }
+
+    def log_usage(self) -> None:
+        usage = self.usage_summary()
+        logger.info(
+            f"LLM 用量: {usage['calls']} 次请求, {usage['total_tokens']} tokens, "
+            f"估算费用 ${usage['cost_usd']:.4f}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "search_query": self.search_query,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "spans": {
+                name: {
+                    "count": len(durations),
+                    "total_seconds": round(sum(durations), 3),
+                    "mean_seconds": round(sum(durations) / len(durations), 3),
+                    "max_seconds": round(max(durations), 3),
+                }
+                for name, durations in self.spans.items()
+                if durations
+            },
+            "counters": dict(self.counters),
+            "usage": self.usage_summary(),
+        }
+
+    def write_json(self, reports_dir: str = "reports") -> Path:
+        file_name = Path(reports_dir) / (
+            f"{self.search_query}_"
+            f"{datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}_metrics.json"
+        )
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+        file_name.write_text(
+            json.dumps(self.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+        logger.info(f"运行指标保存在{file_name}")
+        return file_name
+
+    def log_summary(self) -> None:
+        """用 rich 表格输出各阶段耗时和计数器, 通过 logging 打印"""
+        data = self.to_dict()
+
+        spans = Table(title=f"阶段耗时 (总计 {data['elapsed_seconds']:.1f}s)")
+        for column in ["阶段", "次数", "总耗时(s)", "平均(s)", "最长(s)"]:
+            spans.add_column(column, justify="right" if column != "阶段" else "left")
+        for name, span in sorted(
+            data["spans"].items(), key=lambda item: -item[1]["total_seconds"]
+        ):
+            spans.add_row(
+                name,
+                str(span["count"]),
+                f"{span['total_seconds']:.2f}",
+                f"{span['mean_seconds']:.2f}",
+                f"{span['max_seconds']:.2f}",
+            )
+
+        counters = Table(title="计数器")
+        counters.add_column("名称")
+        counters.add_column("数值", justify="right")
+        for name, value in sorted(data["counters"].items()):
+            counters.add_row(name, str(value))
+
+        usage = Table(title=f"LLM 用量 (估算费用 ${data['usage']['cost_usd']:.4f})")
+        for column in ["阶段", "请求", "输入 tokens", "输出 tokens", "费用($)"]:
+            usage.add_column(column, justify="right" if column != "阶段" else "left")
+        for stage, u in sorted(data["usage"]["stages"].items()):
+            usage.add_row(
+                stage,
+                str(u["calls"]),
+                str(u["prompt_tokens"]),
+                str(u["completion_tokens"]),
+                f"{u['cost_usd']:.4f}",
+            )
+
+        console = Console(file=io.StringIO(), width=70)
+        console.print(spans)
+        console.print(counters)
+        console.print(usage)
+        logger.info("\n" + console.file.getvalue())
+
+
+# 默认值不能是一个共享的 RunMetrics, 否则没有调用 start_run 的上下文
+# (服务模式的请求处理, 批量模式开始运行前) 会把指标写进同一个对象
+_current_metrics: ContextVar[RunMetrics | None] = ContextVar(
+    "current_metrics", default=None
+)
+
+
+def start_run(search_query: str) -> RunMetrics:
+    metrics = RunMetrics(search_query)
+    _current_metrics.set(metrics)
+    return metrics
+
+
+def get_metrics() -> RunMetrics:
+    """当前上下文还没有开始运行时, 为它创建一个独立的 RunMetrics"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        metrics = RunMetrics()
+        _current_metrics.set(metrics)
+    return metrics
@@ -0,0 +1,289 @@
+"""
+搜索流程的流水线: 每个阶段由若干 worker 组成, 阶段之间用有界队列连接。
+
+生产者把数据放进第一个阶段的队列, 每个阶段处理完后自己决定放进哪个阶段的队列。
+下游处理不过来时队列会满, 上游在 put 时等待 (背压)。stop 被设置后取消所有 worker,
+worker 里的 finally 负责关闭页面和释放占用的 UP 主。
+
+crawl_pipeline 把浏览器和 JSON 接口共用的阶段串起来:
+搜索页 → 视频详情 → LLM 判断 → UP 主空间 → 收集结果,
+两种后端只需要提供搜索页, 视频详情和 UP 主空间三个函数。
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from bili_up_finder.config import Config
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.search_helper.ai_search_helper import TargetVideoBatcher
+from bili_up_finder.session import SearchSession, video_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VideoCandidate:
+    """搜索结果里的一个视频, 在流水线各阶段之间传递"""
+
+    page: int
+    href: str
+    up_name: str
+    title: str = ""
+    tags: list[str] = field(default_factory=list)
+    uploader: str = ""
+    profile_url: str = ""
+    mid: int | None = None
+
+
+def _raise_if_cancelling() -> None:
+    """
+    httpx 的连接池在某些时机会吞掉 asyncio 的取消, 任务继续运行。
+    取消请求还没有被处理时重新抛出, 否则 run_pipeline 会一直等待这个 worker。
+    """
+    task = asyncio.current_task()
+    if task is not None and task.cancelling():
+        raise asyncio.CancelledError
+
+
+@dataclass
+class Stage:
+    name: str
+    handle: Callable[[Any], Awaitable[None]]
+    workers: int = 1
+    maxsize: int = 0
+    queue: asyncio.Queue = field(init=False)
+
+    def __post_init__(self):
+        self.queue = asyncio.Queue(self.maxsize)
+
+    async def put(self, item: Any) -> None:
+        await self.queue.put(item)
+
+    async def _work(self) -> None:
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handle(item)
+            finally:
+                self.queue.task_done()
+            _raise_if_cancelling()
+
+
+async def run_pipeline(
+    produce: Callable[[], Awaitable[None]], stages: list[Stage], stop: asyncio.Event
+) -> None:
+    """
+    运行到生产者结束且所有队列清空, 或 stop 被设置为止。
+    任何 worker 抛出的异常都会取消整个流水线并向上抛出。
+    """
+
+    async def drain() -> None:
+        await produce()
+        # 按顺序等待, 上游清空之后下游不会再收到新数据
+        for stage in stages:
+            await stage.queue.join()
+
+    workers = [
+        asyncio.create_task(stage._work(), name=f"{stage.name}-{i}")
+        for stage in stages
+        for i in range(stage.workers)
+    ]
+    drain_task = asyncio.create_task(drain())
+    stop_task = asyncio.create_task(stop.wait())
+    tasks = [drain_task, stop_task, *workers]
+
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()  # worker 只会因为异常结束
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class PageProgress:
+    """
+    记录每个搜索页还有多少视频没有处理完。生产者已经翻到后面的页时,
+    session.page 仍然停在最早没处理完的页, 中断后从那一页恢复。
+    """
+
+    def __init__(self, session: SearchSession):
+        self.session = session
+        self.latest_page = session.page
+        self._pending: Counter[int] = Counter()
+
+    def add(self, page: int) -> None:
+        self._pending[page] += 1
+
+    def advance(self, page: int) -> None:
+        """生产者翻到了 page"""
+        self.latest_page = page
+        self._update()
+
+    def done(self, page: int) -> None:
+        self._pending[page] -= 1
+        if self._pending[page] <= 0:
+            del self._pending[page]
+        self._update()
+
+    def _update(self) -> None:
+        page = min(self._pending, default=self.latest_page)
+        if page != self.session.page:
+            self.session.page = page
+            self.session.save()
+
+
+async def crawl_pipeline(
+    session: SearchSession,
+    config: Config,
+    batcher: TargetVideoBatcher,
+    produce: Callable[[Stage, PageProgress, asyncio.Event], Awaitable[None]],
+    fetch_details: Callable[[VideoCandidate], Awaitable[None]],
+    inspect_space: Callable[[VideoCandidate], Awaitable[dict | None]],
+    on_accept: Callable[[dict], None] | None = None,
+) -> None:
+    """
+    produce(scrape, progress, stop): 逐页把 VideoCandidate 放进 scrape 阶段,
+        放入前调用 progress.add, 翻页后调用 progress.advance
+    fetch_details(candidate): 补全标题, 标签, UP 主名称和空间链接
+    inspect_space(candidate): UP 主满足条件时返回 UP 主信息, 否则返回 None
+    on_accept(user_data): 每接受一个 UP 主调用一次, 用于流式写报告
+    凑够 config.num_up 个 UP 主后取消所有阶段。
+    """
+    progress = PageProgress(session)
+    stop = asyncio.Event()
+    consecutive_failures = 0
+    # 连续失败里已经计数过的异常; 批量判断失败时同一批的视频共用一个异常对象
+    counted_failures: list[BaseException] = []
+
+    def settle(candidate: VideoCandidate, processed: bool = True) -> None:
+        if processed:
+            session.finish(candidate.up_name)
+        else:  # 处理失败或被取消, 下次恢复时重新处理
+            session.release(candidate.up_name)
+        progress.done(candidate.page)
+
+    def succeeded() -> None:
+        nonlocal consecutive_failures
+        consecutive_failures = 0
+        counted_failures.clear()
+
+    def tolerate(candidate: VideoCandidate, e: BaseException) -> bool:
+        """
+        单个视频重试后仍然失败时跳过它继续搜索;
+        取消, 或者连续失败太多次 (多半是被封禁或页面结构变了) 时返回 False。
+        同一个异常 (同一次失败的批量请求) 只计一次失败
+        """
+        nonlocal consecutive_failures
+        settle(candidate, processed=False)
+        if not isinstance(e, Exception):
+            return False
+
+        get_metrics().incr("failed_videos")
+        if not any(e is failure for failure in counted_failures):
+            counted_failures.append(e)
+            consecutive_failures += 1
+            if consecutive_failures >= config.max_consecutive_failures:
+                return False
+
+        logger.warning(f"处理 {candidate.href} 失败, 跳过: {type(e).__name__}: {e}")
+        return True
+
+    async def scrape_video(candidate: VideoCandidate) -> None:
+        if not session.claim(candidate.up_name):
+            logger.debug(f"跳过已处理过的 UP 主: {candidate.up_name}")
+            progress.done(candidate.page)
+            return
+
+        # 上次会话已判断为不相关的视频不需要再打开
+        if session.video_verdicts.get(video_key(candidate.href)) is False:
+            settle(candidate)
+            return
+
+        try:
+            await fetch_details(candidate)
+        except BaseException as e:
+            if tolerate(candidate, e):
+                return
+            raise
+
+        succeeded()
+        await judge.put(candidate)
+
+    async def judge_video(candidate: VideoCandidate) -> None:
+        key = video_key(candidate.href)
+        try:
+            is_relevant = session.video_verdicts.get(key)
+            if is_relevant is None:
+                is_relevant = await batcher.decide(candidate.title, candidate.tags)
+        except BaseException as e:
+            if tolerate(candidate, e):
+                return
+            raise
+
+        if is_relevant is not None:
+            session.video_verdicts[key] = is_relevant
+
+        if is_relevant:
+            await inspect.put(candidate)
+        else:
+            settle(candidate)
+
+    async def inspect_uploader(candidate: VideoCandidate) -> None:
+        if stop.is_set():
+            settle(candidate, processed=False)
+            return
+
+        try:
+            user_data = await inspect_space(candidate)
+        except BaseException as e:
+            if tolerate(candidate, e):
+                return
+            raise
+
+        succeeded()
+        if user_data is not None:
+            await sink.put(user_data)
+        settle(candidate)
+
+    async def collect(user_data: dict) -> None:
+        if (
+            session.accept(user_data["uploader"], user_data, config.num_up)
+            and on_accept is not None
+        ):
+            on_accept(user_data)
+        if len(session.users_data) >= config.num_up:
+            logger.info(
+                f"已找到 {len(session.users_data)} 个 UP 主，"
+                f"达到上限 {config.num_up}，停止搜索。"
+            )
+            stop.set()
+
+    scrape = Stage(
+        "scrape", scrape_video, config.concurrency, config.pipeline_queue_size
+    )
+    judge = Stage(
+        "judge",
+        judge_video,
+        # 批量判断时需要足够多的 worker 同时等待才能凑满一批
+        max(config.judge_workers, config.judge_batch_size),
+        config.pipeline_queue_size,
+    )
+    inspect = Stage(
+        "inspect", inspect_uploader, config.space_workers, config.pipeline_queue_size
+    )
+    sink = Stage("sink", collect)
+
+    try:
+        await run_pipeline(
+            lambda: produce(scrape, progress, stop),
+            [scrape, judge, inspect, sink],
+            stop,
+        )
+    finally:
+        await batcher.aclose()
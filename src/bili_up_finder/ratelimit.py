@@ -0,0 +1,273 @@
+"""
+请求限速和重试。
+
+每个 key (LLM 提供方或网站域名) 有一个令牌桶限制请求速率, 以及一个 AIMD 并发上限:
+请求成功且延迟正常时上限缓慢增加, 被限流 (429, 风控) 时减半, 延迟过高时小幅下调。
+失败的请求按带抖动的指数退避重试, 服务端给出 Retry-After 时优先使用。
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Literal
+
+from bili_up_finder.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# classify 函数的返回值: 被限流, 可以重试, None 表示不重试直接抛出
+THROTTLED = "throttled"
+RETRY = "retry"
+Classify = Callable[[BaseException], str | None]
+
+
+class TokenBucket:
+    """rate 为每秒请求数, 小于等于 0 时不限速。线程安全, 同步和异步调用共用"""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取一个令牌, 返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self) -> None:
+        if wait := self.reserve():
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self) -> None:
+        if wait := self.reserve():
+            time.sleep(wait)
+
+
+class AdaptiveLimit:
+    """AIMD 并发上限, 在 [minimum, maximum] 之间调整"""
+
+    def __init__(
+        self, maximum: int, minimum: int = 1, latency_target: float | None = None
+    ):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.latency_target = latency_target
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @asynccontextmanager
+    async def slot(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self, latency: float) -> None:
+        if self.latency_target is not None and latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * 0.9)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+        logger.debug(f"被限流, 并发上限降到 {int(self.limit)}")
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+@dataclass
+class RateLimiter:
+    bucket: TokenBucket
+    concurrency: AdaptiveLimit
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """带抖动的指数退避, 在 [cap / 2, cap] 之间取随机值"""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        cap = min(self.max_delay, self.base_delay * 2**attempt)
+        return random.uniform(cap / 2, cap)
+
+
+@dataclass
+class _LimitSettings:
+    requests_per_second: float
+    max_concurrency: int
+    latency_target: float
+
+
+_settings: dict[str, _LimitSettings] = {
+    "llm": _LimitSettings(
+        requests_per_second=20, max_concurrency=20, latency_target=30
+    ),
+    "site": _LimitSettings(
+        requests_per_second=10, max_concurrency=8, latency_target=10
+    ),
+}
+_policy = RetryPolicy()
+_limiters: dict[tuple[str, str], RateLimiter] = {}
+_lock = threading.Lock()
+
+
+def configure_rate_limits(
+    llm_requests_per_second: float,
+    llm_max_concurrency: int,
+    site_requests_per_second: float,
+    site_max_concurrency: int,
+    max_retries: int,
+    retry_base_delay: float,
+    retry_max_delay: float,
+) -> None:
+    """修改限速和重试设置, 已经创建的限速器会被丢弃"""
+    global _policy
+    with _lock:
+        _settings["llm"] = _LimitSettings(
+            llm_requests_per_second,
+            llm_max_concurrency,
+            _settings["llm"].latency_target,
+        )
+        _settings["site"] = _LimitSettings(
+            site_requests_per_second,
+            site_max_concurrency,
+            _settings["site"].latency_target,
+        )
+        _policy = RetryPolicy(max_retries, retry_base_delay, retry_max_delay)
+        _limiters.clear()
+
+
+def get_limiter(key: str, kind: Literal["llm", "site"]) -> RateLimiter:
+    with _lock:
+        if (kind, key) not in _limiters:
+            settings = _settings[kind]
+            _limiters[(kind, key)] = RateLimiter(
+                TokenBucket(
+                    settings.requests_per_second,
+                    burst=max(1.0, settings.requests_per_second * 2),
+                ),
+                AdaptiveLimit(
+                    settings.max_concurrency, latency_target=settings.latency_target
+                ),
+            )
+        return _limiters[(kind, key)]
+
+
+def retry_after(e: BaseException) -> float | None:
+    """openai 和 httpx 的异常都带有 response, 读取 Retry-After 头"""
+    response = getattr(e, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _should_retry(e: Exception, classify: Classify, attempt: int) -> str | None:
+    outcome = classify(e)
+    if outcome is None or attempt >= _policy.max_retries:
+        return None
+
+    get_metrics().incr("retries")
+    if outcome == THROTTLED:
+        get_metrics().incr("throttled")
+    logger.warning(f"请求失败 ({type(e).__name__}: {e}), 第 {attempt + 1} 次重试")
+    return outcome
+
+
+async def retry_async[T](
+    fn: Callable[[], Awaitable[T]],
+    classify: Classify,
+    key: str | None = None,
+    kind: Literal["llm", "site"] = "site",
+) -> T:
+    """
+    调用 fn, 按 classify 的结果决定是否重试。
+    key 不为 None 时经过该 key 的令牌桶和并发上限。
+    """
+    limiter = get_limiter(key, kind) if key is not None else None
+    attempt = 0
+    while True:
+        try:
+            if limiter is None:
+                return await fn()
+
+            await limiter.bucket.acquire()
+            async with limiter.concurrency.slot():
+                start = time.perf_counter()
+                result = await fn()
+            limiter.concurrency.on_success(time.perf_counter() - start)
+            return result
+        except Exception as e:
+            outcome = _should_retry(e, classify, attempt)
+            if outcome is None:
+                raise
+            if outcome == THROTTLED and limiter is not None:
+                limiter.concurrency.on_throttle()
+            delay = _policy.delay(attempt, retry_after(e))
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def retry_sync[T](
+    fn: Callable[[], T],
+    classify: Classify,
+    key: str | None = None,
+    kind: Literal["llm", "site"] = "site",
+) -> T:
+    """retry_async 的同步版本, 只经过令牌桶, 不调整并发上限"""
+    limiter = get_limiter(key, kind) if key is not None else None
+    attempt = 0
+    while True:
+        try:
+            if limiter is not None:
+                limiter.bucket.acquire_sync()
+            return fn()
+        except Exception as e:
+            if _should_retry(e, classify, attempt) is None:
+                raise
+            delay = _policy.delay(attempt, retry_after(e))
+
+        time.sleep(delay)
+        attempt += 1
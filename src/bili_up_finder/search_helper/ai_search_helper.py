@@ -1,38 +1,47 @@
+import asyncio
+import json
 import logging
+import re
 
 from bili_up_finder.assistant import DeepSeekAssistant
+from bili_up_finder.budget import get_budget
+from bili_up_finder.cache.verdict_cache import get_verdict_cache, verdict_cache_key
+from bili_up_finder.config import Config
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.ratelimit import RETRY, retry_async, retry_sync
+from bili_up_finder.search_helper.embedding_judge import get_embedding_judge
+from bili_up_finder.search_helper.local_score import (
+    LocalPrefilter,
+    count_keyword_hits,
+    expanded_keywords,
+)
 from bili_up_finder.search_helper.system_prompt.reader import get_system_prompts
 
 logger = logging.getLogger(__name__)
 
+# 预算不足时, UP 主空间里命中扩展关键词的标题比例达到该值即认为相关
+BUDGET_SPACE_KEYWORD_SHARE = 0.5
 
-def expand_search_query(search_query: str, verbose: bool) -> str:
+
+def _expand_search_query_client(verbose: bool) -> DeepSeekAssistant:
     instructions = get_system_prompts("expand_search_query")
 
     if verbose:
         reason = " 在yes或no之后, 告诉我你为什么这么认为。"
         instructions += f" {reason}"
 
-    client = DeepSeekAssistant(instructions=instructions, verbose=verbose)
-    response = client.ask(search_query)
+    return DeepSeekAssistant(instructions=instructions, stage="expand_query")
 
-    logger.debug(
-        f"扩展关键词结果: {response}",
-    )
 
-    return response
+def _target_video_input(title: str, tags: list[str], search_query: str) -> str:
+    return f"视频标题是: {title}. 附加的标签: {', '.join(tags)}. 搜索查询是: {search_query}."
 
 
-def decide_target_video_relevant(
-    title: str, tags: list[str], search_query: str, verbose: bool
-) -> bool:
-    instructions = get_system_prompts("decide_target_video_relevant")
+def _user_space_input(video_captions: list[str], search_query: str) -> str:
+    return f"视频标题列表: {', '.join(video_captions)}. 搜索关键词是: {search_query}."
 
-    client = DeepSeekAssistant(instructions=instructions, verbose=verbose)
-    response = client.ask(
-        f"视频标题是: {title}. 附加的标签: {', '.join(tags)}. 搜索查询是: {search_query}."
-    )
 
+def _parse_target_video_response(response: str, verbose: bool) -> bool:
     logger.info(
         f"DeepSeek response: {response}",
     )
@@ -48,16 +57,7 @@ def decide_target_video_relevant(
             )
 
 
-def decide_user_space_video_relevant(
-    video_captions: list[str], search_query: str, verbose: bool
-) -> bool:
-    instructions = get_system_prompts("decide_user_space_video_relevant")
-
-    client = DeepSeekAssistant(instructions=instructions, verbose=verbose)
-    response = client.ask(
-        f"视频标题列表: {', '.join(video_captions)}. 搜索关键词是: {search_query}."
-    )
-
+def _parse_user_space_response(response: str, video_captions: list[str]) -> bool:
     logger.debug(f"video_captions: {video_captions}")
 
     logger.info(f"decide_user_space_video_relevant, DeepSeek response: {response}")
@@ -68,3 +68,462 @@ def decide_user_space_video_relevant(
         return False
     else:
         raise ValueError("The response from AI Assistant is neither 'yes' nor 'no'.")
+
+
+def _user_space_by_keywords(video_captions: list[str], search_query: str) -> bool:
+    """预算不足时代替 LLM: 按命中扩展关键词的标题比例判断"""
+    if not video_captions:
+        return False
+    hits = count_keyword_hits(video_captions, expanded_keywords(search_query))
+    return hits / len(video_captions) >= BUDGET_SPACE_KEYWORD_SHARE
+
+
+def _is_unparsable(e: BaseException) -> str | None:
+    return RETRY if isinstance(e, ValueError) else None
+
+
+def _ask_and_parse(client: DeepSeekAssistant, user_input: str, parse) -> bool | None:
+    """回复里既没有 yes 也没有 no 时重新提问, 多次仍然无法解析时返回 None"""
+    try:
+        return retry_sync(lambda: parse(client.ask(user_input)), _is_unparsable)
+    except ValueError as e:
+        logger.warning(f"无法解析模型回复, 放弃判断: {e}")
+        return None
+
+
+async def _ask_and_parse_async(
+    client: DeepSeekAssistant, user_input: str, parse
+) -> bool | None:
+    async def ask() -> bool | None:
+        return parse(await client.ask_async(user_input))
+
+    try:
+        return await retry_async(ask, _is_unparsable)
+    except ValueError as e:
+        logger.warning(f"无法解析模型回复, 放弃判断: {e}")
+        return None
+
+
+def expand_search_query(search_query: str, verbose: bool) -> str:
+    if get_budget().skip():
+        return search_query
+
+    client = _expand_search_query_client(verbose)
+    response = client.ask(search_query)
+
+    logger.debug(
+        f"扩展关键词结果: {response}",
+    )
+
+    return response
+
+
+def decide_target_video_relevant(
+    title: str, tags: list[str], search_query: str, verbose: bool
+) -> bool | None:
+    instructions = get_system_prompts("decide_target_video_relevant")
+
+    client = DeepSeekAssistant(
+        instructions=instructions, verbose=verbose, stage="target_video"
+    )
+    cache_key = verdict_cache_key(
+        instructions, client.model, "target_video", title, tags, search_query
+    )
+    if (verdict := get_verdict_cache().get(cache_key)) is not None:
+        return verdict
+    if get_budget().skip():  # 预算不足, 不确定的视频不再判断
+        return None
+
+    verdict = _ask_and_parse(
+        client,
+        _target_video_input(title, tags, search_query),
+        lambda response: _parse_target_video_response(response, verbose),
+    )
+
+    if verdict is not None:
+        get_verdict_cache().set(cache_key, verdict)
+    return verdict
+
+
+def decide_user_space_video_relevant(
+    video_captions: list[str], search_query: str, verbose: bool
+) -> bool:
+    instructions = get_system_prompts("decide_user_space_video_relevant")
+
+    client = DeepSeekAssistant(
+        instructions=instructions, verbose=verbose, stage="user_space"
+    )
+    cache_key = verdict_cache_key(
+        instructions, client.model, "user_space", video_captions, search_query
+    )
+    if (verdict := get_verdict_cache().get(cache_key)) is not None:
+        return verdict
+    if get_budget().skip():
+        return _user_space_by_keywords(video_captions, search_query)
+
+    verdict = _ask_and_parse(
+        client,
+        _user_space_input(video_captions, search_query),
+        lambda response: _parse_user_space_response(response, video_captions),
+    )
+    if verdict is None:  # 无法判断时不收录, 也不写入缓存
+        return False
+
+    get_verdict_cache().set(cache_key, verdict)
+    return verdict
+
+
+async def expand_search_query_async(search_query: str, verbose: bool) -> str:
+    if get_budget().skip():
+        return search_query
+
+    client = _expand_search_query_client(verbose)
+    response = await client.ask_async(search_query)
+
+    logger.debug(
+        f"扩展关键词结果: {response}",
+    )
+
+    return response
+
+
+async def decide_target_video_relevant_async(
+    title: str,
+    tags: list[str],
+    search_query: str,
+    verbose: bool,
+    use_embedding: bool = True,
+) -> bool | None:
+    """
+    返回 None 表示没有判断: 预算不足, 或者重试后仍无法解析回复。
+    use_embedding: 批量判断里已经算过向量相似度的视频传 False
+    """
+    instructions = get_system_prompts("decide_target_video_relevant")
+
+    client = DeepSeekAssistant(
+        instructions=instructions, verbose=verbose, stage="target_video"
+    )
+    cache_key = verdict_cache_key(
+        instructions, client.model, "target_video", title, tags, search_query
+    )
+    if (verdict := get_verdict_cache().get(cache_key)) is not None:
+        return verdict
+    if get_budget().skip():  # 预算不足, 不确定的视频不再判断
+        return None
+    # 向量相似度能确定结果时不需要问 LLM
+    if (
+        use_embedding
+        and (judge := get_embedding_judge()) is not None
+        and (verdict := await judge.decide_video(title, tags, search_query)) is not None
+    ):
+        return verdict
+
+    verdict = await _ask_and_parse_async(
+        client,
+        _target_video_input(title, tags, search_query),
+        lambda response: _parse_target_video_response(response, verbose),
+    )
+
+    if verdict is not None:
+        get_verdict_cache().set(cache_key, verdict)
+    return verdict
+
+
+async def decide_user_space_video_relevant_async(
+    video_captions: list[str], search_query: str, verbose: bool
+) -> bool:
+    instructions = get_system_prompts("decide_user_space_video_relevant")
+
+    client = DeepSeekAssistant(
+        instructions=instructions, verbose=verbose, stage="user_space"
+    )
+    cache_key = verdict_cache_key(
+        instructions, client.model, "user_space", video_captions, search_query
+    )
+    if (verdict := get_verdict_cache().get(cache_key)) is not None:
+        return verdict
+    if get_budget().skip():
+        return _user_space_by_keywords(video_captions, search_query)
+    # 向量相似度能确定结果时不需要问 LLM
+    if (judge := get_embedding_judge()) is not None and (
+        verdict := await judge.decide_user_space(video_captions, search_query)
+    ) is not None:
+        return verdict
+
+    verdict = await _ask_and_parse_async(
+        client,
+        _user_space_input(video_captions, search_query),
+        lambda response: _parse_user_space_response(response, video_captions),
+    )
+    if verdict is None:  # 无法判断时不收录, 也不写入缓存
+        return False
+
+    get_verdict_cache().set(cache_key, verdict)
+    return verdict
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数: 中文约每字一个 token, 其他字符约四个一个 token"""
+    cjk = sum(1 for c in text if ord(c) >= 0x2E80)
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _batch_input(items: list[tuple[str, list[str]]], search_query: str) -> str:
+    lines = [
+        f"{i}. 视频标题是: {title}. 附加的标签: {', '.join(tags)}."
+        for i, (title, tags) in enumerate(items, start=1)
+    ]
+    return "\n".join(lines) + f"\n搜索查询是: {search_query}."
+
+
+def _parse_batch_response(response: str, num_items: int) -> dict[int, bool]:
+    """解析 [{"id": 1, "relevant": true}, ...], 格式不对的条目直接忽略"""
+    match = re.search(r"\[.*\]", response, re.DOTALL)
+    if not match:
+        return {}
+
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+
+    verdicts = {}
+    for item in items if isinstance(items, list) else []:
+        if (
+            isinstance(item, dict)
+            and isinstance(item.get("id"), int)
+            and isinstance(item.get("relevant"), bool)
+            and 1 <= item["id"] <= num_items
+        ):
+            verdicts[item["id"]] = item["relevant"]
+    return verdicts
+
+
+def _split_batches(
+    items: list[tuple[str, list[str]]],
+    batch_size: int,
+    max_prompt_tokens: int,
+    fixed_tokens: int,
+) -> list[list[int]]:
+    """按数量和 token 预算把待判断的视频分批, 返回每批的下标"""
+    batches, current, current_tokens = [], [], fixed_tokens
+    for index, (title, tags) in enumerate(items):
+        item_tokens = estimate_tokens(title) + estimate_tokens(", ".join(tags)) + 16
+        if current and (
+            len(current) >= batch_size
+            or current_tokens + item_tokens > max_prompt_tokens
+        ):
+            batches.append(current)
+            current, current_tokens = [], fixed_tokens
+        current.append(index)
+        current_tokens += item_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def decide_target_videos_relevant_batch_async(
+    items: list[tuple[str, list[str]]],
+    search_query: str,
+    verbose: bool,
+    batch_size: int = 30,
+    max_prompt_tokens: int = 6000,
+) -> list[bool | None]:
+    """
+    一次请求判断多个视频 (标题, 标签) 是否相关, 返回与 items 顺序一致的结果。
+    没有缓存的视频先在一次请求里转成向量, 只把相似度落在中间的交给 LLM。
+    批量回复格式不对时, 只把缺失的视频逐个重新判断。
+    """
+    single_instructions = get_system_prompts("decide_target_video_relevant")
+    instructions = get_system_prompts("decide_target_videos_relevant_batch")
+    # 批量 prompt 要求输出 JSON, 不能追加 verbose 的理由说明
+    client = DeepSeekAssistant(
+        instructions=instructions, verbose=False, stage="target_video_batch"
+    )
+
+    # 批量判断与单个判断回答的是同一个问题, 共用同一份缓存
+    cache_keys = [
+        verdict_cache_key(
+            single_instructions, client.model, "target_video", title, tags, search_query
+        )
+        for title, tags in items
+    ]
+    verdicts: list[bool | None] = [get_verdict_cache().get(key) for key in cache_keys]
+    pending = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if not pending or get_budget().skip():  # 预算不足, 没有缓存的视频保持未判断
+        return verdicts
+
+    if (judge := get_embedding_judge()) is not None:
+        embedded = await judge.decide_videos([items[i] for i in pending], search_query)
+        for index, verdict in zip(pending, embedded):
+            verdicts[index] = verdict
+        pending = [i for i in pending if verdicts[i] is None]
+
+    fixed_tokens = estimate_tokens(instructions) + estimate_tokens(search_query)
+    batches = _split_batches(
+        [items[i] for i in pending], batch_size, max_prompt_tokens, fixed_tokens
+    )
+
+    async def judge_batch(batch: list[int]) -> None:
+        if get_budget().skip():  # 预算不足, 这一批保持未判断
+            return
+
+        indices = [pending[i] for i in batch]
+        response = await client.ask_async(
+            _batch_input([items[i] for i in indices], search_query)
+        )
+        logger.info(f"DeepSeek batch response: {response}")
+
+        parsed = _parse_batch_response(response, len(indices))
+        for position, index in enumerate(indices, start=1):
+            if position in parsed:
+                verdicts[index] = parsed[position]
+                get_verdict_cache().set(cache_keys[index], parsed[position])
+            else:
+                title, tags = items[index]
+                logger.debug(f"批量判断缺少第 {position} 个视频, 单独重试: {title}")
+                verdicts[index] = await decide_target_video_relevant_async(
+                    title, tags, search_query, verbose, use_embedding=False
+                )
+
+    await asyncio.gather(*(judge_batch(batch) for batch in batches))
+
+    return verdicts
+
+
+class TargetVideoBatcher:
+    """
+    把并发标签页各自发起的视频判断攒成一批, 凑够 batch_size 个或等待 flush_delay
+    秒后一起发给 decide_target_videos_relevant_batch_async。
+    batch_size 为 1 时退化为逐个判断。
+    设置了 prefilter 时, 本地打分能确定结果的视频不会发给 LLM;
+    启用了向量判断时, 相似度能确定结果的视频也不会发给 LLM,
+    批量模式下整批视频在一次请求里转成向量。
+    LLM 预算不足时, 没有设置 prefilter 也会用 fallback_prefilter 打分。
+    """
+
+    def __init__(
+        self,
+        search_query: str,
+        verbose: bool,
+        batch_size: int = 1,
+        max_prompt_tokens: int = 6000,
+        flush_delay: float = 0.5,
+        prefilter: LocalPrefilter | None = None,
+        fallback_prefilter: LocalPrefilter | None = None,
+    ):
+        self.search_query = search_query
+        self.verbose = verbose
+        self.batch_size = batch_size
+        self.max_prompt_tokens = max_prompt_tokens
+        self.flush_delay = flush_delay
+        self.prefilter = prefilter
+        self.fallback_prefilter = fallback_prefilter
+
+        self._pending: list[tuple[str, list[str], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_config(cls, search_query: str, config: Config) -> "TargetVideoBatcher":
+        local = LocalPrefilter(
+            search_query,
+            accept_hits=config.prefilter_accept_hits,
+            reject_overlap=config.prefilter_reject_overlap,
+        )
+
+        return cls(
+            search_query,
+            config.verbose,
+            batch_size=config.judge_batch_size,
+            max_prompt_tokens=config.judge_max_prompt_tokens,
+            prefilter=local if config.prefilter else None,
+            fallback_prefilter=local,
+        )
+
+    async def decide(self, title: str, tags: list[str]) -> bool | None:
+        prefilter = self.prefilter
+        if prefilter is None and get_budget().low():
+            prefilter = self.fallback_prefilter
+
+        if prefilter is not None:
+            verdict = prefilter.decide(title, tags)
+            get_metrics().incr(
+                {True: "prefilter_accepts", False: "prefilter_rejects"}.get(
+                    verdict, "prefilter_ambiguous"
+                )
+            )
+            if verdict is not None:
+                logger.debug(f"本地打分直接判定 {title}: {verdict}")
+                return verdict
+
+        if self.batch_size <= 1:
+            return await decide_target_video_relevant_async(
+                title, tags, self.search_query, self.verbose
+            )
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((title, tags, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_delay, self._flush)
+
+        return await future
+
+    async def aclose(self) -> None:
+        """
+        流水线结束后调用: 没人再等待的视频不再发出请求, 取消还在进行的批量判断,
+        避免它们在 LLM 客户端关闭之后继续调用
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, []
+        for _, _, future in pending:
+            future.cancel()
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._judge(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _judge(self, pending: list[tuple[str, list[str], asyncio.Future]]):
+        try:
+            verdicts = await decide_target_videos_relevant_batch_async(
+                [(title, tags) for title, tags, _ in pending],
+                self.search_query,
+                self.verbose,
+                batch_size=self.batch_size,
+                max_prompt_tokens=self.max_prompt_tokens,
+            )
+        except BaseException as e:
+            # 同一批视频共用这一个异常对象, 流水线据此把它们算作一次失败
+            for _, _, future in pending:
+                if not future.done():
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                    else:
+                        future.cancel()
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, _, future), verdict in zip(pending, verdicts):
+            if not future.done():
+                future.set_result(verdict)
@@ -0,0 +1,187 @@
+"""
+基于向量相似度的相关性判断。
+
+扩展关键词和视频标题/标签通过 OpenAI 兼容的 embeddings 接口转成向量,
+与关键词的余弦相似度足够高或足够低时直接给出结果, 其余情况返回 None,
+交给 LLM 判断。UP 主空间的全部标题在一次请求里转成向量。
+"""
+
+import logging
+import math
+import os
+
+from openai import AsyncOpenAI
+
+from bili_up_finder.assistant import classify_llm_error
+from bili_up_finder.budget import record_llm_usage
+from bili_up_finder.cache.embedding_cache import (
+    embedding_cache_key,
+    get_embedding_cache,
+)
+from bili_up_finder.llm_clients import get_async_client
+from bili_up_finder.metrics import get_metrics
+from bili_up_finder.ratelimit import retry_async
+
+logger = logging.getLogger(__name__)
+
+# 单次请求最多转换的文本数
+MAX_INPUTS_PER_REQUEST = 256
+
+
+def _normalized(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+def _dot(a: list[float], b: list[float]) -> float:
+    return math.fsum(x * y for x, y in zip(a, b))
+
+
+class EmbeddingJudge:
+    """
+    - 相似度 >= accept: 相关
+    - 相似度 <= reject: 不相关
+    - UP 主空间: 相关标题的比例 >= space_share 时相关,
+      把边界标题也算上仍然达不到 space_share 时不相关
+    """
+
+    provider = "embedding"
+
+    def __init__(
+        self,
+        model: str,
+        accept: float,
+        reject: float,
+        space_share: float,
+        api_key: str | None = None,
+        base_url: str | None = None,
+    ):
+        self.model = model
+        self.accept = accept
+        self.reject = reject
+        self.space_share = space_share
+        self.api_key = api_key
+        self.base_url = base_url
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        if not self.api_key:
+            api_key = os.getenv("EMBEDDING_API_KEY") or os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError(
+                    "EMBEDDING_API_KEY or OPENAI_API_KEY environment variable is not set."
+                )
+            self.api_key = api_key
+            self.base_url = self.base_url or os.getenv("EMBEDDING_BASE_URL")
+
+        return get_async_client(self.provider, self.base_url, self.api_key)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """返回单位长度的向量, 缓存里没有的文本合并成尽量少的请求"""
+        cache = get_embedding_cache()
+        keys = [embedding_cache_key(self.model, text) for text in texts]
+        vectors = [cache.get(key) for key in keys]
+
+        fetched: dict[str, list[float]] = {}
+        missing = list(
+            {texts[i]: keys[i] for i, v in enumerate(vectors) if v is None}.items()
+        )
+        for start in range(0, len(missing), MAX_INPUTS_PER_REQUEST):
+            chunk = missing[start : start + MAX_INPUTS_PER_REQUEST]
+            with get_metrics().span("embedding_call"):
+                response = await retry_async(
+                    lambda chunk=chunk: self.async_client.embeddings.create(
+                        model=self.model, input=[text for text, _ in chunk]
+                    ),
+                    classify_llm_error,
+                    key=self.provider,
+                    kind="llm",
+                )
+
+            get_metrics().incr("embedding_calls")
+            if response.usage:
+                get_metrics().incr("embedding_tokens", response.usage.prompt_tokens)
+                record_llm_usage(
+                    "embedding", self.model, response.usage.prompt_tokens, 0
+                )
+            for item in response.data:
+                key = chunk[item.index][1]
+                fetched[key] = _normalized(item.embedding)
+                cache.set(key, fetched[key])
+
+        return [vector or fetched[key] for vector, key in zip(vectors, keys)]
+
+    async def similarities(self, texts: list[str], search_query: str) -> list[float]:
+        query_vector, *vectors = await self.embed([search_query, *texts])
+        return [_dot(query_vector, vector) for vector in vectors]
+
+    def _verdict(self, similarity: float) -> bool | None:
+        if similarity >= self.accept:
+            return True
+        if similarity <= self.reject:
+            return False
+        return None
+
+    async def decide_videos(
+        self, items: list[tuple[str, list[str]]], search_query: str
+    ) -> list[bool | None]:
+        """多个视频 (标题, 标签) 在一次请求里转成向量, 返回与 items 顺序一致的结果"""
+        similarities = await self.similarities(
+            [" ".join([title, *tags]) for title, tags in items], search_query
+        )
+        verdicts = [self._verdict(similarity) for similarity in similarities]
+        for (title, _), similarity, verdict in zip(items, similarities, verdicts):
+            self._count(verdict)
+            logger.debug(f"向量相似度 {similarity:.3f}: {title} -> {verdict}")
+        return verdicts
+
+    async def decide_video(
+        self, title: str, tags: list[str], search_query: str
+    ) -> bool | None:
+        (verdict,) = await self.decide_videos([(title, tags)], search_query)
+        return verdict
+
+    async def decide_user_space(
+        self, video_captions: list[str], search_query: str
+    ) -> bool | None:
+        if not video_captions:
+            return None
+
+        verdicts = [
+            self._verdict(similarity)
+            for similarity in await self.similarities(video_captions, search_query)
+        ]
+        relevant = verdicts.count(True) / len(verdicts)
+        possible = relevant + verdicts.count(None) / len(verdicts)
+        logger.debug(f"UP 主空间相关标题比例 {relevant:.2f}, 最多 {possible:.2f}")
+
+        if relevant >= self.space_share:
+            verdict = True
+        elif possible < self.space_share:
+            verdict = False
+        else:
+            verdict = None
+        self._count(verdict)
+        return verdict
+
+    def _count(self, verdict: bool | None) -> None:
+        get_metrics().incr(
+            {True: "embedding_accepts", False: "embedding_rejects"}.get(
+                verdict, "embedding_ambiguous"
+            )
+        )
+
+
+_judge: EmbeddingJudge | None = None
+
+
+def configure_embedding_judge(
+    enabled: bool, model: str, accept: float, reject: float, space_share: float
+) -> None:
+    """enabled 为 False 时所有判断都交给 LLM"""
+    global _judge
+    _judge = EmbeddingJudge(model, accept, reject, space_share) if enabled else None
+
+
+def get_embedding_judge() -> EmbeddingJudge | None:
+    return _judge
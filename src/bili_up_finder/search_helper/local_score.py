@@ -0,0 +1,78 @@
+"""
+不调用 LLM 的本地打分: 用扩展关键词做简单的字符串匹配。
+"""
+
+import re
+
+
+def expanded_keywords(search_query: str) -> list[str]:
+    """expand_search_query 的结果是逗号分隔的词语, 拆开后去重"""
+    keywords: list[str] = []
+    for word in re.split(r"[,，、;；\s]+", search_query):
+        word = word.strip().lower()
+        if word and word not in keywords:
+            keywords.append(word)
+    return keywords
+
+
+def count_keyword_hits(captions: list[str], keywords: list[str]) -> int:
+    """包含任一关键词的标题数量"""
+    return sum(
+        any(keyword in caption.lower() for keyword in keywords) for caption in captions
+    )
+
+
+def sample_captions(captions: list[str], recent: int, sample: int) -> list[str]:
+    """
+    captions 按发布时间从新到旧排列。保留最新的 recent 个,
+    再从剩下的标题里等间隔抽取 sample 个, 覆盖整个投稿历史。
+    """
+    if sample <= 0:
+        return captions[:recent]
+    if len(captions) <= recent + sample:
+        return list(captions)
+
+    older = captions[recent:]
+    step = len(older) / sample
+    return captions[:recent] + [older[int(i * step)] for i in range(sample)]
+
+
+def char_ngrams(text: str, n: int = 2) -> set[str]:
+    """去掉空白和标点后的字符 n-gram, 中文不需要分词"""
+    text = re.sub(r"[\W_]+", "", text.lower())
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+class LocalPrefilter:
+    """
+    在调用 LLM 之前用扩展关键词给视频打分:
+    - 标题和标签命中至少 accept_hits 个不同的扩展关键词, 直接判为相关
+    - 没有命中任何关键词, 且标题和标签的 bigram 与关键词 bigram 的重合比例
+      低于 reject_overlap, 直接判为不相关
+    - 其余情况返回 None, 交给 LLM 判断
+    """
+
+    def __init__(self, search_query: str, accept_hits: int, reject_overlap: float):
+        self.keywords = expanded_keywords(search_query)
+        self.keyword_grams = set().union(*(char_ngrams(k) for k in self.keywords))
+        self.accept_hits = accept_hits
+        self.reject_overlap = reject_overlap
+
+    def score(self, title: str, tags: list[str]) -> tuple[int, float]:
+        """返回 (命中的关键词数, bigram 重合比例)"""
+        text = " ".join([title, *tags]).lower()
+        hits = sum(keyword in text for keyword in self.keywords)
+
+        grams = char_ngrams(text)
+        overlap = len(grams & self.keyword_grams) / len(grams) if grams else 0.0
+        return hits, overlap
+
+    def decide(self, title: str, tags: list[str]) -> bool | None:
+        hits, overlap = self.score(title, tags)
+        if self.accept_hits and hits >= self.accept_hits:
+            return True
+        if hits == 0 and overlap < self.reject_overlap:
+            return False
+        return None
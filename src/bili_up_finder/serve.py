@@ -0,0 +1,408 @@
+"""
+常驻服务模式: 浏览器, LLM 连接和缓存在进程里保持热状态, 通过本地 HTTP 接口提交搜索。
+
+- POST   /jobs               提交搜索 {"query": "摄影", "num_up": 10}, 返回任务信息
+- GET    /jobs               所有任务
+- GET    /jobs/<id>          任务状态和已接受的 UP 主
+- GET    /jobs/<id>/stream   NDJSON, 先输出已接受的 UP 主, 之后每接受一个输出一行
+- GET    /jobs/<id>/report   HTML 报告, 任务运行中时自动刷新
+- DELETE /jobs/<id>          取消任务
+
+同时运行的任务数为 config.batch_contexts, 每个任务占用一个 context,
+其余任务按提交顺序排队。结束的任务最多保留 config.job_retention 个,
+超过 config.job_retention_minutes 后删除。判断缓存, 空间缓存和向量缓存的
+内存层有条目上限和过期时间, 常驻时也不会无限增长。
+"""
+
+import asyncio
+import json
+import logging
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import click
+from playwright.async_api import async_playwright
+
+from bili_up_finder.browser import ContextPool
+from bili_up_finder.config import Config, init_config
+from bili_up_finder.llm_clients import aclose_clients
+from bili_up_finder.up_finder import ensure_auth_state, run_query
+from bili_up_finder.web_builder import render_report
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+@dataclass
+class Job:
+    id: str
+    query: str
+    num_up: int
+    status: str = "queued"  # queued / running / done / failed / cancelled
+    users_data: list[dict] = field(default_factory=list)
+    error: str | None = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    finished_at: str | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def accept(self, user_data: dict) -> None:
+        if all(user["uploader"] != user_data["uploader"] for user in self.users_data):
+            self.users_data.append(user_data)
+            self._notify()
+
+    def finish(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now().isoformat()
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_for_change(self) -> None:
+        await self._changed.wait()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "query": self.query,
+            "num_up": self.num_up,
+            "status": self.status,
+            "found": len(self.users_data),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "report": f"/jobs/{self.id}/report",
+            "users_data": self.users_data,
+        }
+
+
+class SearchService:
+    """持有浏览器和任务表, 一个进程一个实例"""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.jobs: dict[str, Job] = {}
+        # Semaphore 的等待者按先来后到唤醒, 排队的任务按提交顺序开始
+        self._slots = asyncio.Semaphore(config.batch_contexts)
+        self._contexts: ContextPool | None = None
+
+    async def start(self, p) -> None:
+        ensure_auth_state()
+        self._contexts = ContextPool(p, self.config, size=self.config.batch_contexts)
+        if self.config.backend == "browser":
+            # 提前启动浏览器, 第一个任务不需要等待
+            async with self._contexts.acquire():
+                pass
+        logger.info("搜索服务已就绪")
+
+    async def close(self) -> None:
+        for job in self.jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+        await asyncio.gather(
+            *(job.task for job in self.jobs.values() if job.task is not None),
+            return_exceptions=True,
+        )
+        if self._contexts is not None:
+            await self._contexts.close()
+        await aclose_clients()
+
+    def prune_jobs(self) -> None:
+        """删除超过保留时间的已结束任务, 已结束的任务最多保留 job_retention 个"""
+        expire_before = datetime.now() - timedelta(
+            minutes=self.config.job_retention_minutes
+        )
+        finished = sorted(
+            (job for job in self.jobs.values() if job.finished),
+            key=lambda job: job.finished_at,
+        )
+        excess = len(finished) - self.config.job_retention
+        for i, job in enumerate(finished):
+            if i < excess or datetime.fromisoformat(job.finished_at) < expire_before:
+                del self.jobs[job.id]
+
+    def submit(self, search_query: str, num_up: int) -> Job:
+        self.prune_jobs()
+        job = Job(uuid.uuid4().hex[:12], search_query, num_up)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job), name=f"job-{job.id}")
+        logger.info(f"收到搜索任务 {job.id}: {search_query}, UP 主数量 {num_up}")
+        return job
+
+    async def _run(self, job: Job) -> None:
+        try:
+            async with self._slots:
+                job.status = "running"
+                users_data = await run_query(
+                    job.query,
+                    self.config.model_copy(update={"num_up": job.num_up}),
+                    contexts=self._contexts,
+                    on_accept=job.accept,
+                )
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        except Exception as e:
+            logger.exception(f"搜索任务 {job.id} 失败")
+            job.finish("failed", f"{type(e).__name__}: {e}")
+            return
+
+        # 命中查询缓存时不会逐个回调, 在这里补上
+        for user_data in users_data:
+            job.accept(user_data)
+        job.finish("done")
+
+
+async def _respond(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    body: bytes = b"",
+    content_type: str = "application/json; charset=utf-8",
+) -> None:
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+
+
+async def _respond_json(
+    writer: asyncio.StreamWriter, data, status: HTTPStatus = HTTPStatus.OK
+) -> None:
+    await _respond(writer, status, json.dumps(data, ensure_ascii=False).encode())
+
+
+async def _stream(writer: asyncio.StreamWriter, job: Job) -> None:
+    """没有 Content-Length, 连接关闭时结束"""
+    writer.write(
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: application/x-ndjson; charset=utf-8\r\n"
+        b"Cache-Control: no-cache\r\n"
+        b"Connection: close\r\n\r\n"
+    )
+    sent = 0
+    while True:
+        if new := job.users_data[sent:]:
+            for user_data in new:
+                writer.write(json.dumps(user_data, ensure_ascii=False).encode() + b"\n")
+            sent += len(new)
+            await writer.drain()
+            continue
+        if job.finished:
+            return
+        await job.wait_for_change()
+
+
+def make_handler(service: SearchService):
+    job_path = re.compile(r"^/jobs/(?P<id>[0-9a-f]+)(?P<action>/stream|/report)?/?$")
+
+    async def route(
+        method: str, path: str, body: bytes, writer: asyncio.StreamWriter
+    ) -> None:
+        service.prune_jobs()
+        if path.rstrip("/") == "/jobs":
+            if method == "GET":
+                await _respond_json(
+                    writer,
+                    [
+                        {k: v for k, v in job.to_dict().items() if k != "users_data"}
+                        for job in service.jobs.values()
+                    ],
+                )
+                return
+            if method == "POST":
+                try:
+                    request = json.loads(body or b"{}")
+                    search_query = str(request["query"]).strip()
+                    num_up = int(request.get("num_up", service.config.num_up))
+                except (ValueError, KeyError, TypeError) as e:
+                    await _respond_json(
+                        writer, {"error": f"bad request: {e}"}, HTTPStatus.BAD_REQUEST
+                    )
+                    return
+                if not search_query or num_up < 1:
+                    await _respond_json(
+                        writer,
+                        {"error": "query must not be empty and num_up must be >= 1"},
+                        HTTPStatus.BAD_REQUEST,
+                    )
+                    return
+                job = service.submit(search_query, num_up)
+                await _respond_json(writer, job.to_dict(), HTTPStatus.ACCEPTED)
+                return
+
+        match = job_path.match(path)
+        job = service.jobs.get(match["id"]) if match else None
+        if job is None:
+            await _respond_json(writer, {"error": "not found"}, HTTPStatus.NOT_FOUND)
+            return
+
+        action = match["action"]
+        if method == "DELETE" and action is None:
+            if job.task is not None and not job.finished:
+                job.task.cancel()
+            await _respond_json(writer, {"id": job.id, "status": "cancelling"})
+        elif method != "GET":
+            await _respond_json(
+                writer, {"error": "method not allowed"}, HTTPStatus.METHOD_NOT_ALLOWED
+            )
+        elif action == "/stream":
+            await _stream(writer, job)
+        elif action == "/report":
+            html = render_report(job.users_data, in_progress=not job.finished)
+            await _respond(
+                writer, HTTPStatus.OK, html.encode(), "text/html; charset=utf-8"
+            )
+        else:
+            await _respond_json(writer, job.to_dict())
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                await _respond_json(
+                    writer,
+                    {"error": "request body too large"},
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                )
+                return
+            body = await reader.readexactly(length)
+            await route(method.upper(), urlsplit(target).path, body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await _respond_json(
+                writer, {"error": "bad request"}, HTTPStatus.BAD_REQUEST
+            )
+        except ConnectionError:
+            pass  # 客户端提前断开, 例如停止读取 stream
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    return handle
+
+
+async def serve_forever(config: Config, host: str, port: int) -> None:
+    async with async_playwright() as p:
+        service = SearchService(config)
+        await service.start(p)
+        server = await asyncio.start_server(make_handler(service), host, port)
+        logger.info(f"搜索服务监听 http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await service.close()
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", type=str, help="Address to listen on.")
+@click.option("--port", default=8765, type=int, help="Port to listen on.")
+@click.option(
+    "--jobs",
+    default=2,
+    type=int,
+    help="Search jobs run at the same time, each holding one browser context.",
+)
+@click.option("-n", "--num-up", default=10, type=int, help="Default number of UPs.")
+@click.option(
+    "-v", "--verbose", default=False, type=bool, help="Enable or disable debug prints."
+)
+@click.option(
+    "--concurrency",
+    default=3,
+    type=int,
+    help="Number of video pages processed concurrently per job.",
+)
+@click.option("--cache-dir", default=".cache", type=str, help="Directory for caches.")
+@click.option("--no-cache", is_flag=True, default=False, help="Disable local caches.")
+@click.option(
+    "--backend",
+    default="browser",
+    type=click.Choice(["browser", "api"]),
+    help="Fetch with a browser, or call the JSON API and fall back to the browser.",
+)
+@click.option(
+    "--judge-batch-size",
+    default=1,
+    type=int,
+    help="Number of videos judged per LLM request (1 disables batching).",
+)
+@click.option(
+    "--browser-profile",
+    default="performance",
+    type=click.Choice(["default", "performance"]),
+    help="performance: headless, blocks media and trackers, waits on selectors.",
+)
+@click.option(
+    "--keep-jobs",
+    default=100,
+    type=int,
+    help="Finished jobs kept for status and reports.",
+)
+@click.option(
+    "--keep-jobs-minutes",
+    default=60,
+    type=float,
+    help="Minutes a finished job is kept.",
+)
+def serve(
+    host,
+    port,
+    jobs,
+    num_up,
+    verbose,
+    concurrency,
+    cache_dir,
+    no_cache,
+    backend,
+    judge_batch_size,
+    browser_profile,
+    keep_jobs,
+    keep_jobs_minutes,
+):
+    config = init_config(
+        num_up=num_up,
+        verbose=verbose,
+        concurrency=concurrency,
+        cache_dir=cache_dir,
+        use_cache=not no_cache,
+        backend=backend,
+        judge_batch_size=judge_batch_size,
+        browser_profile=browser_profile,
+        batch_contexts=jobs,
+        job_retention=keep_jobs,
+        job_retention_minutes=keep_jobs_minutes,
+    )
+    try:
+        asyncio.run(serve_forever(config, host, port))
+    except KeyboardInterrupt:
+        logger.info("搜索服务已停止")
+
+
+if __name__ == "__main__":
+    serve()
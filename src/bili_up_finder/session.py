@@ -0,0 +1,107 @@
+"""
+可恢复的搜索会话。
+
+会话记录当前搜索页码, 已处理/已接受的 UP 主以及每个视频的判断结果,
+每处理完一个视频就写一次检查点。程序中断或需要更多 UP 主时,
+用 --resume <session_id> 从上次的位置继续。
+"""
+
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+
+def video_key(url: str) -> str:
+    """视频的唯一标识, 优先使用 BV 号"""
+    if match := re.search(r"BV[0-9A-Za-z]{10}", url):
+        return match.group(0)
+    return url.split("?")[0]
+
+
+class SearchSession(BaseModel):
+    session_id: str
+    search_query: str
+    expanded_query: str | None = None
+    page: int = 1
+
+    processed_up_names: set[str] = Field(
+        default_factory=set, description="已处理完的 UP 主, 用于去重"
+    )
+    uploaders: set[str] = Field(default_factory=set, description="已接受的 UP 主")
+    users_data: list[dict] = Field(
+        default_factory=list, description="收集所有满足条件的 UP 主信息"
+    )
+    video_verdicts: dict[str, bool] = Field(
+        default_factory=dict, description="视频 BV 号 -> 是否与搜索相关"
+    )
+
+    _path: Path | None = PrivateAttr(default=None)
+    # 正在处理中的 UP 主, 只存在于内存, 中断后会重新处理
+    _claimed: set[str] = PrivateAttr(default_factory=set)
+
+    @classmethod
+    def create(cls, session_dir: str | Path, search_query: str) -> "SearchSession":
+        session_id = f"{search_query}_{datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}"
+        session = cls(session_id=session_id, search_query=search_query)
+        session._path = Path(session_dir) / f"{session_id}.json"
+        session.save()
+
+        logger.info(f"新建搜索会话 {session_id}, 中断后可用 --resume 继续")
+        return session
+
+    @classmethod
+    def load(cls, session_dir: str | Path, session_id: str) -> "SearchSession":
+        path = Path(session_dir) / f"{session_id}.json"
+        if not path.exists():
+            raise ValueError(f"Session {session_id} not found in {session_dir}.")
+
+        session = cls.model_validate_json(path.read_text(encoding="utf-8"))
+        session._path = path
+
+        logger.info(
+            f"恢复搜索会话 {session_id}: 第 {session.page} 页, "
+            f"已处理 {len(session.processed_up_names)} 个 UP 主, "
+            f"已接受 {len(session.users_data)} 个"
+        )
+        return session
+
+    def save(self) -> None:
+        """原子写入检查点, 写到一半被中断也不会损坏旧文件"""
+        if self._path is None:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".json.tmp")
+        tmp_path.write_text(self.model_dump_json(indent=2), encoding="utf-8")
+        os.replace(tmp_path, self._path)
+
+    def claim(self, up_name: str) -> bool:
+        """占用一个 UP 主, 已处理或正在被其他标签页处理时返回 False"""
+        if up_name in self.processed_up_names or up_name in self._claimed:
+            return False
+        self._claimed.add(up_name)
+        return True
+
+    def finish(self, up_name: str) -> None:
+        self._claimed.discard(up_name)
+        self.processed_up_names.add(up_name)
+        self.save()
+
+    def release(self, up_name: str) -> None:
+        """处理失败, 下次恢复时重新处理"""
+        self._claimed.discard(up_name)
+
+    def accept(self, uploader: str, user_data: dict, num_up: int) -> bool:
+        # 并发时其他标签页可能已经凑够了数量
+        if uploader in self.uploaders or len(self.users_data) >= num_up:
+            return False
+        self.uploaders.add(uploader)
+        self.users_data.append(user_data)
+        self.save()
+        return True
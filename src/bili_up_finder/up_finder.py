@@ -1,16 +1,49 @@
+import asyncio
 import logging
 import os
+import re
+from collections.abc import Callable
+from contextlib import AsyncExitStack
 
+import httpx
 from playwright.async_api import TimeoutError as PWTimeout
 from playwright.async_api import async_playwright
 
+from bili_up_finder.api_finder import crawl_with_api
+from bili_up_finder.bili_api import BiliApiError
+from bili_up_finder.browser import (
+    ContextPool,
+    get_page_pool,
+    goto,
+    pop_browser_stats,
+    scroll_until_loaded,
+    wait_until_ready,
+)
+from bili_up_finder.cache.query_cache import get_query_cache
+from bili_up_finder.cache.space_cache import (
+    captions_from_other_query,
+    get_space_cache,
+    new_snapshot,
+)
+from bili_up_finder.cache.verdict_cache import get_verdict_cache
+from bili_up_finder.cards import VideoCard, extract_search_cards, extract_upload_cards
 from bili_up_finder.config import Config
+from bili_up_finder.llm_clients import aclose_clients
+from bili_up_finder.metrics import get_metrics, start_run
+from bili_up_finder.pipeline import PageProgress, Stage, VideoCandidate, crawl_pipeline
+from bili_up_finder.ratelimit import RETRY, retry_async
 from bili_up_finder.search_helper.ai_search_helper import (
-    decide_target_video_relevant,
-    decide_user_space_video_relevant,
-    expand_search_query,
+    TargetVideoBatcher,
+    decide_user_space_video_relevant_async,
+    expand_search_query_async,
+)
+from bili_up_finder.search_helper.local_score import (
+    count_keyword_hits,
+    expanded_keywords,
+    sample_captions,
 )
-from bili_up_finder.web_builder import run_web_builder
+from bili_up_finder.session import SearchSession
+from bili_up_finder.web_builder import ReportWriter, run_web_builder
 
 for noisy_logger in ["openai", "httpcore", "httpx", "urllib3", "playwright"]:
     logging.getLogger(noisy_logger).setLevel(logging.WARNING)
@@ -19,35 +52,58 @@ logger = logging.getLogger(__name__)
 
 
 START_URL = "https://www.bilibili.com"
-users_data: list[dict] = []  # 收集所有满足条件的 up 主信息
-processed_up_names = set()  # 用于去重, 跳过已处理过 up 主
-uploaders = set()
 
+CAPTION_SELECTOR = "div.bili-video-card__title a"
+SEARCH_CARD_SELECTOR = "div.video-list-item"
 
-async def obtain_all_video_captions_in_profile(profile_page, scroll=True) -> list[str]:
-    await profile_page.wait_for_selector("div.bili-video-card__title a")
 
-    if scroll:  # auto-scroll to load more cards
-        prev_height = -1
-        while True:
-            curr_height = await profile_page.evaluate(
-                "document.documentElement.scrollHeight"
-            )
-            if curr_height == prev_height:  # reached the bottom
-                break
-            prev_height = curr_height
-            # 滑动到底部
-            await profile_page.evaluate(
-                "window.scrollTo(0, document.body.scrollHeight)"
-            )
-            await profile_page.wait_for_timeout(800)  # small pause for network / render
+def search_url(
+    search_query: str, page: int = 1, base_url: str = "https://search.bilibili.com"
+) -> str:
+    if page > 1:  # 恢复会话时直接打开视频分类的第 page 页
+        return f"{base_url}/video?keyword={search_query}&page={page}"
+    return f"{base_url}/all?keyword={search_query}"
+
+
+async def obtain_all_video_captions_in_profile(
+    profile_page,
+    scroll=True,
+    max_loaded: int | None = None,
+    keywords: list[str] | None = None,
+    conclusive_hits: int = 0,
+) -> tuple[list[str], bool]:
+    """
+    max_loaded: 已加载的卡片数达到该值后不再滚动
+    keywords / conclusive_hits: 已有足够多标题命中扩展关键词时提前停止
+    返回 (标题列表, 是否因为命中关键词提前停止)
+    """
+    await profile_page.wait_for_selector(CAPTION_SELECTOR)
+    exited_early = False
+
+    async def enough_hits(_count: int) -> bool:
+        nonlocal exited_early
+        if not (keywords and conclusive_hits):
+            return False
+        loaded = await profile_page.eval_on_selector_all(
+            CAPTION_SELECTOR, "els => els.map(e => e.textContent.trim())"
+        )
+        if count_keyword_hits(loaded, keywords) >= conclusive_hits:
+            get_metrics().incr("caption_early_exits")
+            exited_early = True
+            return True
+        return False
+
+    if scroll:  # 滚动加载更多卡片, 卡片数够了或命中足够多关键词就停
+        await scroll_until_loaded(
+            profile_page, CAPTION_SELECTOR, target=max_loaded, until=enough_hits
+        )
 
     # ③ grab *all* <a> text inside the title divs (one round-trip)
     all_captions_in_user_space = await profile_page.eval_on_selector_all(
-        "div.bili-video-card__title a", "els => els.map(e => e.textContent.trim())"
+        CAPTION_SELECTOR, "els => els.map(e => e.textContent.trim())"
     )
 
-    return all_captions_in_user_space
+    return all_captions_in_user_space, exited_early
 
 
 async def click_most_viewed(page):
@@ -75,52 +131,91 @@ async def collect_top_videos(profile_page, anchor_selector, limit=10):
     anchor_selector 由 click_most_viewed() 动态返回，
     保证跟实际 DOM 匹配。
     """
-    anchors = profile_page.locator(anchor_selector)
-
     # 若首屏不足 N 条，就滚动触发懒加载
-    while await anchors.count() < limit:
-        await profile_page.evaluate("window.scrollBy(0, window.innerHeight)")
-        await profile_page.wait_for_timeout(600)
-        if await anchors.count() >= limit or await profile_page.evaluate(
-            "window.scrollY + window.innerHeight >= document.body.scrollHeight - 2"
-        ):
-            break  # 已经到底，或够量
-
-    videos, seen = [], set()
-    for i in range(await anchors.count()):
-        a = anchors.nth(i)
-        href = (await a.get_attribute("href")) or ""
-        href = "https:" + href if href.startswith("//") else href
-        if href in seen:
-            continue
-        seen.add(href)
+    await scroll_until_loaded(profile_page, anchor_selector, target=limit)
+
+    cards = await extract_upload_cards(profile_page, anchor_selector, limit)
+    return [card.to_video() for card in cards]
+
+
+async def load_profile_page(profile_page, profile_url: str, config: Config) -> None:
+    """在 profile_page 里打开 UP 主个人空间"""
+    with get_metrics().span("space_load"):
+        await goto(profile_page, profile_url, wait_until="domcontentloaded")
+        await wait_until_ready(profile_page, "a.nav-tab__item, [class*='code']", config)
+
+
+async def read_upload_count(profile_page) -> int | None:
+    """读取「投稿」标签上的投稿总数, 不需要滚动"""
+    num = profile_page.locator(
+        "a.nav-tab__item:has-text('投稿') .nav-tab__item-num"
+    ).first
+    if await num.count() == 0:
+        return None
+
+    text = (await num.inner_text()).strip()
+    if match := re.fullmatch(r"([\d.]+)(万?)", text):
+        value = float(match.group(1))
+        return int(value * 10_000) if match.group(2) else int(value)
+    return None
+
+
+def needs_captions(snapshot: dict | None, search_query: str, config: Config) -> bool:
+    """快照里缺少判断所需的投稿标题, 或者标题是为其他关键词提前停止收集的"""
+    if snapshot is None:
+        return True
+    if snapshot["deleted"]:
+        return False
+    if captions_from_other_query(snapshot, search_query):
+        return True
+    return (
+        snapshot["captions"] is None
+        and snapshot["num_videos"] > config.min_acceptable_videos
+    )
 
-        # 卡片根节点（向上找最近的 upload-video-card）
-        card = a.locator("xpath=ancestor::*[contains(@class,'upload-video-card')]")
 
-        # 标题：先找 title 链接，退而求其次找 title 属性
-        try:
-            title = (
-                await card.locator("div.bili-video-card__title a").inner_text()
-            ).strip()
-        except PWTimeout:
-            title = (await a.get_attribute("title") or "").strip()
+async def snapshot_profile_page(
+    profile_page, uploader: str, search_query: str, config: Config
+) -> dict:
+    """读取投稿标题和数量, 页面停留在「投稿」标签"""
+    # 检测账号是否已经注销
+    error_code_element = await profile_page.query_selector('[class*="code"]')
+    if error_code_element:
+        error_text = await error_code_element.inner_text()
+        if "404" in error_text:
+            return new_snapshot(uploader, deleted=True)
 
-        # 缩略图
-        thumb_raw = await card.locator("img").first.get_attribute("src")
-        thumb = "https:" + thumb_raw if thumb_raw.startswith("//") else thumb_raw
+    # 投稿数量不够时不需要进入「投稿」标签滚动
+    total = await read_upload_count(profile_page)
+    if total is not None and total <= config.min_acceptable_videos:
+        return new_snapshot(uploader, num_videos=total)
 
-        videos.append({"title": title, "href": href, "thumb": thumb})
-        if len(videos) >= limit:
-            break
+    # 进入「投稿」标签
+    with get_metrics().span("caption_scroll"):
+        await profile_page.locator("a.nav-tab__item:has-text('投稿')").click()
+        all_captions, exited_early = await obtain_all_video_captions_in_profile(
+            profile_page,
+            max_loaded=config.caption_max_loaded,
+            keywords=expanded_keywords(search_query),
+            conclusive_hits=config.caption_conclusive_hits,
+        )
 
-    return videos
+    return new_snapshot(
+        uploader,
+        num_videos=total if total is not None else len(all_captions),
+        captions=sample_captions(
+            all_captions, config.caption_recent, config.caption_sample
+        ),
+        captions_query=search_query if exited_early else None,
+    )
 
 
-async def go_to_user_space(video_page, search_query: str, config: Config) -> None:
+async def go_to_user_space(
+    context, uploader: str, profile_url: str, search_query: str, config: Config
+) -> dict | None:
     """
-    users_data 是一个全局变量，收集所有满足条件的 UP 主信息。
-    每个 UP 主信息是一个字典，包含以下键：
+    UP 主满足条件时返回 UP 主信息, 否则返回 None。
+    UP 主信息是一个字典，包含以下键：
     - "uploader": UP 主名称
     - "profile": UP 主个人空间链接
     - "videos": UP 主视频列表，每个视频是一个字典，包含以下键：
@@ -128,6 +223,82 @@ async def go_to_user_space(video_page, search_query: str, config: Config) -> Non
         - "href": 视频链接
         - "thumb": 视频缩略图链接
     """
+    space_cache = get_space_cache()
+    snapshot = space_cache.get(profile_url)
+    pool = get_page_pool(context)
+    async with AsyncExitStack() as pages:
+        profile_page = None
+        if needs_captions(snapshot, search_query, config):
+            profile_page = await pages.enter_async_context(pool.page())
+            await load_profile_page(profile_page, profile_url, config)
+            snapshot = await snapshot_profile_page(
+                profile_page, uploader, search_query, config
+            )
+            space_cache.set(profile_url, snapshot)
+        else:
+            logger.debug(f"使用 UP 主 {uploader} 的空间快照")
+            get_metrics().incr("space_cache_hits")
+
+        if snapshot["deleted"]:
+            return None
+
+        if snapshot["num_videos"] <= config.min_acceptable_videos:
+            logger.info(
+                f"UP主 {uploader} 的视频数量 {snapshot['num_videos']} "
+                f"小于最小可接受数量 {config.min_acceptable_videos}，跳过。"
+            )
+            return None
+
+        if not await decide_user_space_video_relevant_async(
+            snapshot["captions"], search_query, config.verbose
+        ):
+            return None
+
+        if snapshot["top_videos"] is None:
+            if profile_page is None:
+                profile_page = await pages.enter_async_context(pool.page())
+                await load_profile_page(profile_page, profile_url, config)
+                await profile_page.locator("a.nav-tab__item:has-text('投稿')").click()
+
+            async def top_videos() -> list[dict]:
+                anchor_sel = await click_most_viewed(profile_page)
+                return await collect_top_videos(profile_page, anchor_sel)
+
+            with get_metrics().span("top_videos"):
+                # 卡片没有及时出现时重新点击「最多播放」
+                snapshot["top_videos"] = await retry_async(
+                    top_videos,
+                    lambda e: (
+                        RETRY if isinstance(e, (PWTimeout, RuntimeError)) else None
+                    ),
+                )
+            space_cache.set(profile_url, snapshot)
+        logger.info(f"UP主 {uploader} 符合搜索结果...")
+
+        return {
+            "uploader": uploader,
+            "profile": profile_url,
+            "videos": snapshot["top_videos"],
+        }
+
+
+async def read_video_page(video_page, candidate: VideoCandidate, config: Config):
+    """读取视频标题, 标签和 UP 主信息"""
+    with get_metrics().span("video_page"):
+        await wait_until_ready(video_page, "div.ordinary-tag a.tag-link", config)
+
+        logger.debug(f"URL: {video_page.url}")
+        candidate.title = await video_page.title()
+        logger.debug(f"标题:, {candidate.title.split('_哔哩哔哩')[0]}")
+
+        candidate.tags = await video_page.eval_on_selector_all(
+            "div.ordinary-tag a.tag-link",
+            "els => els.map(el => el.textContent.trim())",
+        )
+
+    logger.debug(
+        f"标签: {candidate.tags}",
+    )
 
     panel = video_page.locator(".up-panel-container")
     await panel.wait_for(state="attached")
@@ -140,165 +311,191 @@ async def go_to_user_space(video_page, search_query: str, config: Config) -> Non
 
     # ③ ── 拿昵称,个人空间完整 URL ────────────────────────────
     if has_name:
-        up_link = name_link  # 就用它来点击
-        uploader = (await up_link.inner_text()).strip()
+        up_link = name_link
+        candidate.uploader = (await up_link.inner_text()).strip()
     else:
         # 极端情况：仍然没有文字（几乎不会发生），退回头像 <a>
         up_link = panel.locator("a[href*='space.bilibili.com']").first
-        uploader = (
+        candidate.uploader = (
             await up_link.get_attribute("title")  # title
             or await up_link.locator("img").first.get_attribute("alt")  # img.alt
             or ""
         )
 
     # element.href → 绝对 URL
-    profile_url: str = await up_link.evaluate("el => el.href")
-
-    # ④ ── 点击并等待新标签页 ───────────────────────────────────
-    async with video_page.expect_popup() as pop:
-        await up_link.click()
-
-    profile_page = await pop.value
-    await profile_page.wait_for_load_state("networkidle")
-
-    # 检测账号是否已经注销
-    error_code_element = await profile_page.query_selector('[class*="code"]')
-    if error_code_element:
-        error_text = await error_code_element.inner_text()
-        if "404" in error_text:
-            await profile_page.close()
-            return
-
-    # 进入「投稿」标签
-    await profile_page.locator("a.nav-tab__item:has-text('投稿')").click()
-    all_captions = await obtain_all_video_captions_in_profile(profile_page)
-
-    await profile_page.wait_for_selector(
-        "div.bili-video-card__wrap .bili-video-card__title"
-    )
-
-    video_links_profile_page = profile_page.locator(
-        "div.bili-video-card__wrap .bili-video-card__title"
-    )
-
-    num_videos = await video_links_profile_page.count()
-
-    if num_videos <= config.min_acceptable_videos:
-        logger.info(
-            f"UP主 {uploader} 的视频数量 {num_videos} 小于最小可接受数量 {config.min_acceptable_videos}，跳过。"
-        )
-        await profile_page.close()
-
-        return
-
-    if decide_user_space_video_relevant(all_captions, search_query, config.verbose):
-        anchor_sel = await click_most_viewed(profile_page)
-        videos = await collect_top_videos(profile_page, anchor_sel)
-        logger.info(f"UP主 {uploader} 符合搜索结果...")
-
-        # ⭐️⭐️ 只追加到 users_data，不立刻生成文件
-        if uploader not in uploaders:
-            uploaders.add(uploader)
-            users_data.append(
-                {
-                    "uploader": uploader,
-                    "profile": profile_url,
-                    "videos": videos,
-                }
-            )
-
-    await profile_page.close()
+    candidate.profile_url = await up_link.evaluate("el => el.href")
 
 
-async def open_all_search_videos(
-    page, context, search_query: str, config: Config
-) -> None:
-    """Open each search-result video in a new tab, do something, then close it."""
+async def read_search_cards(page, config: Config) -> list[VideoCard]:
+    """返回当前搜索页需要处理的视频卡片"""
     # Because every search-result “card” is made of two separately-clickable zones—the thumbnail
     # and the text block—Bilibili drops an <a> tag on each of them, both pointing to the same BV-URL.
     # Pick only the anchor that sits directly inside the wrapper
 
-    # 等待视频列表加载
-    await page.wait_for_selector(
-        "div.bili-video-card__wrap .bili-video-card__info--right > a[href*='/video/']"
-    )
+    needed = min(config.video_go_through_per_page, config.default_videos_per_page)
+    with get_metrics().span("search_page"):
+        # 等待视频列表加载
+        await page.wait_for_selector(
+            "div.bili-video-card__wrap .bili-video-card__info--right > a[href*='/video/']"
+        )
 
-    # 滚动到底部(不一定需要)
-    previous_height = None
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await page.wait_for_timeout(500)  # 给懒加载留点时间
-        current_height = await page.evaluate("document.body.scrollHeight")
-        if previous_height == current_height:
-            break
-        previous_height = current_height
-
-    video_links = page.locator(
-        "div.video-list-item:visible div.bili-video-card__info--right > a[href*='/video/']"
-    )
+        # 卡片不够时滚动触发懒加载
+        await scroll_until_loaded(page, SEARCH_CARD_SELECTOR, target=needed)
 
-    total = await video_links.count()
+        cards = await extract_search_cards(page)
 
+    total = len(cards)
     logger.debug(
         f"🎬  发现一共 {total} 视频链接, 页面显示{min(total, config.default_videos_per_page)}个视频"
     )
 
-    spans_up_names = page.locator("span.bili-video-card__info--author")
+    return cards[:needed]
 
-    for i in range(
-        min(config.video_go_through_per_page, total, config.default_videos_per_page)
-    ):
-        if len(users_data) >= config.num_up:
-            return
 
-        up_name = await spans_up_names.nth(i).text_content()
-        if up_name:
-            up_name = up_name.strip()
+async def search_candidates(page, page_no: int, config: Config) -> list[VideoCandidate]:
+    """切换到视频分类, 读取当前搜索页的视频"""
+    await page.locator("span.vui_tabs--nav-text", has_text="视频").click()
+    return [
+        VideoCandidate(page_no, card.href, card.author, title=card.title)
+        for card in await read_search_cards(page, config)
+    ]
 
-        logger.debug(
-            f"▶️  视频 {i + 1}/{config.default_videos_per_page}, 收集 {len(uploaders)}"
-        )
 
-        if up_name in processed_up_names:
-            logger.debug(f"跳过已处理过的 UP 主: {up_name}")
-            continue
+async def open_video_page(context, candidate: VideoCandidate, config: Config) -> None:
+    """打开视频页补全 candidate 的标题, 标签和 UP 主信息"""
+    async with get_page_pool(context).page() as video_page:
+        await goto(video_page, candidate.href, wait_until="domcontentloaded")
+        await read_video_page(video_page, candidate, config)
 
-        processed_up_names.add(up_name)
 
-        async with context.expect_page() as popup_info:
-            await video_links.nth(i).click()
+async def crawl_with_browser(
+    search_query: str,
+    config: Config,
+    session: SearchSession,
+    context,
+    on_accept: Callable[[dict], None] | None = None,
+) -> None:
+    # Create a new page
+    page = await context.new_page()
+    try:
+        await _crawl_search_pages(
+            page, context, search_query, config, session, on_accept
+        )
+    finally:
+        await page.close()
+
+        stats = pop_browser_stats(context)
+        stats.log_summary()
+        get_metrics().incr("bytes_transferred", stats.bytes_transferred)
+        get_metrics().incr("blocked_requests", stats.blocked_requests)
+
+
+async def _crawl_search_pages(
+    page,
+    context,
+    search_query: str,
+    config: Config,
+    session: SearchSession,
+    on_accept: Callable[[dict], None] | None,
+) -> None:
+    """
+    流水线: 搜索页 → 视频页 → LLM 判断 → UP 主空间 → 收集结果。
+    判断当前页的同时已经在翻下一页, 凑够 num_up 个 UP 主后取消所有阶段。
+    """
+    # 扩展关键词与打开搜索页同时进行, 恢复的会话沿用上次的扩展结果
+    if session.expanded_query is None:
+        expand_task = asyncio.create_task(
+            expand_search_query_async(search_query=search_query, verbose=config.verbose)
+        )
 
-        video_page = await popup_info.value
-        await video_page.wait_for_load_state("networkidle")
+    # Check if the user is logged in
+    with get_metrics().span("search_page"):
+        await goto(
+            page,
+            search_url(search_query, session.page, config.search_base_url),
+            wait_until="domcontentloaded"
+            if config.browser_profile == "performance"
+            else "networkidle",
+        )
 
-        logger.debug(f"URL: {video_page.url}")
-        title = await video_page.title()
-        logger.debug(f"标题:, {title.split('_哔哩哔哩')[0]}")
+    if session.expanded_query is None:
+        session.expanded_query = await expand_task
+        session.save()
+    expanded_search_query = session.expanded_query
+    batcher = TargetVideoBatcher.from_config(expanded_search_query, config)
 
-        tags = await video_page.eval_on_selector_all(
-            "div.ordinary-tag a.tag-link", "els => els.map(el => el.textContent.trim())"
-        )
+    async def produce(scrape: Stage, progress: PageProgress, stop: asyncio.Event):
+        page_no = session.page
+        while not stop.is_set():
+            for candidate in await search_candidates(page, page_no, config):
+                progress.add(page_no)
+                await scrape.put(candidate)
 
-        logger.debug(
-            f"标签: {tags}",
+            try:
+                await page.wait_for_selector("text=下一页")
+                await page.click("text=下一页")
+            except PWTimeout:
+                logger.info("没有更多页面了，停止搜索。")
+                return
+            page_no += 1
+            progress.advance(page_no)
+
+    async def fetch_details(candidate: VideoCandidate) -> None:
+        await open_video_page(context, candidate, config)
+
+    async def inspect_space(candidate: VideoCandidate) -> dict | None:
+        return await go_to_user_space(
+            context,
+            candidate.uploader,
+            candidate.profile_url,
+            expanded_search_query,
+            config,
         )
 
-        is_relevant_search_query = decide_target_video_relevant(
-            title, tags, search_query, config.verbose
-        )
+    await crawl_pipeline(
+        session, config, batcher, produce, fetch_details, inspect_space, on_accept
+    )
+    logger.info("✅  所有视频处理完毕 ... ")
 
-        if is_relevant_search_query:
-            await go_to_user_space(video_page, search_query, config)
 
-        await video_page.close()
-        logger.debug("关闭视频页面")
+async def main(
+    search_query: str | None, config: Config, resume: str | None = None
+) -> list[dict]:
+    """运行一次搜索, 返回找到的 UP 主信息 (与报告内容一致)"""
+    if resume:
+        session = SearchSession.load(config.session_dir, resume)
+        search_query = session.search_query
+    else:
+        session = None
 
-    logger.info("✅  所有视频处理完毕 ... ")
+    try:
+        return await run_query(search_query, config, session)
+    finally:
+        await aclose_clients()
 
 
-async def main(search_query: str, config: Config):
-    logger.info(f"开始搜索: {search_query}, 搜索up主数量上限: {config.num_up}")
+async def run_query(
+    search_query: str,
+    config: Config,
+    session: SearchSession | None = None,
+    contexts: ContextPool | None = None,
+    on_accept: Callable[[dict], None] | None = None,
+) -> list[dict]:
+    """
+    记录本次搜索的运行指标; 批量模式和服务模式下各关键词共用 contexts。
+    on_accept 在每接受一个 UP 主时调用。
+    """
+    metrics = start_run(search_query)
+    try:
+        return await run_search(search_query, config, session, contexts, on_accept)
+    finally:
+        metrics.log_usage()
+        metrics.write_json(config.reports_dir)
+        if config.metrics_table:
+            metrics.log_summary()
 
+
+def ensure_auth_state() -> None:
     os.makedirs("playwright/.auth", exist_ok=True)
     # If file doesn't exist, create it with empty JSON
     if not os.path.exists("playwright/.auth/state.json"):
@@ -307,43 +504,109 @@ async def main(search_query: str, config: Config):
             f.write("{}")
         f.close()
 
-    async with async_playwright() as p:
-        # Launch browser
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context(storage_state="playwright/.auth/state.json")
 
-        # Create a new page
-        page = await context.new_page()
+async def run_search(
+    search_query: str,
+    config: Config,
+    session: SearchSession | None,
+    contexts: ContextPool | None = None,
+    on_accept: Callable[[dict], None] | None = None,
+) -> list[dict]:
+    logger.info(f"开始搜索: {search_query}, 搜索up主数量上限: {config.num_up}")
+
+    # 缓存中已有足够的结果, 不需要启动浏览器
+    if session is None and (
+        cached := get_query_cache().lookup(search_query, config.num_up)
+    ):
+        users_data = cached["users_data"][: config.num_up]
+        run_web_builder(users_data, search_query, config.reports_dir)
+        return users_data
+
+    if session is None:
+        session = SearchSession.create(config.session_dir, search_query)
 
-        # Check if the user is logged in
-        await page.goto(
-            f"https://search.bilibili.com/all?keyword={search_query}",
-            wait_until="networkidle",
+    ensure_auth_state()
+
+    # 流式报告: 每接受一个 UP 主就写入 NDJSON, 运行中断时也有部分结果
+    report = None
+    if config.stream_report:
+        report = ReportWriter(
+            search_query, config.reports_dir, config.report_refresh_every
         )
+        for user_data in session.users_data:  # 恢复的会话先写入已有结果
+            report.append(user_data)
+
+    callbacks = [
+        callback
+        for callback in (report.append if report is not None else None, on_accept)
+        if callback is not None
+    ]
+
+    def accept(user_data: dict) -> None:
+        for callback in callbacks:
+            callback(user_data)
 
-        expanded_search_query = expand_search_query(
-            search_query=search_query, verbose=config.verbose
+    try:
+        await crawl(
+            search_query, config, session, contexts, accept if callbacks else None
         )
+    except BaseException:
+        if report is not None and session.users_data:
+            report.finish(session.users_data)
+        raise
+
+    if session.users_data:  # 至少命中 1 个
+        get_query_cache().save(search_query, session.expanded_query, session.users_data)
+        (report or ReportWriter(search_query, config.reports_dir)).finish(
+            session.users_data
+        )
+    else:
+        logger.info("没有找到符合条件的 UP 主")
 
-        while True:
-            await page.locator("span.vui_tabs--nav-text", has_text="视频").click()
-            await open_all_search_videos(page, context, expanded_search_query, config)
-            if len(users_data) >= config.num_up:
-                logger.info(
-                    f"已找到 {len(users_data)} 个 UP 主，达到上限 {config.num_up}，停止搜索。"
-                )
-                break
-            try:
-                await page.wait_for_selector("text=下一页")
-                await page.click("text=下一页")
+    get_verdict_cache().log_stats()
+    get_space_cache().log_stats()
 
-            except PWTimeout:
-                logger.info("没有更多页面了，停止搜索。")
-                break
+    return session.users_data
 
-        if users_data:  # 至少命中 1 个
-            run_web_builder(users_data, search_query)
-        else:
-            logger.info("没有找到符合条件的 UP 主")
 
-        await browser.close()
+async def crawl(
+    search_query: str,
+    config: Config,
+    session: SearchSession,
+    contexts: ContextPool | None,
+    on_accept: Callable[[dict], None] | None,
+) -> None:
+    use_browser = config.backend == "browser"
+    if config.backend == "api":
+        if session.expanded_query is None:
+            session.expanded_query = await expand_search_query_async(
+                search_query=search_query, verbose=config.verbose
+            )
+            session.save()
+
+        try:
+            await crawl_with_api(
+                search_query, session.expanded_query, config, session, on_accept
+            )
+        except (BiliApiError, httpx.HTTPError) as e:
+            # 接口被风控或结构变化时, 用浏览器从当前页继续
+            logger.warning(f"接口抓取失败, 改用浏览器继续搜索: {e}")
+            use_browser = True
+
+    if not use_browser:
+        return
+
+    if contexts is not None:
+        async with contexts.acquire() as context:
+            await crawl_with_browser(search_query, config, session, context, on_accept)
+        return
+
+    async with async_playwright() as p:
+        contexts = ContextPool(p, config)
+        try:
+            async with contexts.acquire() as context:
+                await crawl_with_browser(
+                    search_query, config, session, context, on_accept
+                )
+        finally:
+            await contexts.close()
@@ -1,3 +1,6 @@
+import csv
+import functools
+import json
 import logging
 import os
 from datetime import datetime
@@ -5,23 +8,140 @@ from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+from bili_up_finder.metrics import get_metrics
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 samples_dir = os.path.join(current_dir, "reports")
 
 logger = logging.getLogger(__name__)
 
 
-def run_web_builder(user_data: list[dict], search_query: str) -> None:
-    env = Environment(
+@functools.cache
+def _environment() -> Environment:
+    """模板环境只创建一次, 编译过的模板由 Environment 缓存"""
+    return Environment(
         loader=FileSystemLoader("./reports"),  # 模板目录
-        autoescape=select_autoescape(["html"]),  # 防 XSS
+        autoescape=select_autoescape(["html", "j2"]),  # 防 XSS
+    )
+
+
+def render_report(
+    user_data: list[dict], in_progress: bool = False, usage: dict | None = None
+) -> str:
+    """
+    in_progress 为 True 时页面每 15 秒自动刷新
+    usage: RunMetrics.usage_summary(), 在统计栏显示 token 数和估算费用
+    """
+    with get_metrics().span("report_render"):
+        tpl = _environment().get_template("index.j2")
+        return tpl.render(user_data=user_data, in_progress=in_progress, usage=usage)
+
+
+class ReportWriter:
+    """
+    一次搜索的报告文件, 文件名在创建时确定:
+    - {stem}.ndjson: 每接受一个 UP 主追加一行, 运行中断也不会丢失
+    - {stem}.html: 每接受 refresh_every 个 UP 主重新生成一次, 结束时再生成一次
+    - {stem}.json / {stem}.csv: 结束时导出
+    """
+
+    def __init__(
+        self, search_query: str, output_dir: str = "reports", refresh_every: int = 0
+    ):
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self.stem = Path(output_dir) / (
+            f"{search_query}_{datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}"
+        )
+        self.refresh_every = refresh_every
+        self.users_data: list[dict] = []
+
+    def path(self, suffix: str) -> Path:
+        # 关键词里可能有 ".", 不能用 with_suffix
+        return Path(f"{self.stem}{suffix}")
+
+    def append(self, user_data: dict) -> None:
+        self.users_data.append(user_data)
+        with self.path(".ndjson").open("a", encoding="utf-8") as f:
+            f.write(json.dumps(user_data, ensure_ascii=False) + "\n")
+
+        if self.refresh_every and len(self.users_data) % self.refresh_every == 0:
+            self.render(self.users_data, in_progress=True)
+
+    def render(self, user_data: list[dict], in_progress: bool = False) -> Path:
+        file_name = self.path(".html")
+        # 在搜索所在的任务里调用, get_metrics() 是本次运行的用量
+        usage = get_metrics().usage_summary()
+        file_name.write_text(
+            render_report(user_data, in_progress, usage), encoding="utf-8"
+        )
+        return file_name
+
+    def finish(self, user_data: list[dict]) -> Path:
+        file_name = self.render(user_data)
+
+        self.path(".json").write_text(
+            json.dumps(user_data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        # 每个视频一行, 方便在表格软件里筛选
+        with self.path(".csv").open("w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["uploader", "profile", "title", "href", "thumb"])
+            for user in user_data:
+                for video in user["videos"] or []:
+                    writer.writerow(
+                        [
+                            user["uploader"],
+                            user["profile"],
+                            video["title"],
+                            video["href"],
+                            video["thumb"],
+                        ]
+                    )
+
+        logger.info(f"Up主报告生成成功, 保存在{file_name}")
+        return file_name
+
+
+def run_web_builder(
+    user_data: list[dict], search_query: str, output_dir: str = "reports"
+) -> Path:
+    return ReportWriter(search_query, output_dir).finish(user_data)
+
+
+def run_batch_index(
+    results: dict[str, list[dict]], output_dir: str = "reports"
+) -> Path:
+    """批量模式的汇总页: 每个关键词找到的 UP 主, 以及被多个关键词同时命中的 UP 主"""
+    queries_by_uploader: dict[str, list[str]] = {}
+    profiles: dict[str, str] = {}
+    for search_query, users_data in results.items():
+        for user in users_data:
+            queries_by_uploader.setdefault(user["uploader"], []).append(search_query)
+            profiles[user["uploader"]] = user["profile"]
+
+    shared = [
+        {"uploader": name, "profile": profiles[name], "queries": queries}
+        for name, queries in sorted(
+            queries_by_uploader.items(), key=lambda item: -len(item[1])
+        )
+        if len(queries) > 1
+    ]
+
+    html = (
+        _environment()
+        .get_template("batch_index.j2")
+        .render(results=results, shared=shared)
     )
 
-    tpl = env.get_template("index.j2")
-    html = tpl.render(user_data=user_data)
-    file_name = (
-        f"reports/{search_query}_{datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}.html"
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    stem = f"{output_dir}/batch_{datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}"
+    Path(f"{stem}.html").write_text(html, encoding="utf-8")
+    Path(f"{stem}.json").write_text(
+        json.dumps(
+            {"results": results, "shared": shared}, ensure_ascii=False, indent=2
+        ),
+        encoding="utf-8",
     )
-    Path(file_name).write_text(html, encoding="utf-8")
 
-    logger.info(f"Up主报告生成成功, 保存在{file_name}")
+    logger.info(f"批量汇总生成成功, 保存在{stem}.html")
+    return Path(f"{stem}.html")
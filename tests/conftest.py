@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# 决定录制响应文件名的查询参数, 其余参数 (签名, 分页大小) 不影响响应
+FIXTURE_PARAMS = ("page", "bvid", "mid", "order", "pn")
+
+
+class FixtureServer:
+    """
+    把 fixtures/bili_api 下录制的接口响应当作 api.bilibili.com 提供。
+    /x/web-interface/card?mid=1001 对应 x/web-interface/card/mid=1001.json,
+    没有录制的请求返回接口的 -404 错误。
+    overrides: 路径 -> 响应内容, 优先于录制的响应, 用来模拟风控页面或结构变化。
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.requests: list[tuple[str, dict]] = []
+        self.overrides: dict[str, bytes] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def fixture_path(self, path: str, query: dict) -> Path:
+        params = "&".join(f"{k}={query[k]}" for k in FIXTURE_PARAMS if k in query)
+        name = f"{path.strip('/')}/{params}" if params else path.strip("/")
+        return self.root / f"{name}.json"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = dict(parse_qsl(url.query))
+                server.requests.append((url.path, query))
+
+                fixture = server.fixture_path(url.path, query)
+                if url.path in server.overrides:
+                    body = server.overrides[url.path]
+                elif fixture.exists():
+                    body = fixture.read_bytes()
+                else:
+                    body = json.dumps({"code": -404, "message": "啥都木有"}).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def bili_api_server():
+    with FixtureServer(FIXTURES_DIR / "bili_api") as server:
+        yield server
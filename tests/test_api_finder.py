@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from bili_up_finder import api_finder, up_finder
+from bili_up_finder.config import Config, configure_runtime
+from bili_up_finder.search_helper.ai_search_helper import TargetVideoBatcher
+from bili_up_finder.session import SearchSession
+
+
+def api_config(api_base_url: str, tmp_path) -> Config:
+    config = Config(
+        verbose=False,
+        num_up=3,
+        use_cache=False,
+        backend="api",
+        api_base_url=api_base_url,
+        session_dir=str(tmp_path / "sessions"),
+        caption_recent=10,
+        caption_sample=0,
+        llm_requests_per_second=0,
+        site_requests_per_second=0,
+    )
+    configure_runtime(config)
+    return config
+
+
+def test_crawl_with_api_against_recorded_responses(
+    bili_api_server, tmp_path, monkeypatch
+):
+    config = api_config(bili_api_server.base_url, tmp_path)
+
+    # 用关键词代替 LLM 判断
+    async def decide_video(self, title, tags):
+        return "摄影" in title
+
+    async def decide_space(captions, search_query, verbose):
+        return any("摄影" in caption for caption in captions)
+
+    monkeypatch.setattr(TargetVideoBatcher, "decide", decide_video)
+    monkeypatch.setattr(
+        api_finder, "decide_user_space_video_relevant_async", decide_space
+    )
+    monkeypatch.chdir(tmp_path)  # 没有 playwright/.auth/state.json
+
+    session = SearchSession.create(config.session_dir, "摄影")
+    asyncio.run(api_finder.crawl_with_api("摄影", "摄影, 相机", config, session))
+
+    # 美食视频不相关, 1003 已注销, 1001 的两个视频只收录一次
+    assert [user["uploader"] for user in session.users_data] == ["摄影师小王"]
+    (user,) = session.users_data
+    assert user["profile"] == "https://space.bilibili.com/1001"
+    assert [video["title"] for video in user["videos"]] == ["人像摄影布光", "摄影入门"]
+    assert session.video_verdicts["BV1bb411c7mE"] is False
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        # 风控返回的 HTML 页面
+        b"<html><body>request blocked</body></html>",
+        # 字段结构变化
+        b'{"code": 0, "data": {"result": [{"title": "no bvid"}]}}',
+    ],
+)
+def test_malformed_api_response_falls_back_to_browser(
+    bili_api_server, tmp_path, monkeypatch, body
+):
+    config = api_config(bili_api_server.base_url, tmp_path)
+    bili_api_server.overrides["/x/web-interface/wbi/search/type"] = body
+    browser_crawls = []
+
+    async def crawl_with_browser(search_query, config, session, context, on_accept):
+        browser_crawls.append(search_query)
+
+    class Contexts:
+        @asynccontextmanager
+        async def acquire(self):
+            yield None
+
+    monkeypatch.setattr(up_finder, "crawl_with_browser", crawl_with_browser)
+    monkeypatch.chdir(tmp_path)
+
+    session = SearchSession.create(config.session_dir, "摄影")
+    session.expanded_query = "摄影, 相机"
+    asyncio.run(up_finder.crawl("摄影", config, session, Contexts(), None))
+    assert browser_crawls == ["摄影"]
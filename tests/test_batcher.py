@@ -0,0 +1,85 @@
+import asyncio
+
+from bili_up_finder.config import Config, configure_runtime
+from bili_up_finder.pipeline import VideoCandidate, crawl_pipeline
+from bili_up_finder.search_helper import ai_search_helper
+from bili_up_finder.search_helper.ai_search_helper import TargetVideoBatcher
+from bili_up_finder.session import SearchSession
+
+
+def candidates(n: int) -> list[VideoCandidate]:
+    return [
+        VideoCandidate(1, f"https://www.bilibili.com/video/BV1xx41{i:05d}", f"up{i}")
+        for i in range(n)
+    ]
+
+
+def test_failed_batch_counts_as_one_failure(tmp_path, monkeypatch):
+    config = Config(
+        verbose=False, use_cache=False, judge_batch_size=8, max_consecutive_failures=3
+    )
+    configure_runtime(config)
+    calls = 0
+
+    async def failing_batch(items, *args, **kwargs):
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(
+        ai_search_helper, "decide_target_videos_relevant_batch_async", failing_batch
+    )
+
+    async def produce(scrape, progress, stop):
+        for candidate in candidates(8):
+            progress.add(candidate.page)
+            await scrape.put(candidate)
+
+    async def fetch_details(candidate):
+        pass
+
+    async def inspect_space(candidate):
+        raise AssertionError("no video should be judged relevant")
+
+    session = SearchSession.create(tmp_path, "q")
+    batcher = TargetVideoBatcher("q", False, batch_size=8, flush_delay=0.05)
+
+    # 8 个视频在同一个失败的请求里, 只算一次失败, 不会终止搜索
+    asyncio.run(
+        crawl_pipeline(session, config, batcher, produce, fetch_details, inspect_space)
+    )
+    assert calls == 1
+    assert session.video_verdicts == {}
+
+
+def test_aclose_cancels_in_flight_batches(monkeypatch):
+    started = cancelled = False
+
+    async def slow_batch(items, *args, **kwargs):
+        nonlocal started, cancelled
+        started = True
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    monkeypatch.setattr(
+        ai_search_helper, "decide_target_videos_relevant_batch_async", slow_batch
+    )
+
+    async def main():
+        batcher = TargetVideoBatcher("q", False, batch_size=2, flush_delay=10)
+        first = asyncio.ensure_future(batcher.decide("a", []))
+        second = asyncio.ensure_future(batcher.decide("b", []))
+        waiting = asyncio.ensure_future(batcher.decide("c", []))
+        await asyncio.sleep(0.01)
+
+        await batcher.aclose()
+        await asyncio.gather(first, second, waiting, return_exceptions=True)
+        return batcher, [f.cancelled() for f in (first, second, waiting)]
+
+    batcher, futures_cancelled = asyncio.run(main())
+    assert started and cancelled
+    assert futures_cancelled == [True, True, True]
+    assert not batcher._tasks and not batcher._pending
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from bili_up_finder import bili_api
+from bili_up_finder.bili_api import BiliApiClient, BiliApiError, classify_api_error
+from bili_up_finder.ratelimit import THROTTLED
+
+
+def run(api_base_url: str, tmp_path, call):
+    async def main():
+        async with BiliApiClient(
+            api_base_url=api_base_url, state_path=tmp_path / "state.json"
+        ) as api:
+            return await call(api)
+
+    return asyncio.run(main())
+
+
+def test_wbi_signature_matches_reference(bili_api_server, tmp_path, monkeypatch):
+    # bilibili-API-collect 文档里的 WBI 签名示例
+    monkeypatch.setattr(bili_api.time, "time", lambda: 1702204169)
+
+    async def sign(api):
+        signed = await api._sign({"foo": "114", "bar": "514", "zab": 1919810})
+        return api._mixin_key, signed
+
+    mixin_key, signed = run(bili_api_server.base_url, tmp_path, sign)
+    assert mixin_key == "ea1db124af3c7062474693fa704f4ff8"
+    assert signed["w_rid"] == "8f6f2b5b3d485fe1886cec6a0be8c5d4"
+
+
+def test_search_videos_strips_highlight_and_signs(bili_api_server, tmp_path):
+    results = run(
+        bili_api_server.base_url, tmp_path, lambda api: api.search_videos("摄影")
+    )
+
+    assert [r["title"] for r in results][:1] == ["摄影入门：光圈快门ISO一次讲清"]
+    assert {r["mid"] for r in results} == {1001, 1002, 1003}
+
+    (query,) = [q for path, q in bili_api_server.requests if path.endswith("/type")]
+    assert {"w_rid", "wts"} <= query.keys()
+
+
+def test_search_past_last_page_is_empty(bili_api_server, tmp_path):
+    results = run(
+        bili_api_server.base_url, tmp_path, lambda api: api.search_videos("摄影", 2)
+    )
+    assert results == []
+
+
+def test_buvid_requested_without_login(bili_api_server, tmp_path):
+    async def buvid(api):
+        return api.client.cookies.get("buvid3")
+
+    assert run(bili_api_server.base_url, tmp_path, buvid).endswith("infoc")
+
+
+def test_uploader_card_and_deleted_account(bili_api_server, tmp_path):
+    async def cards(api):
+        return await api.uploader_card(1001), await api.uploader_card(1003)
+
+    card, deleted = run(bili_api_server.base_url, tmp_path, cards)
+    assert card == {"name": "摄影师小王", "archive_count": 24}
+    assert deleted is None
+
+
+def test_uploader_videos_use_https_thumbnails(bili_api_server, tmp_path):
+    videos, total = run(
+        bili_api_server.base_url,
+        tmp_path,
+        lambda api: api.uploader_videos(1001, order="click"),
+    )
+    assert total == 24
+    assert videos[0] == {
+        "title": "人像摄影布光",
+        "href": "https://www.bilibili.com/video/BV11001007aZ",
+        "thumb": "https://i2.hdslb.com/bfs/archive/1001_0.jpg",
+    }
+
+
+def test_video_tags(bili_api_server, tmp_path):
+    tags = run(
+        bili_api_server.base_url, tmp_path, lambda api: api.video_tags("BV1bb411c7mE")
+    )
+    assert tags == ["美食", "家常菜"]
+
+
+@pytest.mark.parametrize(
+    "code, expected", [(-412, THROTTLED), (-799, THROTTLED), (-404, None)]
+)
+def test_classify_api_error(code, expected):
+    assert classify_api_error(BiliApiError(code, "")) == expected
+
+
+def test_changed_response_shape_raises_api_error(bili_api_server, tmp_path):
+    bili_api_server.overrides["/x/space/wbi/arc/search"] = (
+        b'{"code": 0, "data": {"list": {}}}'
+    )
+
+    with pytest.raises(BiliApiError) as e:
+        run(
+            bili_api_server.base_url,
+            tmp_path,
+            lambda api: api.uploader_videos(1001),
+        )
+    assert e.value.code == bili_api.UNEXPECTED_RESPONSE
+    assert classify_api_error(e.value) is None
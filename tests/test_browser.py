@@ -0,0 +1,32 @@
+import asyncio
+
+from bili_up_finder.browser import get_browser_stats, goto, wait_until_ready
+from bili_up_finder.config import Config
+
+
+class FakeContext:
+    pass
+
+
+class FakePage:
+    def __init__(self):
+        self.context = FakeContext()
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(0.05)
+
+    async def wait_for_selector(self, selector, **kwargs):
+        await asyncio.sleep(0.01)
+
+
+def test_page_load_time_includes_navigation():
+    page = FakePage()
+    config = Config(verbose=False, browser_profile="performance")
+
+    async def load():
+        await goto(page, "https://www.bilibili.com/video/BV1xx411c7mD")
+        await wait_until_ready(page, "div.ordinary-tag", config)
+
+    asyncio.run(load())
+    (page_load,) = get_browser_stats(page.context).page_loads
+    assert page_load >= 0.06
@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from bili_up_finder.budget import Budget, estimate_cost, record_llm_usage
+from bili_up_finder.metrics import start_run
+from bili_up_finder.search_helper import ai_search_helper
+
+
+def in_new_run(fn):
+    """在独立的 Context 里开始运行, 不影响其他测试的 RunMetrics"""
+
+    def run():
+        return fn(start_run("q"))
+
+    return contextvars.Context().run(run)
+
+
+def test_estimate_cost_uses_model_prices():
+    assert estimate_cost("deepseek-chat", 1_000_000, 1_000_000) == pytest.approx(1.37)
+    assert estimate_cost("unknown-model", 1_000_000, 1_000_000) == 0.0
+
+
+def test_usage_summary_totals_stages():
+    def usage(metrics):
+        record_llm_usage("target_video", "deepseek-chat", 1000, 10)
+        record_llm_usage("target_video", "deepseek-chat", 500, 5)
+        record_llm_usage("embedding", "text-embedding-3-small", 200, 0)
+        return metrics.usage_summary(), metrics.total_cost
+
+    usage, total_cost = in_new_run(usage)
+    assert usage["calls"] == 3
+    assert usage["total_tokens"] == 1715
+    assert usage["stages"]["target_video"]["prompt_tokens"] == 1500
+    assert usage["cost_usd"] == round(total_cost, 6)
+
+
+def test_budget_low_after_reserve_and_skips_are_counted():
+    def spend(metrics):
+        budget = Budget(max_tokens=1000, reserve=0.2)
+        record_llm_usage("target_video", "deepseek-chat", 700, 0)
+        before = budget.low(), budget.skip()
+        record_llm_usage("target_video", "deepseek-chat", 100, 0)
+        return before, (budget.skip(), budget.skip()), metrics.counters
+
+    before, after, counters = in_new_run(spend)
+    assert before == (False, False)
+    assert after == (True, True)
+    assert counters["budget_skipped_llm_calls"] == 2
+    assert counters["budget_low"] == 1
+
+
+def test_cost_budget_and_unlimited_budget():
+    def low(metrics):
+        record_llm_usage("target_video", "gpt-4.1", 1_000_000, 0)
+        return [
+            Budget(max_cost=2.0, reserve=0.1).low(),
+            Budget(max_cost=10.0, reserve=0.1).low(),
+            Budget().low(),
+        ]
+
+    assert in_new_run(low) == [True, False, False]
+
+
+def test_exhausted_budget_skips_the_embedding_judge(monkeypatch):
+    class FailingJudge:
+        async def decide_user_space(self, video_captions, search_query):
+            raise AssertionError("embedding judge called over budget")
+
+        async def decide_video(self, title, tags, search_query):
+            raise AssertionError("embedding judge called over budget")
+
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test")
+    monkeypatch.setattr(ai_search_helper, "get_embedding_judge", FailingJudge)
+    monkeypatch.setattr(ai_search_helper, "get_budget", lambda: Budget(max_tokens=1))
+
+    async def decide():
+        space = await ai_search_helper.decide_user_space_video_relevant_async(
+            ["摄影入门", "人像布光"], "摄影", False
+        )
+        video = await ai_search_helper.decide_target_video_relevant_async(
+            "摄影入门", [], "摄影", False
+        )
+        return space, video
+
+    def over_budget(metrics):
+        record_llm_usage("target_video", "deepseek-chat", 10, 0)
+        return asyncio.run(decide())
+
+    # 空间判断改用关键词, 视频保持未判断
+    assert in_new_run(over_budget) == (True, None)
@@ -0,0 +1,33 @@
+from bili_up_finder.search_helper.local_score import (
+    LocalPrefilter,
+    count_keyword_hits,
+    expanded_keywords,
+    sample_captions,
+)
+
+
+def test_expanded_keywords_split_and_deduplicate():
+    assert expanded_keywords("摄影, 相机，摄影、 Camera") == ["摄影", "相机", "camera"]
+
+
+def test_count_keyword_hits_counts_captions_once():
+    captions = ["摄影相机开箱", "美食探店", "Camera 测评"]
+    assert count_keyword_hits(captions, ["摄影", "相机", "camera"]) == 2
+
+
+def test_sample_captions_keeps_recent_and_spreads_sample():
+    captions = [str(i) for i in range(20)]
+    assert sample_captions(captions, 5, 3) == ["0", "1", "2", "3", "4", "5", "10", "15"]
+    assert sample_captions(captions[:6], 5, 3) == captions[:6]
+
+
+def test_sample_captions_without_sample_keeps_recent():
+    captions = [str(i) for i in range(20)]
+    assert sample_captions(captions, 5, 0) == captions[:5]
+
+
+def test_prefilter_accepts_hits_and_rejects_unrelated():
+    prefilter = LocalPrefilter("摄影, 相机", accept_hits=2, reject_overlap=0.1)
+    assert prefilter.decide("摄影入门", ["相机"]) is True
+    assert prefilter.decide("红烧肉做法", ["美食"]) is False
+    assert prefilter.decide("摄影入门", []) is None
@@ -0,0 +1,28 @@
+import asyncio
+
+from bili_up_finder.metrics import get_metrics, start_run
+
+
+def test_run_metrics_are_shared_with_child_tasks():
+    async def child():
+        get_metrics().incr("pages")
+
+    async def run():
+        metrics = start_run("q")
+        await asyncio.gather(child(), child())
+        return metrics
+
+    assert asyncio.run(run()).counters["pages"] == 2
+
+
+def test_contexts_without_a_run_do_not_share_metrics():
+    async def outside_run():
+        get_metrics().incr("pages")
+        return get_metrics()
+
+    async def main():
+        return await asyncio.gather(outside_run(), outside_run())
+
+    first, second = asyncio.run(main())
+    assert first is not second
+    assert first.counters["pages"] == second.counters["pages"] == 1
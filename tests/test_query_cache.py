@@ -0,0 +1,76 @@
+import pytest
+
+from bili_up_finder.cache.query_cache import QueryCache, query_similarity
+from bili_up_finder.cache.store import SqliteStore
+
+
+def users(n: int) -> list[dict]:
+    return [{"uploader": f"up{i}", "profile": "", "videos": []} for i in range(n)]
+
+
+def test_query_similarity_ignores_case_and_punctuation():
+    assert query_similarity("Python 教程!", "python教程") == 1.0
+
+
+def test_query_similarity_is_bigram_jaccard():
+    # {摄影, 影技, 技巧} 与 {摄影, 影技} 交集 2, 并集 3
+    assert query_similarity("摄影技巧", "摄影技") == pytest.approx(2 / 3)
+    assert query_similarity("摄影", "美食") == 0.0
+    assert query_similarity("", "摄影") == 0.0
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryCache(SqliteStore(tmp_path / "q.sqlite3", "queries"), 0.6)
+
+
+def test_lookup_prefers_exact_match(cache):
+    cache.save("摄影", "摄影, 相机", users(3))
+    assert cache.lookup("摄影", 3)["query"] == "摄影"
+    assert cache.lookup("摄影", 4) is None
+
+
+def test_lookup_falls_back_to_similar_query(cache):
+    cache.save("摄影技巧", "摄影", users(5))
+    assert cache.lookup("摄影技", 5)["query"] == "摄影技巧"
+    assert cache.lookup("美食", 1) is None
+
+
+def test_save_keeps_the_larger_result(cache):
+    cache.save("摄影", "", users(5))
+    cache.save("摄影", "", users(2))
+    assert len(cache.lookup("摄影", 1)["users_data"]) == 5
+
+
+def test_disabled_cache_never_hits():
+    cache = QueryCache()
+    cache.save("摄影", "", users(3))
+    assert cache.lookup("摄影", 1) is None
+
+
+def test_similar_lookup_uses_index_and_decodes_only_the_best(cache, monkeypatch):
+    cache.save("摄影技巧", "", users(5))
+    cache.save("摄影器材", "", users(5))
+    cache.save("美食探店", "", users(5))
+    assert cache.lookup("摄影技", 5)["query"] == "摄影技巧"
+
+    got = []
+    get = cache.store.get
+    monkeypatch.setattr(cache.store, "values", lambda: pytest.fail("store scanned"))
+    monkeypatch.setattr(cache.store, "get", lambda key: got.append(key) or get(key))
+
+    cache.save("美食探店推荐", "", users(5))
+    got.clear()
+    assert cache.lookup("美食探店推", 5)["query"] == "美食探店推荐"
+    assert got == ["美食探店推", "美食探店推荐"]
+
+
+def test_index_drops_expired_entries(tmp_path):
+    store = SqliteStore(tmp_path / "q.sqlite3", "q", ttl_seconds=60)
+    cache = QueryCache(store, 0.6)
+    cache.save("摄影技巧", "", users(5))
+    assert cache.lookup("摄影技", 5) is not None
+
+    store._conn.execute("UPDATE q SET created_at = created_at - 61")
+    assert cache.lookup("摄影技", 5) is None
+    assert cache._index == {}
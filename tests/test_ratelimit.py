@@ -0,0 +1,52 @@
+import asyncio
+
+from bili_up_finder.ratelimit import AdaptiveLimit, TokenBucket
+
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.09 < bucket.reserve() <= 0.1
+    assert 0.19 < bucket.reserve() <= 0.2
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+def test_adaptive_limit_increases_additively_and_halves_on_throttle():
+    limit = AdaptiveLimit(maximum=8, minimum=1, latency_target=1.0)
+    limit.limit = 4.0
+
+    limit.on_success(0.1)
+    assert limit.limit == 4.25
+    limit.on_throttle()
+    assert limit.limit == 2.125
+    limit.on_success(2.0)  # 延迟过高, 小幅下调
+    assert limit.limit == 2.125 * 0.9
+
+    for _ in range(5):
+        limit.on_throttle()
+    assert limit.limit == 1
+    limit.limit = 8.0
+    limit.on_success(0.1)
+    assert limit.limit == 8
+
+
+def test_adaptive_limit_caps_in_flight_requests():
+    async def main():
+        limit = AdaptiveLimit(maximum=2)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limit.slot():
+                peak = max(peak, limit.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, limit.in_flight
+
+    assert asyncio.run(main()) == (2, 0)
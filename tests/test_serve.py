@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from bili_up_finder.config import Config
+from bili_up_finder.serve import Job, SearchService
+
+
+def finished_job(job_id: str, minutes_ago: float) -> Job:
+    job = Job(job_id, "摄影", 10, status="done")
+    job.finished_at = (datetime.now() - timedelta(minutes=minutes_ago)).isoformat()
+    return job
+
+
+def test_prune_jobs_drops_old_and_excess_finished_jobs():
+    service = SearchService(
+        Config(verbose=False, job_retention=2, job_retention_minutes=60)
+    )
+    jobs = [
+        finished_job("old", 90),
+        finished_job("a", 30),
+        finished_job("b", 20),
+        finished_job("c", 10),
+        Job("running", "摄影", 10, status="running"),
+    ]
+    service.jobs = {job.id: job for job in jobs}
+
+    service.prune_jobs()
+    assert list(service.jobs) == ["b", "c", "running"]
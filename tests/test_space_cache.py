@@ -0,0 +1,46 @@
+import time
+
+from bili_up_finder.cache.space_cache import (
+    SpaceCache,
+    captions_from_other_query,
+    new_snapshot,
+    space_key,
+)
+from bili_up_finder.cache.store import SqliteStore
+
+
+def test_space_key_uses_mid():
+    assert space_key("https://space.bilibili.com/1001/upload/video?x=1") == "1001"
+    assert space_key("//space.bilibili.com/1001") == "1001"
+    assert space_key("https://example.com/up/?x=1") == "https://example.com/up"
+
+
+def test_in_process_snapshots_respect_ttl(tmp_path):
+    store = SqliteStore(tmp_path / "spaces.sqlite3", "spaces", ttl_seconds=60)
+    cache = SpaceCache(store, ttl_seconds=60)
+    url = "https://space.bilibili.com/1001"
+    cache.set(url, new_snapshot("up", num_videos=20))
+    assert cache.get(url)["num_videos"] == 20
+
+    # 内存里的快照过期后不再返回, 磁盘上的同一条也已过期
+    cache._snapshots.set(space_key(url), new_snapshot("up"), time.time() - 61)
+    store._conn.execute("UPDATE spaces SET created_at = created_at - 61")
+    assert cache.get(url) is None
+
+
+def test_in_process_snapshots_are_bounded():
+    cache = SpaceCache(max_entries=2)
+    for mid in range(3):
+        cache.set(f"https://space.bilibili.com/{mid}", new_snapshot(str(mid)))
+
+    assert cache.get("https://space.bilibili.com/0") is None
+    assert cache.get("https://space.bilibili.com/2")["uploader"] == "2"
+
+
+def test_early_exit_captions_are_refetched_for_other_queries():
+    full = new_snapshot("up", num_videos=20, captions=["a"])
+    partial = new_snapshot("up", num_videos=20, captions=["a"], captions_query="摄影")
+
+    assert not captions_from_other_query(full, "美食")
+    assert not captions_from_other_query(partial, "摄影")
+    assert captions_from_other_query(partial, "美食")
@@ -0,0 +1,42 @@
+import time
+
+from bili_up_finder.cache.store import MemoryCache, SqliteStore
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_memory_cache_expires_by_original_write_time():
+    cache = MemoryCache(ttl_seconds=60)
+    cache.set("fresh", 1)
+    cache.set("stale", 2, created_at=time.time() - 61)
+
+    assert cache.get("fresh") == 1
+    assert cache.get("stale") is None
+    assert len(cache) == 1
+
+
+def test_sqlite_store_lru_and_ttl(tmp_path):
+    store = SqliteStore(tmp_path / "s.sqlite3", "t", max_entries=2)
+    store.set("a", {"x": 1})
+    store.set("b", 2)
+    store.get("a")
+    store.set("c", 3)
+
+    assert store.get("a") == {"x": 1}
+    assert store.get("b") is None
+    value, created_at = store.get_entry("c")
+    assert value == 3 and created_at <= time.time()
+
+    expired = SqliteStore(tmp_path / "s.sqlite3", "t", ttl_seconds=-1)
+    assert expired.get("a") is None
+    assert expired.values() == []
@@ -0,0 +1,30 @@
+from bili_up_finder.cache.store import SqliteStore
+from bili_up_finder.cache.verdict_cache import VerdictCache, verdict_cache_key
+
+
+def test_key_ignores_case_whitespace_and_list_order():
+    a = verdict_cache_key("prompt", "m", "target_video", "Foo  Bar", ["b", "A"], "q")
+    b = verdict_cache_key("prompt", "m", "target_video", "foo bar", ["a", "B"], "Q")
+    assert a == b
+
+
+def test_key_changes_with_prompt_model_and_kind():
+    key = verdict_cache_key("prompt", "m", "target_video", "title", "q")
+    assert key != verdict_cache_key("prompt v2", "m", "target_video", "title", "q")
+    assert key != verdict_cache_key("prompt", "m2", "target_video", "title", "q")
+    assert key != verdict_cache_key("prompt", "m", "user_space", "title", "q")
+
+
+def test_verdicts_persist_in_store(tmp_path):
+    path = tmp_path / "verdicts.sqlite3"
+    VerdictCache(SqliteStore(path, "verdicts")).set("k", False)
+
+    cache = VerdictCache(SqliteStore(path, "verdicts"))
+    assert cache.get("k") is False
+    assert cache.get("missing") is None
+
+
+def test_expired_verdicts_are_misses(tmp_path):
+    cache = VerdictCache(SqliteStore(tmp_path / "v.sqlite3", "v", ttl_seconds=-1))
+    cache.store.set("k", True)
+    assert cache.get("k") is None
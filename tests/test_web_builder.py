@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from bili_up_finder.web_builder import render_report
+
+REPO_DIR = Path(__file__).parent.parent
+
+
+def test_index_renders_same_as_with_html_only_autoescape(monkeypatch):
+    # 共享的 Environment 对 .j2 也转义, index.j2 的数据经 tojson 输出, 结果不变
+    monkeypatch.chdir(REPO_DIR)
+    user_data = [
+        {
+            "uploader": "<b>小王</b> & \"'",
+            "profile": "https://space.bilibili.com/1001?a=1&b=2",
+            "videos": [{"title": "</script><i>摄影", "href": "h", "thumb": "t"}],
+        }
+    ]
+    usage = {"calls": 3, "total_tokens": 1234, "cost_usd": 0.01234}
+    html_only = Environment(
+        loader=FileSystemLoader("./reports"), autoescape=select_autoescape(["html"])
+    )
+
+    for in_progress in (True, False):
+        expected = html_only.get_template("index.j2").render(
+            user_data=user_data, in_progress=in_progress, usage=usage
+        )
+        assert render_report(user_data, in_progress, usage) == expected